@@ -0,0 +1,242 @@
+"""Severity-aware admission control and load shedding.
+
+Every request is classified into a priority:
+
+* ``critical`` - ``POST /api/reports`` with severity high or critical. These
+  are always admitted, even when the server is saturated.
+* ``low`` - list reads (``GET /api/users``, ``/api/reports``, ...). When all
+  concurrency slots are taken they wait at most ``ADMISSION_LOW_PRIORITY_WAIT``
+  seconds before being shed with a 503.
+* ``normal`` - everything else; queued for up to ``ADMISSION_QUEUE_TIMEOUT``.
+
+Non-critical requests also draw from a per-client token bucket and get a
+429 when it is empty. Clients are identified by their peer address;
+``X-Forwarded-For`` is only honoured when the peer is one of
+``ADMISSION_TRUSTED_PROXIES`` (comma-separated addresses or CIDR ranges).
+The least recently seen clients' buckets are evicted beyond
+``MAX_TRACKED_CLIENTS``. Queue depth, in-flight and shed counts are exported
+through ``metrics``.
+"""
+import asyncio
+import ipaddress
+import json
+import os
+import time
+from collections import OrderedDict, deque
+
+from starlette.responses import JSONResponse
+
+import metrics
+
+CRITICAL = "critical"
+NORMAL = "normal"
+LOW = "low"
+PRIORITIES = (CRITICAL, NORMAL, LOW)
+
+MAX_CONCURRENCY = int(os.environ.get("ADMISSION_MAX_CONCURRENCY", "64"))
+QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", "5"))
+LOW_PRIORITY_WAIT = float(os.environ.get("ADMISSION_LOW_PRIORITY_WAIT", "0.5"))
+CLIENT_RATE = float(os.environ.get("ADMISSION_CLIENT_RATE", "20"))
+CLIENT_BURST = float(os.environ.get("ADMISSION_CLIENT_BURST", "40"))
+MAX_TRACKED_CLIENTS = 10000
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(proxy.strip(), strict=False)
+    for proxy in os.environ.get("ADMISSION_TRUSTED_PROXIES", "").split(",")
+    if proxy.strip()
+]
+MAX_PEEK_BYTES = 64 * 1024
+
+LIST_ENDPOINTS = {
+    "/api/users",
+    "/api/reports",
+    "/api/water-quality",
+    "/api/doctors",
+    "/api/medical-stock",
+    "/api/admin/slow-queries",
+}
+EXEMPT_PATHS = {"/metrics"}
+URGENT_SEVERITIES = {"high", "critical"}
+
+QUEUE_DEPTH = metrics.REGISTRY.register(metrics.Gauge(
+    "admission_queue_depth",
+    "Requests waiting for a concurrency slot",
+    ("priority",),
+))
+ADMITTED_IN_FLIGHT = metrics.REGISTRY.register(metrics.Gauge(
+    "admission_in_flight",
+    "Requests holding a concurrency slot",
+))
+SHED_TOTAL = metrics.REGISTRY.register(metrics.Counter(
+    "admission_shed_total",
+    "Requests rejected by admission control",
+    ("priority", "reason"),
+))
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst: float):
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, rate: float, burst: float) -> bool:
+        now = time.monotonic()
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class PriorityLimiter:
+    """Concurrency limit whose free slots go to the highest-priority waiter."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._waiters = {priority: deque() for priority in PRIORITIES}
+
+    def queue_depth(self, priority: str) -> int:
+        return len(self._waiters[priority])
+
+    def force_acquire(self):
+        self.active += 1
+        ADMITTED_IN_FLIGHT.set(self.active)
+
+    async def acquire(self, priority: str, timeout: float) -> bool:
+        if self.active < self.limit and not any(self._waiters.values()):
+            self.force_acquire()
+            return True
+        if timeout <= 0:
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(waiter)
+        QUEUE_DEPTH.inc(priority=priority)
+        try:
+            return await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            QUEUE_DEPTH.dec(priority=priority)
+            try:
+                self._waiters[priority].remove(waiter)
+            except ValueError:
+                pass
+
+    def release(self):
+        self.active -= 1
+        for priority in PRIORITIES:
+            queue = self._waiters[priority]
+            while queue and self.active < self.limit:
+                waiter = queue.popleft()
+                if not waiter.done():
+                    self.active += 1
+                    waiter.set_result(True)
+        ADMITTED_IN_FLIGHT.set(self.active)
+
+
+class AdmissionControlMiddleware:
+    def __init__(self, app, max_concurrency=MAX_CONCURRENCY, client_rate=CLIENT_RATE, client_burst=CLIENT_BURST,
+                 trusted_proxies=None, max_clients=MAX_TRACKED_CLIENTS):
+        self.app = app
+        self.limiter = PriorityLimiter(max_concurrency)
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.trusted_proxies = TRUSTED_PROXIES if trusted_proxies is None else trusted_proxies
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+
+    def _trusted(self, address: str) -> bool:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in network for network in self.trusted_proxies)
+
+    def _client_key(self, scope) -> str:
+        client = scope.get("client")
+        peer = client[0] if client else "unknown"
+        if not self._trusted(peer):
+            return peer
+        # Walk the chain from the nearest hop; the first untrusted address is the real client
+        hops = []
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                hops.extend(hop.strip() for hop in value.decode("latin-1").split(","))
+        for hop in reversed(hops):
+            if hop and not self._trusted(hop):
+                return hop
+        return peer
+
+    def _take_token(self, key: str) -> bool:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.client_burst)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take(self.client_rate, self.client_burst)
+
+    async def _classify(self, scope, receive):
+        """Return ``(priority, receive)``; report bodies are buffered and replayed."""
+        method, path = scope["method"], scope["path"].rstrip("/") or "/"
+        if method == "GET" and path in LIST_ENDPOINTS:
+            return LOW, receive
+        if method != "POST" or path != "/api/reports":
+            return NORMAL, receive
+
+        chunks, size, more = [], 0, True
+        while more and size <= MAX_PEEK_BYTES:
+            message = await receive()
+            if message["type"] != "http.request":
+                return NORMAL, receive
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            more = message.get("more_body", False)
+        body = b"".join(chunks)
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": more}
+            return await receive()
+
+        priority = NORMAL
+        if not more:
+            try:
+                if json.loads(body).get("severity") in URGENT_SEVERITIES:
+                    priority = CRITICAL
+            except (ValueError, AttributeError):
+                pass
+        return priority, replay
+
+    async def _reject(self, scope, receive, send, status, priority, reason, detail):
+        SHED_TOTAL.inc(priority=priority, reason=reason)
+        response = JSONResponse({"detail": detail}, status_code=status, headers={"Retry-After": "1"})
+        await response(scope, receive, send)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        priority, receive = await self._classify(scope, receive)
+        if priority == CRITICAL:
+            self.limiter.force_acquire()
+        else:
+            if not self._take_token(self._client_key(scope)):
+                await self._reject(scope, receive, send, 429, priority, "rate_limited", "Too many requests from this client")
+                return
+            timeout = LOW_PRIORITY_WAIT if priority == LOW else QUEUE_TIMEOUT
+            if not await self.limiter.acquire(priority, timeout):
+                await self._reject(scope, receive, send, 503, priority, "saturated", "Server busy, please retry shortly")
+                return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release()
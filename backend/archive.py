@@ -0,0 +1,87 @@
+"""Hot/cold tiering for health reports.
+
+Resolved reports older than ``ARCHIVE_AFTER_DAYS`` (default 180) are moved
+from ``health_reports`` into ``health_reports_archive`` in batches, keeping
+the hot collection and its indexes sized to the reports the dashboard
+actually counts and sorts. Trend rollups are not changed by a move, but
+anything rebuilt from reports has to read both tiers: ``rollups.backfill``
+and the water-disease correlation refresh do.
+
+Each batch is first upserted into the archive and only then deleted from
+the hot collection, so an interrupted run leaves at most a few reports in
+both tiers and the next run finishes the move. The delete repeats the
+eligibility check; a report reopened in between stays hot and its archive
+copy is dropped. Archived reports are read-only: ``report_workflow``
+rejects status changes to them. Reads that ask for archived
+data go through ``find_across``, which merges both tiers.
+"""
+import heapq
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReplaceOne
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "health_reports_archive"
+ARCHIVE_AFTER_DAYS = float(os.environ.get("ARCHIVE_AFTER_DAYS", "180"))
+BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE", "1000"))
+
+
+async def ensure_indexes(db):
+    await db.health_reports.create_index([("status", 1), ("date_reported", 1)])
+    await db[COLLECTION].create_index("id", unique=True)
+    await db[COLLECTION].create_index([("date_reported", -1)])
+    await db[COLLECTION].create_index([("region_ids", 1), ("date_reported", -1)])
+
+
+async def archive_resolved(db, older_than_days: float = ARCHIVE_AFTER_DAYS, batch_size: int = BATCH_SIZE) -> int:
+    """Move resolved reports filed more than ``older_than_days`` ago; returns reports moved."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    query = {"status": "resolved", "date_reported": {"$lt": cutoff.isoformat()}}
+    moved = 0
+    while True:
+        batch = await db.health_reports.find(query).sort("date_reported", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        archived_at = datetime.now(timezone.utc).isoformat()
+        await db[COLLECTION].bulk_write(
+            [ReplaceOne({"_id": report["_id"]}, {**report, "archived_at": archived_at}, upsert=True) for report in batch],
+            ordered=False,
+        )
+        batch_ids = [report["_id"] for report in batch]
+        # Only delete reports still eligible, so one reopened since the read stays hot
+        deleted = await db.health_reports.delete_many({**query, "_id": {"$in": batch_ids}})
+        if deleted.deleted_count < len(batch):
+            kept = await db.health_reports.find({"_id": {"$in": batch_ids}}, {"_id": 1}).to_list(None)
+            await db[COLLECTION].delete_many({"_id": {"$in": [report["_id"] for report in kept]}})
+        moved += deleted.deleted_count
+    if moved:
+        logger.info(f"Archived {moved} resolved reports older than {older_than_days:g} days")
+    return moved
+
+
+async def find_one_across(db, query: dict):
+    """``find_one`` on the hot collection, falling back to the archive."""
+    return await db.health_reports.find_one(query) or await db[COLLECTION].find_one(query)
+
+
+async def find_across(db, query: dict, sort_field: str = "date_reported", limit: int = 50, include_archived: bool = True,
+                      projection: dict = None):
+    """Newest-first reports matching ``query`` from the hot tier and, optionally, the archive."""
+    if projection and include_archived:
+        projection = {**projection, sort_field: 1}  # needed to merge the tiers
+    hot = await db.health_reports.find(query, projection).sort(sort_field, -1).limit(limit).to_list(limit)
+    if not include_archived:
+        return hot
+    cold = await db[COLLECTION].find(query, projection).sort(sort_field, -1).limit(limit).to_list(limit)
+    merged = heapq.merge(hot, cold, key=lambda report: report.get(sort_field) or "", reverse=True)
+    return [report for _, report in zip(range(limit), merged)]
+
+
+async def count_across(db, query: dict, include_archived: bool = True) -> int:
+    count = await db.health_reports.count_documents(query)
+    if include_archived:
+        count += await db[COLLECTION].count_documents(query)
+    return count
@@ -0,0 +1,229 @@
+"""Spatial-temporal join of unsafe water readings with disease reports.
+
+For every unsafe ``water_quality`` reading we look for disease reports filed
+within ``CORRELATION_RADIUS_KM`` and from ``CORRELATION_DAYS_BEFORE`` days
+before to ``CORRELATION_DAYS_AFTER`` days after the test. Disease reports
+are bucketed into a lat/lng grid whose cells are at least one radius wide,
+so each reading only inspects the 3x3 block of cells around it, and
+distances for those candidates are computed in one vectorized pass.
+Readings are processed in batches spanning at most
+``CORRELATION_BATCH_SPAN_DAYS`` of test dates, so the disease reports loaded
+for one batch (from both the hot tier and the archive) stay bounded.
+
+Results are cached per reading in ``water_disease_correlation``. New unsafe
+readings are correlated as they arrive, and a scheduled refresh recomputes
+readings whose time window is still open. When a rule change reclassifies
+readings, only those that moved into or out of ``unsafe`` are refreshed or
+discarded.
+"""
+import logging
+import math
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from pymongo import ReplaceOne
+
+import archive
+import ids
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "water_disease_correlation"
+RADIUS_KM = float(os.environ.get("CORRELATION_RADIUS_KM", "5"))
+DAYS_BEFORE = float(os.environ.get("CORRELATION_DAYS_BEFORE", "3"))
+DAYS_AFTER = float(os.environ.get("CORRELATION_DAYS_AFTER", "14"))
+BATCH_SPAN_DAYS = float(os.environ.get("CORRELATION_BATCH_SPAN_DAYS", "30"))
+MAX_LINKED_REPORTS = 50
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+
+def _timestamp(value) -> float:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def haversine_km(lat, lng, lats, lngs):
+    """Distance from one point to arrays of points, in km."""
+    lat, lng = math.radians(lat), math.radians(lng)
+    lats, lngs = np.radians(lats), np.radians(lngs)
+    a = np.sin((lats - lat) / 2) ** 2 + math.cos(lat) * np.cos(lats) * np.sin((lngs - lng) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class DiseaseReportIndex:
+    """Grid index over disease reports with numpy column arrays."""
+
+    def __init__(self, reports, radius_km=RADIUS_KM):
+        rows = [
+            (ids.to_str(r["id"]), float(r["location"]["lat"]), float(r["location"]["lng"]),
+             _timestamp(r["date_reported"]), str(getattr(r.get("severity"), "value", r.get("severity"))))
+            for r in reports
+            if isinstance(r.get("location"), dict)
+            and r["location"].get("lat") is not None
+            and r["location"].get("lng") is not None
+        ]
+        self.ids = np.array([row[0] for row in rows], dtype=object)
+        self.lats = np.array([row[1] for row in rows], dtype=float)
+        self.lngs = np.array([row[2] for row in rows], dtype=float)
+        self.times = np.array([row[3] for row in rows], dtype=float)
+        self.severities = np.array([row[4] for row in rows], dtype=str)
+
+        max_abs_lat = min(float(np.abs(self.lats).max()) if rows else 0.0, 85.0)
+        self.cell_lat = radius_km / KM_PER_DEGREE
+        self.cell_lng = self.cell_lat / math.cos(math.radians(max_abs_lat + self.cell_lat))
+        self.cells = {}
+        if rows:
+            keys = np.stack([np.floor(self.lats / self.cell_lat), np.floor(self.lngs / self.cell_lng)], axis=1).astype(np.int64)
+            order = np.lexsort((keys[:, 1], keys[:, 0]))
+            sorted_keys = keys[order]
+            boundaries = np.flatnonzero(np.any(np.diff(sorted_keys, axis=0) != 0, axis=1)) + 1
+            for chunk in np.split(order, boundaries):
+                self.cells[tuple(keys[chunk[0]])] = chunk
+
+    def __len__(self):
+        return len(self.ids)
+
+    def candidates(self, lat, lng):
+        row, col = math.floor(lat / self.cell_lat), math.floor(lng / self.cell_lng)
+        chunks = [
+            self.cells[(row + dr, col + dc)]
+            for dr in (-1, 0, 1)
+            for dc in (-1, 0, 1)
+            if (row + dr, col + dc) in self.cells
+        ]
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
+
+    def query(self, lat, lng, start, end, radius_km=RADIUS_KM):
+        """Indices and distances of reports within ``radius_km`` filed in [start, end]."""
+        idx = self.candidates(lat, lng)
+        if not len(idx):
+            return idx, np.empty(0)
+        idx = idx[(self.times[idx] >= start) & (self.times[idx] <= end)]
+        distances = haversine_km(lat, lng, self.lats[idx], self.lngs[idx])
+        within = distances <= radius_km
+        idx, distances = idx[within], distances[within]
+        order = np.argsort(distances)
+        return idx[order], distances[order]
+
+
+def correlate(readings, index: DiseaseReportIndex, radius_km=RADIUS_KM, days_before=DAYS_BEFORE, days_after=DAYS_AFTER):
+    """Build one cache document per reading with the disease reports linked to it."""
+    computed_at = datetime.now(timezone.utc).isoformat()
+    results = []
+    for reading in readings:
+        location = reading.get("location") or {}
+        if location.get("lat") is None or location.get("lng") is None:
+            continue
+        tested_at = _timestamp(reading["test_date"])
+        idx, distances = index.query(
+            float(location["lat"]), float(location["lng"]),
+            tested_at - days_before * 86400, tested_at + days_after * 86400, radius_km,
+        )
+        labels, label_counts = np.unique(index.severities[idx], return_counts=True)
+        severities = {str(label): int(count) for label, count in zip(labels, label_counts)}
+        results.append({
+            "_id": reading["id"],
+            "reading_id": ids.to_str(reading["id"]),
+            "location": location,
+            "region_ids": reading.get("region_ids", []),
+            "test_date": reading["test_date"],
+            "tds_value": reading.get("tds_value"),
+            "ph_level": reading.get("ph_level"),
+            "turbidity": reading.get("turbidity"),
+            "chlorine_level": reading.get("chlorine_level"),
+            "report_count": int(len(idx)),
+            "severity_counts": severities,
+            "nearest_report_km": round(float(distances[0]), 3) if len(idx) else None,
+            "report_ids": [str(report_id) for report_id in index.ids[idx[:MAX_LINKED_REPORTS]]],
+            "radius_km": radius_km,
+            "window_days": [days_before, days_after],
+            "computed_at": computed_at,
+        })
+    return results
+
+
+async def refresh(db, readings_query=None, batch_size=2000, radius_km=RADIUS_KM,
+                  days_before=DAYS_BEFORE, days_after=DAYS_AFTER) -> int:
+    """Recompute cached correlations for unsafe readings matching ``readings_query``."""
+    query = {"status": "unsafe"}
+    query.update(readings_query or {})
+    cursor = db.water_quality.find(query, {"_id": 0}).sort("test_date", 1).batch_size(batch_size)
+    updated = 0
+    batch = []
+    async for reading in cursor:
+        # Readings arrive in test_date order; start a new batch once it would span too many days
+        if batch and _timestamp(reading["test_date"]) - _timestamp(batch[0]["test_date"]) > BATCH_SPAN_DAYS * 86400:
+            updated += await _refresh_batch(db, batch, radius_km, days_before, days_after)
+            batch = []
+        batch.append(reading)
+        if len(batch) >= batch_size:
+            updated += await _refresh_batch(db, batch, radius_km, days_before, days_after)
+            batch = []
+    if batch:
+        updated += await _refresh_batch(db, batch, radius_km, days_before, days_after)
+    return updated
+
+
+async def refresh_readings(db, reading_ids, batch_size=2000) -> int:
+    """Recompute cached correlations for the given readings, ``batch_size`` ids per query."""
+    updated = 0
+    for start in range(0, len(reading_ids), batch_size):
+        updated += await refresh(db, {"id": {"$in": reading_ids[start:start + batch_size]}}, batch_size)
+    return updated
+
+
+async def discard(db, reading_ids, batch_size=2000) -> int:
+    """Drop cached correlations of readings that are no longer unsafe."""
+    deleted = 0
+    for start in range(0, len(reading_ids), batch_size):
+        result = await db[COLLECTION].delete_many({"_id": {"$in": reading_ids[start:start + batch_size]}})
+        deleted += result.deleted_count
+    return deleted
+
+
+async def apply_reclassification(db, result: dict):
+    """Update the cache after ``water_rules.reclassify``: only readings that moved in or out of unsafe matter."""
+    if result["no_longer_unsafe"]:
+        await discard(db, result["no_longer_unsafe"])
+    if result["now_unsafe"]:
+        await refresh_readings(db, result["now_unsafe"])
+
+
+async def _refresh_batch(db, readings, radius_km, days_before, days_after) -> int:
+    times = [_timestamp(reading["test_date"]) for reading in readings]
+    start = datetime.fromtimestamp(min(times) - days_before * 86400, timezone.utc)
+    end = datetime.fromtimestamp(max(times) + days_after * 86400, timezone.utc)
+    query = {
+        "report_type": "disease",
+        "duplicate_of": None,
+        "date_reported": {"$gte": start.isoformat(), "$lte": end.isoformat()},
+    }
+    projection = {"_id": 0, "id": 1, "location": 1, "date_reported": 1, "severity": 1}
+    reports, seen = [], set()
+    # Old readings correlate with reports that have since been archived; skip any caught mid-move in both tiers
+    for collection in ("health_reports", archive.COLLECTION):
+        async for report in db[collection].find(query, projection).batch_size(2000):
+            if report["id"] not in seen:
+                seen.add(report["id"])
+                reports.append(report)
+    index = DiseaseReportIndex(reports, radius_km)
+    results = correlate(readings, index, radius_km, days_before, days_after)
+    if results:
+        await db[COLLECTION].bulk_write([ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in results], ordered=False)
+    return len(results)
+
+
+async def refresh_open_windows(db) -> int:
+    """Recompute readings whose report window has not closed yet."""
+    since = datetime.now(timezone.utc) - timedelta(days=DAYS_AFTER + 1)
+    return await refresh(db, {"test_date": {"$gte": since.isoformat()}})
+
+
+async def ensure_indexes(db):
+    await db[COLLECTION].create_index([("report_count", -1), ("test_date", -1)])
+    await db[COLLECTION].create_index([("region_ids", 1), ("report_count", -1)])
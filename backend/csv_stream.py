@@ -0,0 +1,74 @@
+"""Incremental CSV parsing for large uploads.
+
+``csv_chunks`` turns an async iterator of raw bytes (a request body or an
+uploaded file) into lists of at most ``chunk_rows`` parsed rows, decoding
+and splitting records as bytes arrive. Only the current chunk and one
+partial record are held in memory, however large the file is.
+"""
+import codecs
+import csv
+
+
+async def upload_bytes(upload, block_size: int = 64 * 1024):
+    """Async byte iterator over a Starlette ``UploadFile``."""
+    while True:
+        block = await upload.read(block_size)
+        if not block:
+            break
+        yield block
+
+
+def _split_records(text: str):
+    """Split complete CSV records off ``text``; returns (records, remainder).
+
+    A newline only ends a record when it is outside double quotes, so quoted
+    fields containing line breaks stay intact across byte blocks.
+    """
+    if '"' not in text:
+        end = text.rfind("\n") + 1
+        return text[:end].splitlines(keepends=True), text[end:]
+    records, start, quoted = [], 0, False
+    for position, char in enumerate(text):
+        if char == '"':
+            quoted = not quoted
+        elif char == "\n" and not quoted:
+            records.append(text[start:position + 1])
+            start = position + 1
+    return records, text[start:]
+
+
+async def csv_chunks(byte_blocks, chunk_rows: int = 1000, encoding: str = "utf-8-sig"):
+    """Yield lists of ``(line_number, row_dict)`` keyed by the lower-cased header.
+
+    Empty cells are left out of ``row_dict`` so optional fields take their
+    defaults; blank rows are skipped.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    header = None
+    pending = ""
+    chunk = []
+    line_number = 0
+
+    def parse(records):
+        nonlocal header, line_number
+        for row in csv.reader(records):
+            line_number += 1
+            if header is None:
+                header = [name.strip().lower() for name in row]
+                continue
+            if not any(value.strip() for value in row):
+                continue
+            yield line_number, {name: value.strip() for name, value in zip(header, row) if value.strip()}
+
+    async for block in byte_blocks:
+        records, pending = _split_records(pending + decoder.decode(block))
+        for row in parse(records):
+            chunk.append(row)
+            if len(chunk) >= chunk_rows:
+                yield chunk
+                chunk = []
+    pending += decoder.decode(b"", final=True)
+    for row in parse([pending] if pending.strip() else []):
+        chunk.append(row)
+    if chunk:
+        yield chunk
@@ -0,0 +1,157 @@
+"""Near-duplicate detection for incoming health reports.
+
+Reports are compared against an in-memory MinHash/LSH index of the recent
+window rather than the whole collection. A new report is treated as a
+duplicate of an earlier one when all of these hold:
+
+* their symptom texts have an estimated Jaccard similarity above
+  ``DEDUP_SIMILARITY`` (character shingles, MinHash signatures),
+* they are of the same ``report_type``,
+* they were filed within ``DEDUP_WINDOW_HOURS`` of each other, and
+* they are within ``DEDUP_RADIUS_KM`` of each other (or share the same
+  address when coordinates are missing).
+
+Each worker keeps its own index, warmed from the database at startup.
+"""
+import hashlib
+import math
+import os
+import re
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+WINDOW_HOURS = float(os.environ.get("DEDUP_WINDOW_HOURS", "72"))
+RADIUS_KM = float(os.environ.get("DEDUP_RADIUS_KM", "2"))
+SIMILARITY = float(os.environ.get("DEDUP_SIMILARITY", "0.6"))
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 31, size=NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=NUM_PERM).astype(np.uint64)
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def shingles(text: str) -> set:
+    normalized = _NON_WORD.sub(" ", (text or "").lower()).strip()
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized}
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature of ``text`` with ``NUM_PERM`` permutations."""
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), "little") for s in shingles(text)),
+        dtype=np.uint64,
+    )
+    permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _MERSENNE_PRIME & _MAX_HASH
+    return permuted.min(axis=1)
+
+
+def haversine_km(lat1, lng1, lat2, lng2) -> float:
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 6371.0 * 2 * math.asin(math.sqrt(a))
+
+
+def _as_datetime(value) -> datetime:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class _Entry:
+    __slots__ = ("id", "canonical_id", "signature", "report_type", "lat", "lng", "address", "reported_at")
+
+    def __init__(self, report, signature, canonical_id):
+        location = report.location
+        self.id = report.id
+        self.canonical_id = canonical_id or report.id
+        self.signature = signature
+        self.report_type = report.report_type
+        self.lat = location.lat
+        self.lng = location.lng
+        self.address = (location.address or "").strip().lower()
+        self.reported_at = _as_datetime(report.date_reported)
+
+
+class DuplicateIndex:
+    """In-memory LSH index over the reports filed in the recent window."""
+
+    def __init__(self, window_hours=WINDOW_HOURS, radius_km=RADIUS_KM, similarity=SIMILARITY):
+        self.window = timedelta(hours=window_hours)
+        self.radius_km = radius_km
+        self.similarity = similarity
+        self._entries = {}
+        self._order = deque()
+        self._buckets = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _band_keys(signature):
+        return [(band, signature[band * ROWS:(band + 1) * ROWS].tobytes()) for band in range(BANDS)]
+
+    def _near(self, a: _Entry, b: _Entry) -> bool:
+        if None not in (a.lat, a.lng, b.lat, b.lng):
+            return haversine_km(a.lat, a.lng, b.lat, b.lng) <= self.radius_km
+        return bool(a.address) and a.address == b.address
+
+    def prune(self, now: datetime = None):
+        """Drop entries that have fallen out of the window."""
+        cutoff = (now or datetime.now(timezone.utc)) - self.window
+        while self._order and self._order[0][0] < cutoff:
+            _, report_id = self._order.popleft()
+            self.discard(report_id)
+
+    def find_duplicate(self, report):
+        """Return ``(canonical_id, signature)``; canonical_id is None for new incidents."""
+        signature = minhash(report.symptoms)
+        probe = _Entry(report, signature, None)
+        self.prune(max(probe.reported_at, datetime.now(timezone.utc)))
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates.update(self._buckets.get(key, ()))
+        best_id, best_score = None, self.similarity
+        for candidate_id in candidates:
+            entry = self._entries[candidate_id]
+            # A replayed write may already have registered this very report
+            if candidate_id == probe.id or entry.report_type != probe.report_type:
+                continue
+            if abs(entry.reported_at - probe.reported_at) > self.window or not self._near(entry, probe):
+                continue
+            score = float(np.mean(entry.signature == signature))
+            if score >= best_score:
+                best_id, best_score = entry.canonical_id, score
+        return best_id, signature
+
+    def discard(self, report_id):
+        """Forget a report, e.g. one whose insert failed after it was added."""
+        entry = self._entries.pop(report_id, None)
+        if entry is None:
+            return
+        for key in self._band_keys(entry.signature):
+            bucket = self._buckets.get(key)
+            if bucket:
+                bucket.discard(report_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def add(self, report, signature=None, canonical_id=None):
+        if signature is None:
+            signature = minhash(report.symptoms)
+        entry = _Entry(report, signature, canonical_id)
+        self._entries[entry.id] = entry
+        self._order.append((entry.reported_at, entry.id))
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, set()).add(entry.id)
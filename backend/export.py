@@ -0,0 +1,203 @@
+"""Columnar Parquet exports for analytics.
+
+Mongo cursors are read in chunks of ``EXPORT_BATCH_SIZE`` documents, each
+chunk becomes one Arrow record batch (and one Parquet row group), so memory
+stays bounded regardless of collection size. Columns are typed: timestamps
+are UTC ``timestamp[us]``, measurements are ``float64`` and enum-like
+fields are dictionary encoded. Nested ``location`` and ``region`` fields are
+flattened into their own columns.
+
+``stream_parquet`` yields the file as it is written, for HTTP responses;
+``write_parquet`` writes it to a local path for the CLI. Encoding and
+compressing a row group runs in a worker thread, off the event loop.
+"""
+import asyncio
+import os
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import archive
+import ids
+
+BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "10000"))
+COMPRESSION = os.environ.get("EXPORT_COMPRESSION", "zstd")
+
+TIMESTAMP = pa.timestamp("us", tz="UTC")
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+
+def _path(path):
+    keys = path.split(".")
+
+    def get(document):
+        for key in keys:
+            if not isinstance(document, dict):
+                return None
+            document = document.get(key)
+        return document
+    return get
+
+
+def _timestamp(value):
+    if value is None or isinstance(value, datetime):
+        return value if value is None or value.tzinfo else value.replace(tzinfo=timezone.utc)
+    return _timestamp(datetime.fromisoformat(value))
+
+
+def _enum(value):
+    return None if value is None else str(getattr(value, "value", value))
+
+
+def _float(value):
+    return None if value is None else float(value)
+
+
+# (column, arrow type, document path, converter)
+LOCATION = [
+    ("lat", pa.float64(), "location.lat", _float),
+    ("lng", pa.float64(), "location.lng", _float),
+    ("address", pa.string(), "location.address", None),
+    ("state", CATEGORY, "region.state", None),
+    ("district", CATEGORY, "region.district", None),
+    ("block", CATEGORY, "region.block", None),
+    ("village", CATEGORY, "region.village", None),
+]
+
+COLUMNS = {
+    "health_reports": [
+        ("id", pa.string(), "id", ids.to_str),
+        ("reporter_name", pa.string(), "reporter_name", None),
+        ("report_type", CATEGORY, "report_type", _enum),
+        ("severity", CATEGORY, "severity", _enum),
+        ("status", CATEGORY, "status", None),
+        ("symptoms", pa.string(), "symptoms", None),
+        ("date_reported", TIMESTAMP, "date_reported", _timestamp),
+        ("is_anonymous", pa.bool_(), "is_anonymous", None),
+        ("duplicate_of", pa.string(), "duplicate_of", None),
+        ("duplicate_count", pa.int32(), "duplicate_count", None),
+        *LOCATION,
+    ],
+    "water_quality": [
+        ("id", pa.string(), "id", ids.to_str),
+        ("test_date", TIMESTAMP, "test_date", _timestamp),
+        ("tds_value", pa.float64(), "tds_value", _float),
+        ("ph_level", pa.float64(), "ph_level", _float),
+        ("turbidity", pa.float64(), "turbidity", _float),
+        ("chlorine_level", pa.float64(), "chlorine_level", _float),
+        ("status", CATEGORY, "status", None),
+        ("rules_version", CATEGORY, "rules_version", None),
+        ("tested_by", pa.string(), "tested_by", None),
+        *LOCATION,
+    ],
+    "medical_stock": [
+        ("id", pa.string(), "id", ids.to_str),
+        ("item_name", CATEGORY, "item_name", None),
+        ("quantity", pa.int64(), "quantity", None),
+        ("unit", CATEGORY, "unit", None),
+        ("status", CATEGORY, "status", _enum),
+        ("expiry_date", TIMESTAMP, "expiry_date", _timestamp),
+        ("last_updated", TIMESTAMP, "last_updated", _timestamp),
+        *LOCATION,
+    ],
+    "doctors": [
+        ("id", pa.string(), "id", ids.to_str),
+        ("name", pa.string(), "name", None),
+        ("specialization", CATEGORY, "specialization", None),
+        ("availability", CATEGORY, "availability", None),
+        ("clinic_name", pa.string(), "clinic_name", None),
+        *LOCATION,
+    ],
+}
+SORT_FIELDS = {"health_reports": "date_reported", "water_quality": "test_date", "medical_stock": "last_updated"}
+
+
+def schema(collection: str) -> pa.Schema:
+    return pa.schema([(name, arrow_type) for name, arrow_type, _, _ in COLUMNS[collection]])
+
+
+def to_record_batch(collection: str, documents) -> pa.RecordBatch:
+    arrays = []
+    for _, arrow_type, path, convert in COLUMNS[collection]:
+        get = _path(path)
+        values = [get(document) for document in documents]
+        if convert:
+            values = [convert(value) for value in values]
+        arrays.append(pa.array(values, type=arrow_type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema(collection))
+
+
+async def record_batches(db, collection: str, query: dict = None, batch_size: int = BATCH_SIZE,
+                         include_archived: bool = False):
+    """Yield record batches of at most ``batch_size`` rows."""
+    sources = [collection]
+    if include_archived and collection == "health_reports":
+        sources.append(archive.COLLECTION)
+    projection = {path.split(".")[0]: 1 for _, _, path, _ in COLUMNS[collection]}
+    projection["_id"] = 0
+    for source in sources:
+        cursor = db[source].find(query or {}, projection).batch_size(batch_size)
+        if collection in SORT_FIELDS:
+            cursor = cursor.sort(SORT_FIELDS[collection], 1)
+        chunk = []
+        async for document in cursor:
+            chunk.append(document)
+            if len(chunk) >= batch_size:
+                yield to_record_batch(collection, chunk)
+                chunk = []
+        if chunk:
+            yield to_record_batch(collection, chunk)
+
+
+class _ChunkSink:
+    """Write-only file object handing written bytes back to the caller."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+async def stream_parquet(db, collection: str, query: dict = None, batch_size: int = BATCH_SIZE,
+                         include_archived: bool = False):
+    """Yield a Parquet file in pieces, one row group at a time."""
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema(collection), compression=COMPRESSION)
+    try:
+        async for batch in record_batches(db, collection, query, batch_size, include_archived):
+            await asyncio.to_thread(writer.write_batch, batch)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+async def write_parquet(db, collection: str, path, query: dict = None, batch_size: int = BATCH_SIZE,
+                        include_archived: bool = False) -> int:
+    """Write a Parquet export to ``path``; returns the number of rows."""
+    rows = 0
+    with pq.ParquetWriter(str(path), schema(collection), compression=COMPRESSION) as writer:
+        async for batch in record_batches(db, collection, query, batch_size, include_archived):
+            await asyncio.to_thread(writer.write_batch, batch)
+            rows += batch.num_rows
+    return rows
@@ -0,0 +1,141 @@
+"""Offline geocoding against the region gazetteer.
+
+Field apps often send only a village name, or an address without
+coordinates. ``fill_location`` looks the address up in the gazetteer's name
+trie (see ``regions.NameTrie``), fills in missing ``lat``/``lng`` from the
+most specific region found and rewrites the region part of the address in
+canonical "Village X, Block Y, Z District, State" form. The submitted text
+is kept as ``submitted_address`` when it differs.
+
+Addresses that name regions which do not belong together ("Village Sisana,
+Gurugram District") are left unresolved rather than guessed. If no full name
+matches, the last word is treated as a partially typed name and completed
+when it covers most of a name and the regions it completes to form a single
+chain, so "Kharkho" becomes Kharkhoda but "Ramp" stays as typed. Lookups are
+memoized per normalized address in an LRU cache of ``GEOCODER_CACHE_SIZE``
+entries.
+"""
+import os
+import re
+from functools import lru_cache
+
+import regions
+
+CACHE_SIZE = int(os.environ.get("GEOCODER_CACHE_SIZE", "4096"))
+MIN_PREFIX = 3
+MIN_COMPLETED = 0.75  # share of a name a partial word must cover to be completed
+
+_SPACES = re.compile(r"\s+")
+_LABELS = {"village": "Village {}", "block": "Block {}", "district": "{} District", "state": "{}"}
+_LABEL_WORDS = {"village", "vill", "block", "district", "dist", "state"}
+
+
+def clean_address(address: str) -> str:
+    """Collapse whitespace and stray commas in a free-text address."""
+    parts = [_SPACES.sub(" ", part).strip() for part in (address or "").split(",")]
+    return ", ".join(part for part in parts if part)
+
+
+def canonical_address(region_id: str) -> str:
+    gazetteer = regions.gazetteer()
+    labels = []
+    for ancestor in reversed(gazetteer.ancestors(region_id)):
+        region = gazetteer.regions[ancestor]
+        labels.append(_LABELS[region["level"]].format(region["name"]))
+    return ", ".join(labels)
+
+
+def details(part: str) -> str:
+    """Words of one address part that name no region, e.g. the landmark in "Child Health Center Sisana"."""
+    gazetteer = regions.gazetteer()
+    words = part.split(" ")
+    tokens = [(index, token) for index, word in enumerate(words) for token in regions.normalize(word).split()]
+    text = " ".join(token for _, token in tokens)
+    offsets, position = [], 0
+    for _, token in tokens:
+        offsets.append(position)
+        position += len(token) + 1
+    named, i = set(), 0
+    while i < len(tokens):
+        end, region_ids = gazetteer.names.longest_match(text, offsets[i])
+        if not region_ids:
+            i += 1
+            continue
+        while i < len(tokens) and offsets[i] < end:
+            named.add(tokens[i][0])
+            i += 1
+    if not named:
+        return part
+    return " ".join(
+        word for index, word in enumerate(words)
+        if index not in named and regions.normalize(word) and regions.normalize(word) not in _LABEL_WORDS
+    )
+
+
+def _completes(prefix: str, region: dict) -> bool:
+    return any(
+        name.startswith(prefix) and len(prefix) >= MIN_COMPLETED * len(name)
+        for name in map(regions.normalize, [region["name"], *region.get("aliases", [])])
+    )
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def lookup(normalized: str):
+    """``(region id or None, whether the last word was completed)`` for a normalized address."""
+    gazetteer = regions.gazetteer()
+    region_id = gazetteer.pick(gazetteer.matches(normalized))
+    if region_id is None and normalized:
+        prefix = normalized.rsplit(" ", 1)[-1]
+        if len(prefix) >= MIN_PREFIX:
+            completions = [
+                completion for completion in gazetteer.names.complete(prefix)
+                if _completes(prefix, gazetteer.regions[completion])
+            ]
+            found = {level: [] for level in regions.LEVELS}
+            for completion in completions:
+                found[gazetteer.regions[completion]["level"]].append(completion)
+            candidate = gazetteer.pick(found)
+            # Only accept an unambiguous completion, e.g. a village and the block it is named after
+            if candidate and set(completions) <= set(gazetteer.ancestors(candidate)):
+                return candidate, True
+    return region_id, False
+
+
+def geocode(address: str):
+    """``{"region_id", "lat", "lng", "address", "completed"}`` for ``address``, or None."""
+    region_id, completed = lookup(regions.normalize(address))
+    if region_id is None:
+        return None
+    region = regions.gazetteer().regions[region_id]
+    return {
+        "region_id": region_id,
+        "lat": region.get("lat"),
+        "lng": region.get("lng"),
+        "address": canonical_address(region_id),
+        "completed": completed,
+    }
+
+
+def fill_location(location: dict) -> dict:
+    """Copy of ``location`` with coordinates filled and the address normalized."""
+    location = dict(location or {})
+    submitted = location.get("address")
+    if not submitted:
+        return location
+    match = geocode(submitted)
+    if match is None:
+        location["address"] = clean_address(submitted)
+        return location
+    if location.get("lat") is None or location.get("lng") is None:
+        location["lat"], location["lng"] = match["lat"], match["lng"]
+        location["geocoded"] = True
+    parts = clean_address(submitted).split(", ")
+    if match["completed"]:
+        # The partially typed name is replaced by the region it completed to
+        parts[-1] = parts[-1].rpartition(" ")[0]
+    # Keep text that names no region (landmarks, house numbers) ahead of the canonical form
+    kept = [detail for detail in map(details, parts) if detail]
+    location["address"] = ", ".join(kept + [match["address"]])
+    if clean_address(submitted) != location["address"]:
+        location["submitted_address"] = submitted
+    return location
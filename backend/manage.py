@@ -0,0 +1,153 @@
+"""Maintenance commands for the Rural Water Health Monitoring backend.
+
+Run from the backend directory, e.g. ``python manage.py backfill-rollups``.
+"""
+import asyncio
+
+import typer
+
+app = typer.Typer(help="Maintenance commands for the health monitoring backend")
+
+
+@app.callback()
+def main():
+    """Maintenance commands for the health monitoring backend."""
+
+
+def run(coro):
+    """Run a coroutine against the server's database and close the client."""
+    import server
+
+    async def main():
+        server.connect_mongo()
+        try:
+            return await coro(server)
+        finally:
+            server.client.close()
+
+    return asyncio.run(main())
+
+
+@app.command("backfill-rollups")
+def backfill_rollups(batch_size: int = typer.Option(10000, help="Cursor and bulk write batch size")):
+    """Rebuild the report_rollups collection behind /api/analytics/trends."""
+    import rollups
+
+    async def backfill(server):
+        await rollups.ensure_indexes(server.db)
+        return await rollups.backfill(server.db, batch_size)
+
+    counted = run(backfill)
+    typer.echo(f"Rolled up {counted} reports")
+
+
+@app.command("refresh-correlation")
+def refresh_correlation(batch_size: int = typer.Option(2000, help="Unsafe readings joined per batch")):
+    """Recompute the water-disease correlation cache for every unsafe reading."""
+    import correlation
+
+    async def refresh(server):
+        await correlation.ensure_indexes(server.db)
+        return await correlation.refresh(server.db, batch_size=batch_size)
+
+    updated = run(refresh)
+    typer.echo(f"Correlated {updated} unsafe readings")
+
+
+@app.command("reclassify-water")
+def reclassify_water(
+    ruleset: str = typer.Option(None, help="Rule set version; defaults to WATER_RULESET"),
+    chunk_size: int = typer.Option(5000, help="Readings evaluated and written per chunk"),
+):
+    """Rewrite water_quality statuses that were assigned by another rule set."""
+    import correlation
+    import water_rules
+
+    rules = water_rules.get(ruleset) if ruleset else water_rules.active()
+
+    async def reclassify(server):
+        result = await water_rules.reclassify(server.db, rules, chunk_size)
+        await correlation.apply_reclassification(server.db, result)
+        return result
+
+    result = run(reclassify)
+    typer.echo(f"Scanned {result['scanned']} readings under {rules.version}, {result['changed']} changed status")
+
+
+@app.command("assign-regions")
+def assign_regions(batch_size: int = typer.Option(1000, help="Documents updated per bulk write")):
+    """Resolve region ids for records stored before the region hierarchy existed."""
+    import regions
+
+    async def assign(server):
+        await regions.ensure_indexes(server.db)
+        return await regions.assign_missing(server.db, batch_size)
+
+    updated = run(assign)
+    for collection, count in updated.items():
+        typer.echo(f"{collection}: assigned regions to {count} records")
+    typer.echo("Run backfill-rollups to regroup trend rollups by district id")
+
+
+@app.command("archive-reports")
+def archive_reports(
+    older_than_days: float = typer.Option(None, help="Age in days; defaults to ARCHIVE_AFTER_DAYS"),
+    batch_size: int = typer.Option(1000, help="Reports moved per batch"),
+):
+    """Move resolved reports older than the cutoff into health_reports_archive."""
+    import archive
+
+    days = archive.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+
+    async def move(server):
+        await archive.ensure_indexes(server.db)
+        return await archive.archive_resolved(server.db, days, batch_size)
+
+    moved = run(move)
+    typer.echo(f"Archived {moved} resolved reports older than {days:g} days")
+
+
+@app.command("export")
+def export_collection(
+    collection: str = typer.Argument(..., help="health_reports, water_quality, medical_stock or doctors"),
+    output: str = typer.Option(None, help="Parquet file to write; defaults to <collection>.parquet"),
+    region: str = typer.Option(None, help="Only records in this region id"),
+    include_archived: bool = typer.Option(False, help="Include archived health reports"),
+    batch_size: int = typer.Option(10000, help="Rows per record batch and row group"),
+):
+    """Export a collection to a Parquet file with typed columns."""
+    import export
+
+    if collection not in export.COLUMNS:
+        raise typer.BadParameter(f"choose one of {', '.join(export.COLUMNS)}", param_hint="COLLECTION")
+    path = output or f"{collection}.parquet"
+    query = {"region_ids": region} if region else {}
+
+    async def write(server):
+        return await export.write_parquet(server.db, collection, path, query, batch_size, include_archived)
+
+    rows = run(write)
+    typer.echo(f"Wrote {rows} {collection} rows to {path}")
+
+
+@app.command("read-routing")
+def read_routing_report():
+    """Show each route's read preference and the replica set member serving it."""
+    import read_routing
+
+    async def probe(server):
+        await server.db.command("ping")
+        results = []
+        for route in read_routing.ROUTES:
+            cursor = read_routing.database(server.db, route).health_reports.find({}, {"_id": 1}).limit(1)
+            await cursor.to_list(1)
+            results.append((route, read_routing.mode_for(route), cursor.address))
+        return results
+
+    for route, mode, address in run(probe):
+        host = f"{address[0]}:{address[1]}" if address else "-"
+        typer.echo(f"{route:<28} {mode:<20} {host}")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,389 @@
+"""Notification fan-out to responders near critical reports and unsafe water.
+
+``Dispatcher.notify`` finds doctors and clinic staff within
+``NOTIFY_RADIUS_KM`` of an event and writes one message per recipient and
+channel to the ``notification_outbox`` collection; nothing is delivered on
+the request path. Worker tasks claim pending messages in batches, send them
+through the channel's notifier under a per-channel rate limit and mark them
+sent, or reschedule them with exponential backoff until
+``NOTIFY_MAX_ATTEMPTS`` is reached. The outbox is persisted, so messages
+survive restarts, claims abandoned by a crashed worker are retaken after
+``CLAIM_TIMEOUT_SECONDS`` and several uvicorn workers can share it.
+
+Outbox ids are derived from the event and recipient, so notifying the same
+event twice does not send twice.
+
+Notifiers are chosen per channel with ``NOTIFY_SMS`` / ``NOTIFY_EMAIL``:
+``stub`` (the default; logs and keeps recent messages in memory),
+``webhook`` (POST to an SMS or email gateway) or ``smtp`` (email only).
+"""
+import asyncio
+import logging
+import math
+import os
+import smtplib
+import socket
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+import ids
+import metrics
+import regions
+
+logger = logging.getLogger(__name__)
+
+OUTBOX = "notification_outbox"
+CHANNELS = ("sms", "email")
+RESPONDER_ROLES = ("doctor", "clinic_staff")
+
+RADIUS_KM = float(os.environ.get("NOTIFY_RADIUS_KM", "10"))
+WORKERS = int(os.environ.get("NOTIFY_WORKERS", "2"))  # per channel
+BATCH_SIZE = int(os.environ.get("NOTIFY_BATCH_SIZE", "50"))
+MAX_ATTEMPTS = int(os.environ.get("NOTIFY_MAX_ATTEMPTS", "5"))
+RETRY_BASE_SECONDS = float(os.environ.get("NOTIFY_RETRY_BASE_SECONDS", "30"))
+POLL_SECONDS = float(os.environ.get("NOTIFY_POLL_SECONDS", "5"))
+CLAIM_TIMEOUT_SECONDS = 300
+# Messages per second per channel; 0 disables the limit
+RATES = {channel: float(os.environ.get(f"NOTIFY_RATE_{channel.upper()}", "5")) for channel in CHANNELS}
+KM_PER_DEGREE = 111.32
+
+NOTIFICATIONS = metrics.REGISTRY.register(metrics.Counter(
+    "notifications_total",
+    "Outbox messages by channel and outcome",
+    ("channel", "outcome"),
+))
+
+
+def _text(value) -> str:
+    return str(getattr(value, "value", value))
+
+
+class Notifier:
+    """Delivers a batch of outbox messages on one channel; raising retries the whole batch."""
+
+    async def send(self, messages: list):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class StubNotifier(Notifier):
+    """Logs messages instead of sending them and keeps the most recent ones for inspection."""
+
+    def __init__(self, channel: str, keep: int = 1000):
+        self.channel = channel
+        self.sent = deque(maxlen=keep)
+
+    async def send(self, messages: list):
+        for message in messages:
+            self.sent.append(message)
+            logger.info(f"[{self.channel} stub] to {message['address']}: {message['subject']}")
+
+
+class WebhookNotifier(Notifier):
+    """POSTs each batch as JSON to a gateway that fans it out (typically an SMS provider)."""
+
+    def __init__(self, url: str, token: str = None, timeout: float = 10.0):
+        import httpx
+
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self.url = url
+        self.client = httpx.AsyncClient(timeout=timeout, headers=headers)
+
+    async def send(self, messages: list):
+        payload = [{"to": message["address"], "subject": message["subject"], "text": message["body"]} for message in messages]
+        response = await self.client.post(self.url, json={"messages": payload})
+        response.raise_for_status()
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class SmtpNotifier(Notifier):
+    """Sends a batch of emails over one SMTP connection, off the event loop."""
+
+    def __init__(self, host: str, port: int, sender: str, username: str = None, password: str = None):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+
+    async def send(self, messages: list):
+        await asyncio.to_thread(self._send_all, messages)
+
+    def _send_all(self, messages: list):
+        with smtplib.SMTP(self.host, self.port, timeout=30) as smtp:
+            if self.username:
+                smtp.starttls()
+                smtp.login(self.username, self.password)
+            for message in messages:
+                email = EmailMessage()
+                email["From"] = self.sender
+                email["To"] = message["address"]
+                email["Subject"] = message["subject"]
+                email.set_content(message["body"])
+                smtp.send_message(email)
+
+
+def notifier_from_env(channel: str) -> Notifier:
+    kind = os.environ.get(f"NOTIFY_{channel.upper()}", "stub")
+    if kind == "stub":
+        return StubNotifier(channel)
+    if kind == "webhook":
+        return WebhookNotifier(os.environ[f"NOTIFY_{channel.upper()}_URL"], os.environ.get(f"NOTIFY_{channel.upper()}_TOKEN"))
+    if kind == "smtp" and channel == "email":
+        return SmtpNotifier(
+            os.environ.get("SMTP_HOST", "localhost"),
+            int(os.environ.get("SMTP_PORT", "25")),
+            os.environ.get("SMTP_FROM", "alerts@localhost"),
+            os.environ.get("SMTP_USERNAME"),
+            os.environ.get("SMTP_PASSWORD"),
+        )
+    raise ValueError(f"Unknown notifier {kind!r} for channel {channel}")
+
+
+class RateLimiter:
+    """Token bucket refilled at ``rate`` per second.
+
+    A batch larger than the bucket may overdraw it; the next batch then waits
+    until the debt is repaid, so the long-run rate still holds.
+    """
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.capacity = max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, count: int = 1):
+        async with self.lock:
+            self._refill()
+            if self.tokens < 0:
+                await asyncio.sleep(-self.tokens / self.rate)
+                self._refill()
+            self.tokens -= count
+
+
+def report_event(report: dict) -> dict:
+    location = report.get("location") or {}
+    address = location.get("address") or "an unknown location"
+    report_type = _text(report.get("report_type"))
+    return {
+        "kind": "critical_report",
+        "id": ids.to_str(report["id"]),
+        "location": location,
+        "subject": f"Critical {report_type} report near {address}",
+        "body": f"A critical {report_type} report was filed at {address}: {(report.get('symptoms') or '')[:300]}",
+    }
+
+
+def water_event(reading: dict) -> dict:
+    location = reading.get("location") or {}
+    address = location.get("address") or "an unknown location"
+    return {
+        "kind": "unsafe_water",
+        "id": ids.to_str(reading["id"]),
+        "location": location,
+        "subject": f"Unsafe water reading at {address}",
+        "body": (
+            f"Water tested at {address} is unsafe: TDS {reading.get('tds_value')}, pH {reading.get('ph_level')}, "
+            f"turbidity {reading.get('turbidity')}, chlorine {reading.get('chlorine_level')}."
+        ),
+    }
+
+
+async def responders_near(db, lat: float, lng: float, radius_km: float = RADIUS_KM) -> list:
+    """Doctors and clinic staff within ``radius_km`` as ``{channel, address, name}``, one per address."""
+    dlat = radius_km / KM_PER_DEGREE
+    dlng = dlat / max(math.cos(math.radians(lat)), 0.01)
+    box = {"location.lat": {"$gte": lat - dlat, "$lte": lat + dlat}, "location.lng": {"$gte": lng - dlng, "$lte": lng + dlng}}
+    projection = {"_id": 0, "name": 1, "phone": 1, "email": 1, "location": 1}
+    people = await db.doctors.find(box, projection).to_list(None)
+    people += await db.users.find({**box, "role": {"$in": list(RESPONDER_ROLES)}}, projection).to_list(None)
+
+    recipients, seen = [], set()
+    for person in people:
+        location = person["location"]
+        if regions.haversine_km(lat, lng, location["lat"], location["lng"]) > radius_km:
+            continue
+        for channel, field in (("sms", "phone"), ("email", "email")):
+            address = person.get(field)
+            if address and (channel, address) not in seen:
+                seen.add((channel, address))
+                recipients.append({"channel": channel, "address": address, "name": person.get("name")})
+    return recipients
+
+
+async def enqueue(db, event: dict, channels=CHANNELS) -> int:
+    """Write outbox messages for ``event`` to every nearby responder; returns the number queued."""
+    location = event["location"]
+    if location.get("lat") is None or location.get("lng") is None:
+        logger.info(f"Not notifying {event['kind']} {event['id']}: no coordinates")
+        return 0
+    now = datetime.now(timezone.utc)
+    messages = [
+        {
+            "_id": f"{event['kind']}:{event['id']}:{recipient['channel']}:{recipient['address']}",
+            "channel": recipient["channel"],
+            "address": recipient["address"],
+            "name": recipient["name"],
+            "subject": event["subject"],
+            "body": event["body"],
+            "event": {"kind": event["kind"], "id": event["id"]},
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now,
+        }
+        for recipient in await responders_near(db, location["lat"], location["lng"])
+        if recipient["channel"] in channels
+    ]
+    if not messages:
+        return 0
+    try:
+        await db[OUTBOX].insert_many(messages, ordered=False)
+        duplicates = set()
+    except BulkWriteError as e:
+        # Already queued by an earlier attempt for the same event
+        duplicates = {error["index"] for error in e.details["writeErrors"] if error["code"] == 11000}
+        if len(duplicates) != len(e.details["writeErrors"]):
+            raise
+    queued = [message for index, message in enumerate(messages) if index not in duplicates]
+    for message in queued:
+        NOTIFICATIONS.inc(channel=message["channel"], outcome="queued")
+    return len(queued)
+
+
+class Dispatcher:
+    def __init__(self, notifiers: dict = None, workers: int = WORKERS, batch_size: int = BATCH_SIZE, rates: dict = None):
+        self.notifiers = notifiers
+        self.workers = workers
+        self.batch_size = batch_size
+        self.rates = rates or RATES
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.db = None
+        self._limiters = {}
+        self._wake = {}
+        self._tasks = []
+
+    async def start(self, db):
+        self.db = db
+        if self.notifiers is None:
+            self.notifiers = {channel: notifier_from_env(channel) for channel in CHANNELS}
+        self._limiters = {channel: RateLimiter(self.rates[channel]) for channel in self.notifiers if self.rates.get(channel)}
+        self._wake = {channel: asyncio.Event() for channel in self.notifiers}
+        self._tasks = [
+            asyncio.create_task(self._worker(channel)) for channel in self.notifiers for _ in range(self.workers)
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for notifier in (self.notifiers or {}).values():
+            await notifier.close()
+
+    def wake(self):
+        for event in self._wake.values():
+            event.set()
+
+    async def notify(self, event: dict) -> int:
+        """Queue ``event`` for nearby responders and wake the workers; safe to run as a background task."""
+        try:
+            queued = await enqueue(self.db, event, tuple(self.notifiers or CHANNELS))
+        except Exception:
+            logger.exception(f"Could not queue notifications for {event['kind']} {event['id']}")
+            return 0
+        if queued:
+            self.wake()
+        return queued
+
+    async def _worker(self, channel: str):
+        wake = self._wake[channel]
+        while True:
+            try:
+                handled = await self.dispatch_batch(channel)
+            except Exception as e:
+                logger.warning(f"Notification worker for {channel} failed: {str(e)}")
+                handled = 0
+            if not handled:
+                try:
+                    await asyncio.wait_for(wake.wait(), POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                wake.clear()
+
+    async def _claim(self, channel: str) -> list:
+        now = datetime.now(timezone.utc)
+        claimable = [
+            {"status": "pending", "next_attempt_at": {"$lte": now}},
+            {"status": "sending", "claimed_at": {"$lte": now - timedelta(seconds=CLAIM_TIMEOUT_SECONDS)}},
+        ]
+        candidates = await self.db[OUTBOX].find({"channel": channel, "$or": claimable}, {"_id": 1}) \
+            .sort("next_attempt_at", 1).limit(self.batch_size).to_list(self.batch_size)
+        if not candidates:
+            return []
+        # The status condition makes the claim atomic per message when workers race for the same candidates
+        claim = f"{self.owner}:{uuid.uuid4().hex}"
+        await self.db[OUTBOX].update_many(
+            {"_id": {"$in": [candidate["_id"] for candidate in candidates]}, "$or": claimable},
+            {"$set": {"status": "sending", "claim": claim, "claimed_at": now}},
+        )
+        return await self.db[OUTBOX].find({"claim": claim, "status": "sending"}).to_list(None)
+
+    async def dispatch_batch(self, channel: str) -> int:
+        """Claim and deliver one batch; returns the number of messages handled."""
+        batch = await self._claim(channel)
+        if not batch:
+            return 0
+        if channel in self._limiters:
+            await self._limiters[channel].acquire(len(batch))
+        try:
+            await self.notifiers[channel].send(batch)
+        except Exception as e:
+            await self._retry(channel, batch, str(e))
+            return len(batch)
+        await self.db[OUTBOX].update_many(
+            {"_id": {"$in": [message["_id"] for message in batch]}, "claim": batch[0]["claim"]},
+            {"$set": {"status": "sent", "sent_at": datetime.now(timezone.utc)}, "$inc": {"attempts": 1}},
+        )
+        NOTIFICATIONS.inc(len(batch), channel=channel, outcome="sent")
+        return len(batch)
+
+    async def _retry(self, channel: str, batch: list, error: str):
+        now = datetime.now(timezone.utc)
+        updates = []
+        for message in batch:
+            attempts = message["attempts"] + 1
+            if attempts >= MAX_ATTEMPTS:
+                change = {"status": "failed", "attempts": attempts, "last_error": error}
+                NOTIFICATIONS.inc(channel=channel, outcome="failed")
+            else:
+                retry_at = now + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+                change = {"status": "pending", "attempts": attempts, "last_error": error, "next_attempt_at": retry_at}
+                NOTIFICATIONS.inc(channel=channel, outcome="retried")
+            updates.append(UpdateOne({"_id": message["_id"], "claim": message["claim"]}, {"$set": change}))
+        await self.db[OUTBOX].bulk_write(updates, ordered=False)
+        logger.warning(f"Delivery of {len(batch)} {channel} notifications failed: {error}")
+
+
+async def ensure_indexes(db):
+    await db[OUTBOX].create_index([("channel", 1), ("status", 1), ("next_attempt_at", 1)])
+    await db[OUTBOX].create_index([("claim", 1)], sparse=True)
+    for collection in ("doctors", "users"):
+        await db[collection].create_index([("location.lat", 1), ("location.lng", 1)])
@@ -0,0 +1,80 @@
+"""Opt-in sampling profiler for individual requests.
+
+Profiling is only available when ``PROFILER_TOKEN`` is set; otherwise the
+middleware is never installed and requests pay nothing for it. A request
+is profiled when it carries ``X-Profile-Token: <token>`` together with either
+``?profile=1`` or an ``X-Profile: 1`` header. The pyinstrument report is
+written to ``PROFILE_DIR`` and its id is returned in ``X-Profile-Id``.
+"""
+import asyncio
+import hmac
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+from urllib.parse import parse_qs
+
+PROFILER_TOKEN = os.environ.get("PROFILER_TOKEN", "")
+PROFILE_DIR = Path(os.environ.get("PROFILE_DIR", Path(__file__).parent / "profiles"))
+SAMPLE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", "0.001"))
+
+_PROFILE_ID = re.compile(r"^[0-9]+-[0-9a-f]{32}$")
+
+
+def is_enabled() -> bool:
+    return bool(PROFILER_TOKEN)
+
+
+def token_matches(token: str) -> bool:
+    return bool(PROFILER_TOKEN) and hmac.compare_digest(token or "", PROFILER_TOKEN)
+
+
+def profile_path(profile_id: str, suffix: str = ".html"):
+    """Location of a stored profile, or None for malformed ids."""
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    return PROFILE_DIR / f"{profile_id}{suffix}"
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    def _wants_profile(self, scope) -> bool:
+        headers = dict(scope["headers"])
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        requested = "1" in query.get("profile", []) or headers.get(b"x-profile") == b"1"
+        if not requested:
+            return False
+        return token_matches(headers.get(b"x-profile-token", b"").decode("latin-1"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        from pyinstrument import Profiler
+
+        profile_id = f"{int(time.time())}-{uuid.uuid4().hex}"
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        profiler = Profiler(interval=SAMPLE_INTERVAL, async_mode="enabled")
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            # Rendering and writing the report is slow enough to stall other requests on the loop
+            await asyncio.to_thread(_save, profile_id, profiler)
+
+
+def _save(profile_id: str, profiler):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    profile_path(profile_id).write_text(profiler.output_html(), encoding="utf-8")
+    profile_path(profile_id, ".txt").write_text(profiler.output_text(unicode=True), encoding="utf-8")
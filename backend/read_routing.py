@@ -0,0 +1,64 @@
+"""Per-route read preferences for read-only endpoints.
+
+Heavy read-only endpoints (dashboard stats, analytics, exports) default to
+``secondaryPreferred`` with bounded staleness so dashboard polling is served
+by idle secondaries; everything else, including read-your-own-write paths,
+reads from the primary. Writes are unaffected: they always go to the
+primary regardless of read preference.
+
+Each route can be overridden with ``READ_PREFERENCE_<ROUTE>``, e.g.
+``READ_PREFERENCE_DASHBOARD_STATS=primary``. Staleness is bounded by
+``READ_MAX_STALENESS_SECONDS`` (MongoDB requires at least 90 seconds); set
+it to ``-1`` for no bound. On a standalone server every mode except
+``secondary`` behaves like ``primary``.
+"""
+import os
+
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+MAX_STALENESS_SECONDS = int(os.environ.get("READ_MAX_STALENESS_SECONDS", "90"))
+
+ROUTES = {
+    "dashboard_stats": "secondaryPreferred",
+    "report_trends": "secondaryPreferred",
+    "water_disease_correlation": "secondaryPreferred",
+    "export": "secondaryPreferred",
+    "reports_list": "primary",
+    "water_quality_list": "primary",
+    "doctors_list": "primary",
+    "medical_stock_list": "primary",
+    "users_list": "primary",
+}
+
+
+def mode_for(route: str) -> str:
+    mode = os.environ.get(f"READ_PREFERENCE_{route.upper()}", ROUTES.get(route, "primary"))
+    if mode not in MODES:
+        raise ValueError(f"Unknown read preference {mode!r} for {route}; choose one of {', '.join(MODES)}")
+    return mode
+
+
+_preferences = {}
+
+
+def preference(route: str):
+    """pymongo read preference for ``route``, resolved once per process."""
+    if route not in _preferences:
+        mode = mode_for(route)
+        _preferences[route] = Primary() if mode == "primary" else MODES[mode](max_staleness=MAX_STALENESS_SECONDS)
+    return _preferences[route]
+
+
+def database(db, route: str):
+    """``db`` with the read preference configured for ``route``."""
+    read_preference = preference(route)
+    if read_preference == db.read_preference:
+        return db
+    return db.with_options(read_preference=read_preference)
@@ -0,0 +1,249 @@
+"""Administrative region hierarchy (state > district > block > village).
+
+Regions are loaded from a local gazetteer (``GAZETTEER_PATH``, default
+``data/gazetteer.json``). At write time every record's free-text address is
+resolved to region ids, stored twice:
+
+* ``region`` - ``{"state": id, "district": id, "block": id, "village": id}``
+  for display, and
+* ``region_ids`` - the same ids as a list, covered by a multikey index so a
+  query scoped to any level (``{"region_ids": "HR-SNP"}``) is an index scan
+  over that region's records only.
+"""
+import json
+import math
+import os
+import re
+from pathlib import Path
+
+LEVELS = ("state", "district", "block", "village")
+GAZETTEER_PATH = Path(os.environ.get("GAZETTEER_PATH", Path(__file__).parent / "data" / "gazetteer.json"))
+SNAP_KM = float(os.environ.get("REGION_SNAP_KM", "15"))
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    return _NON_WORD.sub(" ", (text or "").lower()).strip()
+
+
+def haversine_km(lat1, lng1, lat2, lng2) -> float:
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 6371.0 * 2 * math.asin(math.sqrt(a))
+
+
+class NameTrie:
+    """Character trie over normalized region names and aliases."""
+
+    _END = "\0"
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, name: str, region_id: str):
+        node = self.root
+        for char in name:
+            node = node.setdefault(char, {})
+        ids = node.setdefault(self._END, [])
+        if region_id not in ids:
+            ids.append(region_id)
+
+    def longest_match(self, text: str, start: int):
+        """Longest name starting at ``start`` that ends on a word boundary.
+
+        Returns ``(end, region_ids)`` or ``(start, [])`` when nothing matches.
+        """
+        node, best = self.root, (start, [])
+        for position in range(start, len(text)):
+            node = node.get(text[position])
+            if node is None:
+                break
+            if self._END in node and (position + 1 == len(text) or text[position + 1] == " "):
+                best = (position + 1, node[self._END])
+        return best
+
+    def complete(self, prefix: str, limit: int = 10):
+        """Region ids of names starting with ``prefix``, shortest names first."""
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        found, frontier = [], [node]
+        while frontier and len(found) < limit:
+            next_frontier = []
+            for current in frontier:
+                for char, child in sorted(current.items()):
+                    if char == self._END:
+                        found.extend(region_id for region_id in child if region_id not in found)
+                    else:
+                        next_frontier.append(child)
+            frontier = next_frontier
+        return found[:limit]
+
+
+class Gazetteer:
+    def __init__(self, regions, version=""):
+        self.version = version
+        self.regions = {region["id"]: region for region in regions}
+        self.children = {}
+        self.names = NameTrie()
+        for region in regions:
+            self.children.setdefault(region.get("parent"), []).append(region["id"])
+            for name in [region["name"], *region.get("aliases", [])]:
+                self.names.insert(normalize(name), region["id"])
+        self.villages = [region for region in regions if region["level"] == "village"]
+
+    @classmethod
+    def load(cls, path=GAZETTEER_PATH):
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        return cls(data["regions"], data.get("version", ""))
+
+    def ancestors(self, region_id):
+        """Ids from the state down to ``region_id``."""
+        chain = []
+        while region_id:
+            chain.append(region_id)
+            region_id = self.regions[region_id].get("parent")
+        return list(reversed(chain))
+
+    def matches(self, address: str):
+        """Region ids named in ``address``, grouped by level.
+
+        ``found["mentions"]`` lists the ids each name in the address can refer
+        to, e.g. ``["HR-SNP", "HR-SNP-SNP"]`` for "Sonipat".
+        """
+        text = normalize(address)
+        found = {level: [] for level in LEVELS}
+        found["mentions"] = []
+        start = 0
+        while start < len(text):
+            end, region_ids = self.names.longest_match(text, start)
+            if region_ids:
+                found["mentions"].append(region_ids)
+            for region_id in region_ids:
+                level = found[self.regions[region_id]["level"]]
+                if region_id not in level:
+                    level.append(region_id)
+            # Continue after the matched name, or at the next word
+            next_word = text.find(" ", max(end, start + 1))
+            start = len(text) if next_word == -1 else next_word + 1
+        return found
+
+    def nearest_village(self, lat, lng, max_km=SNAP_KM):
+        best, best_km = None, max_km
+        for village in self.villages:
+            distance = haversine_km(lat, lng, village["lat"], village["lng"])
+            if distance <= best_km:
+                best, best_km = village["id"], distance
+        return best
+
+    def related(self, region_id, other_id) -> bool:
+        """Whether one region contains the other (or they are the same)."""
+        return region_id in self.ancestors(other_id) or other_id in self.ancestors(region_id)
+
+    def consistent(self, region_id, mentions) -> bool:
+        """Whether every name in the address can refer to ``region_id`` or a region containing or within it."""
+        return all(any(self.related(region_id, other) for other in mention) for mention in mentions)
+
+    def pick(self, found, lat=None, lng=None):
+        """Most specific region id in a ``matches`` result, or None.
+
+        A candidate is dropped when the address also names a region it is not
+        part of, e.g. "Village Sisana, Gurugram District" when Sisana is in
+        Sonipat; if every candidate conflicts there is no match.
+        """
+        mentioned = set(found["district"]) | set(found["block"]) | set(found["state"])
+        mentions = found.get("mentions", [])
+        for level in ("village", "block", "district", "state"):
+            candidates = [region_id for region_id in found[level] if self.consistent(region_id, mentions)]
+            if not candidates:
+                continue
+            if len(candidates) > 1:
+                # Prefer candidates whose ancestors are also named, then the closest one
+                def score(region_id):
+                    overlap = len(mentioned & set(self.ancestors(region_id)))
+                    region = self.regions[region_id]
+                    distance = (
+                        haversine_km(lat, lng, region["lat"], region["lng"])
+                        if lat is not None and lng is not None else 0.0
+                    )
+                    return (-overlap, distance)
+                candidates = sorted(candidates, key=score)
+            return candidates[0]
+        return None
+
+    def resolve(self, location: dict):
+        """Most specific region id for a ``location`` dict, or None."""
+        location = location or {}
+        lat, lng = location.get("lat"), location.get("lng")
+        region_id = self.pick(self.matches(location.get("address") or ""), lat, lng)
+        if region_id is None and lat is not None and lng is not None:
+            region_id = self.nearest_village(float(lat), float(lng))
+        return region_id
+
+    def region_fields(self, location: dict) -> dict:
+        """``region`` and ``region_ids`` fields to store alongside a record."""
+        region_id = self.resolve(location)
+        if region_id is None:
+            return {"region": None, "region_ids": []}
+        chain = self.ancestors(region_id)
+        region = {level: None for level in LEVELS}
+        for ancestor in chain:
+            region[self.regions[ancestor]["level"]] = ancestor
+        return {"region": region, "region_ids": chain}
+
+
+_gazetteer = None
+
+
+def gazetteer() -> Gazetteer:
+    global _gazetteer
+    if _gazetteer is None:
+        _gazetteer = Gazetteer.load()
+    return _gazetteer
+
+
+def region_fields(location: dict) -> dict:
+    return gazetteer().region_fields(location)
+
+
+REGION_INDEXES = {
+    "health_reports": [("region_ids", 1), ("date_reported", -1)],
+    "water_quality": [("region_ids", 1), ("test_date", -1)],
+    "medical_stock": [("region_ids", 1), ("last_updated", -1)],
+    "doctors": [("region_ids", 1)],
+    "users": [("region_ids", 1)],
+}
+
+
+async def ensure_indexes(db):
+    for collection, keys in REGION_INDEXES.items():
+        await db[collection].create_index(keys)
+
+
+# Records never resolved, or stored with an empty list; unresolvable locations are simply retried
+MISSING_REGIONS = {"$or": [{"region_ids": {"$exists": False}}, {"region_ids": {"$size": 0}}]}
+
+
+async def assign_missing(db, batch_size: int = 1000) -> dict:
+    """Resolve regions for records without region ids (written before regions existed, or bulk loaded)."""
+    from pymongo import UpdateOne
+
+    updated = {}
+    for collection in REGION_INDEXES:
+        count = 0
+        batch = []
+        async for doc in db[collection].find(MISSING_REGIONS, {"_id": 1, "location": 1}):
+            batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": region_fields(doc.get("location"))}))
+            if len(batch) >= batch_size:
+                await db[collection].bulk_write(batch, ordered=False)
+                count += len(batch)
+                batch = []
+        if batch:
+            await db[collection].bulk_write(batch, ordered=False)
+            count += len(batch)
+        updated[collection] = count
+    return updated
@@ -0,0 +1,199 @@
+"""Report status workflow and the active-case counters behind the dashboard.
+
+Reports move between ``active``, ``under_investigation`` and ``resolved``
+along ``TRANSITIONS``. ``transition`` applies one target status to a batch
+of reports with a single ``bulk_write``; each report's update only applies
+if its status is still the one that was read, so a report changed
+concurrently is left alone and reported as rejected. Reports already moved
+to the archive tier are rejected too; they stay resolved. The active-case
+counters are adjusted by the net change of the updates that applied, and
+one audit entry per batch is written to ``report_status_audit``.
+
+``report_counters`` holds the number of active, non-duplicate reports
+overall (``_id: "all"``) and per region id, so the dashboard reads one small
+document instead of counting ``health_reports``. Counters are adjusted
+incrementally on report creation and status changes; ``reconcile``
+recounts them on a schedule and applies the difference, repairing drift
+from concurrent edits. Until the first reconciliation ``active_cases`` returns
+None and callers fall back to counting.
+"""
+import logging
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+
+from pymongo import ReplaceOne, UpdateOne
+
+import archive
+import ids
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = "report_counters"
+AUDIT = "report_status_audit"
+RECONCILED = "_reconciled"
+ALL_REGIONS = "all"
+
+STATUSES = ("active", "under_investigation", "resolved")
+TRANSITIONS = {
+    "active": {"under_investigation", "resolved"},
+    "under_investigation": {"active", "resolved"},
+    "resolved": {"active"},
+}
+MAX_BATCH = 1000
+
+
+def counter_keys(report: dict):
+    return [ALL_REGIONS, *report.get("region_ids", [])]
+
+
+def counts_as_active(report: dict) -> bool:
+    return report.get("status") == "active" and not report.get("duplicate_of")
+
+
+async def adjust_active(db, deltas: Counter):
+    """Apply ``{counter key: delta}`` to the active-case counters."""
+    updates = [UpdateOne({"_id": key}, {"$inc": {"active": delta}}, upsert=True) for key, delta in deltas.items() if delta]
+    if updates:
+        await db[COUNTERS].bulk_write(updates, ordered=False)
+
+
+async def record_created(db, report: dict):
+    if counts_as_active(report):
+        await adjust_active(db, Counter({key: 1 for key in counter_keys(report)}))
+
+
+async def active_cases(db, region: str = None):
+    """Active, non-duplicate reports in ``region`` (or overall), or None before reconciliation."""
+    if not await db[COUNTERS].find_one({"_id": RECONCILED}):
+        return None
+    counter = await db[COUNTERS].find_one({"_id": region or ALL_REGIONS})
+    return max(counter["active"], 0) if counter else 0
+
+
+async def transition(db, report_ids, to_status: str, actor: str, note: str = None, unchanged_since: str = None) -> dict:
+    """Move ``report_ids`` to ``to_status``; returns the audit entry for the batch.
+
+    With ``unchanged_since`` (an ISO time), reports whose status changed after
+    it are rejected, so a change that was queued while the database was
+    unavailable does not undo later ones.
+    """
+    if to_status not in STATUSES:
+        raise ValueError(f"Unknown status {to_status!r}")
+    report_ids = list(dict.fromkeys(report_ids))
+    stored = [ids.to_mongo(report_id) for report_id in report_ids]
+    query = {"id": {"$in": stored + [str(report_id) for report_id in report_ids]}}
+    projection = {"_id": 1, "id": 1, "status": 1, "status_changed_at": 1, "duplicate_of": 1, "region_ids": 1}
+    reports = {ids.to_str(report["id"]): report for report in await db.health_reports.find(query, projection).to_list(None)}
+    archived = set()
+    if len(reports) < len(report_ids):
+        archived = {ids.to_str(report["id"]) for report in await db[archive.COLLECTION].find(query, {"id": 1}).to_list(None)}
+
+    sources = {status for status, targets in TRANSITIONS.items() if to_status in targets}
+    moved, rejected = [], []
+    for report_id in report_ids:
+        report = reports.get(report_id)
+        if report is None and report_id in archived:
+            rejected.append({"report_id": report_id, "reason": "archived reports cannot change status"})
+        elif report is None:
+            rejected.append({"report_id": report_id, "reason": "not found"})
+        elif unchanged_since and (report.get("status_changed_at") or "") > unchanged_since:
+            rejected.append({"report_id": report_id, "reason": "status changed after this request was made"})
+        elif report.get("status") == to_status:
+            rejected.append({"report_id": report_id, "reason": f"already {to_status}"})
+        elif report.get("status") not in sources:
+            rejected.append({"report_id": report_id, "reason": f"cannot move from {report.get('status')} to {to_status}"})
+        else:
+            moved.append(report)
+
+    changed_at = datetime.now(timezone.utc)
+    batch_id = str(uuid.uuid4())
+    if moved:
+        # Each update is conditional on the status as read, so a concurrent change wins over this batch
+        result = await db.health_reports.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": report["_id"], "status": report.get("status")},
+                    {"$set": {"status": to_status, "status_changed_at": changed_at.isoformat(), "status_batch_id": batch_id}},
+                )
+                for report in moved
+            ],
+            ordered=False,
+        )
+        if result.modified_count < len(moved):
+            applied = await db.health_reports.find(
+                {"_id": {"$in": [report["_id"] for report in moved]}, "status_batch_id": batch_id}, {"_id": 1}
+            ).to_list(None)
+            applied = {report["_id"] for report in applied}
+            rejected.extend(
+                {"report_id": ids.to_str(report["id"]), "reason": "status changed concurrently"}
+                for report in moved if report["_id"] not in applied
+            )
+            moved = [report for report in moved if report["_id"] in applied]
+        deltas = Counter()
+        for report in moved:
+            was_active = counts_as_active(report)
+            is_active = counts_as_active({**report, "status": to_status})
+            for key in counter_keys(report):
+                deltas[key] += int(is_active) - int(was_active)
+        await adjust_active(db, deltas)
+
+    entry = {
+        "_id": batch_id,
+        "batch_id": batch_id,
+        "changed_at": changed_at,
+        "actor": actor,
+        "note": note,
+        "status": to_status,
+        "requested": len(report_ids),
+        "modified": len(moved),
+        "moved": [{"report_id": ids.to_str(report["id"]), "from_status": report.get("status")} for report in moved],
+        "rejected": rejected,
+    }
+    await db[AUDIT].insert_one(entry)
+    return entry
+
+
+async def count_active(db) -> dict:
+    """Active, non-duplicate reports per counter key, counted from ``health_reports``."""
+    pipeline = [
+        {"$match": {"status": "active", "duplicate_of": None}},
+        {"$project": {"keys": {"$concatArrays": [[ALL_REGIONS], {"$ifNull": ["$region_ids", []]}]}}},
+        {"$unwind": "$keys"},
+        {"$group": {"_id": "$keys", "active": {"$sum": 1}}},
+    ]
+    return {row["_id"]: row["active"] async for row in db.health_reports.aggregate(pipeline)}
+
+
+async def _observed(db) -> dict:
+    counters = db[COUNTERS].find({"_id": {"$ne": RECONCILED}}, {"active": 1})
+    return {counter["_id"]: counter.get("active", 0) async for counter in counters}
+
+
+async def reconcile(db) -> dict:
+    """Correct active-case counters to a fresh count of ``health_reports``; returns ``{key: count}``.
+
+    Corrections are applied as ``$inc`` so status changes made meanwhile are
+    kept. Counters that moved while the reports were being counted are left
+    for the next run, since the count may or may not include that change.
+    """
+    before = await _observed(db)
+    counts = await count_active(db)
+    observed = await _observed(db)
+    now = datetime.now(timezone.utc)
+    updates, moved = [], []
+    for key in set(before) | set(observed) | set(counts) | {ALL_REGIONS}:
+        if before.get(key, 0) != observed.get(key, 0):
+            moved.append(key)
+            continue
+        correction = counts.get(key, 0) - observed.get(key, 0)
+        updates.append(UpdateOne({"_id": key}, {"$inc": {"active": correction}, "$set": {"reconciled_at": now}}, upsert=True))
+    updates.append(ReplaceOne({"_id": RECONCILED}, {"at": now}, upsert=True))
+    await db[COUNTERS].bulk_write(updates, ordered=False)
+    if moved:
+        logger.info(f"Counters {sorted(moved)} changed during reconciliation; correcting them next run")
+    return counts
+
+
+async def ensure_indexes(db):
+    await db[AUDIT].create_index([("changed_at", -1)])
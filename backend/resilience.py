@@ -0,0 +1,419 @@
+"""Circuit breaker, stale read cache and write spool around the database.
+
+``DatabaseGuard.read`` wraps a read endpoint: calls are bounded by
+``DB_TIMEOUT_SECONDS`` and each successful response body is kept in an LRU
+cache keyed by route and parameters, capped at ``STALE_CACHE_SIZE`` entries
+and ``STALE_CACHE_BYTES`` in total. When the database is unavailable
+(connection failures, server selection or execution timeouts) the breaker
+counts the failure, and after ``CIRCUIT_FAILURE_THRESHOLD`` consecutive
+failures it opens: reads are answered from the cache without touching Mongo,
+marked with ``Age``, ``Warning: 110`` and ``X-Data-Stale: true`` headers, or
+with 503 when nothing is cached. After ``CIRCUIT_RESET_SECONDS`` one request
+is let through as a probe; success closes the breaker again.
+
+``DatabaseGuard.write`` wraps a create endpoint: when the database is
+unavailable the validated payload is appended to a local JSONL spool
+(fsynced) and the client gets 202. ``replay`` re-runs spooled writes in
+order through the original handler once the database answers again.
+
+Every guarded write gets a ``write_id`` before its first attempt, which is
+kept in the spool. Handlers create their record under that id and insert
+it with an upsert, so replaying a write that had partly applied finds the
+existing record instead of creating a second one. ``spooled_at`` tells a
+replayed handler when the write was originally received.
+
+The spool is shared by every worker on the host: appends and rewrites hold
+an ``flock`` on the spool file, and only one worker replays at a time.
+"""
+import asyncio
+import contextvars
+import fcntl
+import functools
+import inspect
+import json
+import logging
+import math
+import os
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+from fastapi import BackgroundTasks, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+from pymongo.errors import ConnectionFailure, ExecutionTimeout
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+import ids
+import metrics
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT_SECONDS = float(os.environ.get("DB_TIMEOUT_SECONDS", "5"))
+FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", "5"))
+RESET_SECONDS = float(os.environ.get("CIRCUIT_RESET_SECONDS", "10"))
+STALE_CACHE_SIZE = int(os.environ.get("STALE_CACHE_SIZE", "256"))
+STALE_CACHE_BYTES = int(os.environ.get("STALE_CACHE_BYTES", str(32 * 1024 * 1024)))
+STALE_MAX_AGE_SECONDS = float(os.environ.get("STALE_MAX_AGE_SECONDS", "21600"))
+SPOOL_PATH = Path(os.environ.get("WRITE_SPOOL_PATH", Path(__file__).parent / "spool" / "writes.jsonl"))
+REPLAY_BATCH = 100
+STALE_HEADER = "X-Data-Stale"
+
+# Errors meaning the database could not be reached in time, as opposed to a bad query or document
+UNAVAILABLE = (ConnectionFailure, ExecutionTimeout, asyncio.TimeoutError)
+
+CIRCUIT_OPEN = metrics.REGISTRY.register(metrics.Gauge(
+    "db_circuit_open",
+    "1 while the database circuit breaker is open",
+))
+DEGRADED = metrics.REGISTRY.register(metrics.Counter(
+    "db_degraded_responses_total",
+    "Requests answered without the database, by route and kind (stale, unavailable, spooled)",
+    ("route", "kind"),
+))
+REPLAYED = metrics.REGISTRY.register(metrics.Counter(
+    "write_spool_replayed_total",
+    "Spooled writes replayed, by outcome",
+    ("outcome",),
+))
+
+
+# The guarded write in progress: {"write_id": ..., "spooled_at": ISO time or None}
+_write = contextvars.ContextVar("guarded_write", default=None)
+
+
+def write_id() -> str:
+    """Id for the record the current guarded write creates; the same on its replay."""
+    current = _write.get()
+    return current["write_id"] if current else ids.new_id()
+
+
+def spooled_at():
+    """When the write being replayed was received (ISO string), or None outside a replay."""
+    current = _write.get()
+    return current["spooled_at"] if current else None
+
+
+def is_unavailable(error: Exception) -> bool:
+    """True for database outages, including ones a handler re-raised as a 5xx HTTPException."""
+    if isinstance(error, StarletteHTTPException) and error.status_code >= 500:
+        error = error.__cause__ or error.__context__
+    return isinstance(error, UNAVAILABLE)
+
+
+class CircuitBreaker:
+    CLOSED, OPEN = "closed", "open"
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_seconds: float = RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def allow(self) -> bool:
+        """Whether a call may go to the database; once the reset time has passed one probe is let through."""
+        if self.state == self.CLOSED:
+            return True
+        if not self._probing and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        if self.state == self.OPEN:
+            logger.info("Database reachable again, closing circuit")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+        CIRCUIT_OPEN.set(0)
+
+    def release(self):
+        """End a probe that finished without an outcome, e.g. because it was cancelled."""
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._probing or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+            if self.state == self.CLOSED:
+                logger.warning(f"Opening database circuit after {self.failures} consecutive failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._probing = False
+            CIRCUIT_OPEN.set(1)
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "open_for_seconds": time.monotonic() - self.opened_at if self.state == self.OPEN else None,
+        }
+
+
+class WriteSpool:
+    """Append-only JSONL file of writes waiting for the database, shared by the host's workers."""
+
+    def __init__(self, path: Path = SPOOL_PATH):
+        self.path = Path(path)
+        self.lock = asyncio.Lock()
+        self._counted = (None, 0)  # ((size, mtime), entries) of the last count
+
+    @contextmanager
+    def _locked(self, suffix: str = ".lock", blocking: bool = True):
+        """``flock`` on a lock file next to the spool; yields False if non-blocking and already held."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix(suffix), "a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def replaying(self):
+        """Held by the one worker replaying the spool; other workers skip their replay."""
+        return self._locked(".replay.lock", blocking=False)
+
+    def append(self, entry: dict):
+        with self._locked():
+            with open(self.path, "a", encoding="utf-8") as spool:
+                spool.write(json.dumps(entry) + "\n")
+                spool.flush()
+                os.fsync(spool.fileno())
+
+    def _read(self) -> list:
+        if not self.path.exists():
+            return []
+        with open(self.path, encoding="utf-8") as spool:
+            return [json.loads(line) for line in spool if line.strip()]
+
+    def read(self) -> list:
+        with self._locked():
+            return self._read()
+
+    def remove(self, spool_ids):
+        """Atomically drop ``spool_ids``, keeping entries appended since they were read."""
+        spool_ids = set(spool_ids)
+        with self._locked():
+            entries = [entry for entry in self._read() if entry["spool_id"] not in spool_ids]
+            temporary = self.path.with_suffix(".tmp")
+            with open(temporary, "w", encoding="utf-8") as spool:
+                spool.writelines(json.dumps(entry) + "\n" for entry in entries)
+                spool.flush()
+                os.fsync(spool.fileno())
+            os.replace(temporary, self.path)
+
+    def reject(self, entry: dict, error: str):
+        """Keep a write that can never succeed aside for inspection."""
+        with open(self.path.with_suffix(".rejected.jsonl"), "a", encoding="utf-8") as rejected:
+            rejected.write(json.dumps({**entry, "error": error}) + "\n")
+
+    def __len__(self):
+        """Entries in the spool; the file is only recounted when it has changed."""
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return 0
+        version = (stat.st_size, stat.st_mtime_ns)
+        if self._counted[0] != version:
+            with open(self.path, "rb") as spool:
+                self._counted = (version, sum(chunk.count(b"\n") for chunk in iter(lambda: spool.read(1 << 20), b"")))
+        return self._counted[1]
+
+
+class DatabaseGuard:
+    def __init__(self, breaker: CircuitBreaker = None, spool: WriteSpool = None, timeout: float = TIMEOUT_SECONDS,
+                 cache_size: int = STALE_CACHE_SIZE, max_stale_seconds: float = STALE_MAX_AGE_SECONDS,
+                 cache_bytes: int = STALE_CACHE_BYTES):
+        self.breaker = breaker or CircuitBreaker()
+        self.spool = spool or WriteSpool()
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.cache_bytes = cache_bytes
+        self.max_stale_seconds = max_stale_seconds
+        self.cache = OrderedDict()  # (route, params) -> (stored at, body, status code, media type)
+        self.cached_bytes = 0
+        self.writes = {}  # write name -> (handler, payload parameter, payload model, background tasks parameter)
+
+    def read(self, name: str):
+        """Decorator for read endpoints: timeout, breaker and last-good-response fallback."""
+        def decorate(func):
+            @functools.wraps(func)
+            async def endpoint(*args, **kwargs):
+                key = (name, tuple(sorted((param, str(value)) for param, value in kwargs.items())))
+                if not self.breaker.allow():
+                    return self._stale(name, key)
+                probing = self.breaker.state == CircuitBreaker.OPEN
+                try:
+                    result = await asyncio.wait_for(func(*args, **kwargs), self.timeout)
+                except Exception as e:
+                    if not is_unavailable(e):
+                        self.breaker.record_success()
+                        raise
+                    self.breaker.record_failure()
+                    logger.warning(f"Database unavailable for {name}: {str(e)}")
+                    return self._stale(name, key)
+                finally:
+                    if probing:
+                        self.breaker.release()
+                self.breaker.record_success()
+                self._remember(key, result)
+                return result
+            return endpoint
+        return decorate
+
+    def write(self, name: str):
+        """Decorator for create endpoints: spool the payload while the database is unavailable."""
+        def decorate(func):
+            parameters = inspect.signature(func).parameters.values()
+            payload = next(p for p in parameters if inspect.isclass(p.annotation) and issubclass(p.annotation, BaseModel))
+            tasks = next((p.name for p in parameters if p.annotation is BackgroundTasks), None)
+            self.writes[name] = (func, payload.name, payload.annotation, tasks)
+
+            @functools.wraps(func)
+            async def endpoint(*args, **kwargs):
+                token = _write.set({"write_id": ids.new_id(), "spooled_at": None})
+                try:
+                    # No timeout here: cancelling a write halfway would leave it partly applied
+                    if self.breaker.allow():
+                        probing = self.breaker.state == CircuitBreaker.OPEN
+                        try:
+                            result = await func(*args, **kwargs)
+                        except Exception as e:
+                            if not is_unavailable(e):
+                                self.breaker.record_success()
+                                raise
+                            self.breaker.record_failure()
+                            logger.warning(f"Database unavailable for {name}, spooling write: {str(e)}")
+                        else:
+                            self.breaker.record_success()
+                            return result
+                        finally:
+                            if probing:
+                                self.breaker.release()
+                    return await self._spool(name, kwargs[payload.name])
+                finally:
+                    _write.reset(token)
+            return endpoint
+        return decorate
+
+    def _remember(self, key, result):
+        if isinstance(result, Response):
+            entry = (time.monotonic(), result.body, result.status_code, result.media_type)
+        elif isinstance(result, BaseModel):
+            entry = (time.monotonic(), result.model_dump_json().encode(), 200, "application/json")
+        else:
+            entry = (time.monotonic(), json.dumps(jsonable_encoder(result)).encode(), 200, "application/json")
+        if len(entry[1]) > self.cache_bytes:
+            return
+        previous = self.cache.pop(key, None)
+        if previous:
+            self.cached_bytes -= len(previous[1])
+        self.cache[key] = entry
+        self.cached_bytes += len(entry[1])
+        while len(self.cache) > self.cache_size or self.cached_bytes > self.cache_bytes:
+            _, evicted = self.cache.popitem(last=False)
+            self.cached_bytes -= len(evicted[1])
+
+    def _stale(self, name: str, key):
+        cached = self.cache.get(key)
+        age = time.monotonic() - cached[0] if cached else None
+        if cached is None or age > self.max_stale_seconds:
+            DEGRADED.inc(route=name, kind="unavailable")
+            raise HTTPException(
+                status_code=503,
+                detail="Database temporarily unavailable",
+                headers={"Retry-After": str(max(1, math.ceil(self.breaker.reset_seconds)))},
+            )
+        DEGRADED.inc(route=name, kind="stale")
+        headers = {"Age": str(int(age)), "Warning": '110 - "Response is Stale"', STALE_HEADER: "true"}
+        _, body, status_code, media_type = cached
+        return Response(content=body, status_code=status_code, media_type=media_type, headers=headers)
+
+    async def _spool(self, name: str, payload: BaseModel):
+        entry = {
+            "spool_id": str(uuid.uuid4()),
+            "write": name,
+            "write_id": write_id(),
+            "spooled_at": datetime.now(timezone.utc).isoformat(),
+            "payload": json.loads(payload.model_dump_json()),
+        }
+        try:
+            await asyncio.to_thread(self.spool.append, entry)
+        except OSError:
+            logger.exception(f"Could not spool {name} write")
+            DEGRADED.inc(route=name, kind="unavailable")
+            raise HTTPException(status_code=503, detail="Database temporarily unavailable and write could not be spooled")
+        DEGRADED.inc(route=name, kind="spooled")
+        return JSONResponse(
+            status_code=202,
+            content={
+                "status": "queued",
+                "spool_id": entry["spool_id"],
+                "id": entry["write_id"],
+                "detail": "Saved locally; it will be stored once the database recovers",
+            },
+        )
+
+    async def _apply(self, entry: dict):
+        func, payload, model, tasks = self.writes[entry["write"]]
+        kwargs = {payload: model(**entry["payload"])}
+        if tasks:
+            kwargs[tasks] = BackgroundTasks()
+        token = _write.set({"write_id": entry.get("write_id") or ids.new_id(), "spooled_at": entry["spooled_at"]})
+        try:
+            await func(**kwargs)
+        finally:
+            _write.reset(token)
+        if tasks:
+            await kwargs[tasks]()
+
+    async def replay(self) -> int:
+        """Apply spooled writes in order until the spool is empty or the database fails again."""
+        replayed = 0
+        async with self.spool.lock:
+            with self.spool.replaying() as owner:
+                if not owner:
+                    return 0  # another worker is replaying
+                entries = await asyncio.to_thread(self.spool.read)
+                while entries and self.breaker.allow():
+                    probing = self.breaker.state == CircuitBreaker.OPEN
+                    batch, done = entries[:REPLAY_BATCH], []
+                    try:
+                        for entry in batch:
+                            try:
+                                await self._apply(entry)
+                            except Exception as e:
+                                if is_unavailable(e):
+                                    self.breaker.record_failure()
+                                    break
+                                self.breaker.record_success()
+                                logger.error(f"Dropping spooled {entry['write']} write {entry['spool_id']}: {str(e)}")
+                                await asyncio.to_thread(self.spool.reject, entry, str(e))
+                                REPLAYED.inc(outcome="rejected")
+                            else:
+                                self.breaker.record_success()
+                                replayed += 1
+                                REPLAYED.inc(outcome="applied")
+                            done.append(entry["spool_id"])
+                    finally:
+                        if probing:
+                            self.breaker.release()
+                        await asyncio.to_thread(self.spool.remove, done)
+                    entries = entries[len(done):]
+                    if len(done) < len(batch):
+                        break
+        if replayed:
+            logger.info(f"Replayed {replayed} spooled writes, {len(entries)} left")
+        return replayed
+
+    def status(self) -> dict:
+        return {**self.breaker.status(), "cached_responses": len(self.cache), "spooled_writes": len(self.spool)}
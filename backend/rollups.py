@@ -0,0 +1,209 @@
+"""Pre-aggregated report counts for trend analytics.
+
+Every accepted (non-duplicate) health report increments one counter per
+granularity (day, ISO week, month) in ``report_rollups``, keyed by
+``report_type``, ``severity`` and the report's most specific region id. Each
+rollup document also carries the district (``region``, for grouping) and the
+full ``region_ids`` chain, so trends can be filtered by a state, district,
+block or village. Trend queries then read a few hundred small rollup
+documents instead of aggregating ``health_reports``. ``backfill`` rebuilds
+the collection from scratch from both report tiers, e.g. after a migration.
+It builds into a separate collection and renames it over ``report_rollups``,
+so trend reads and live increments keep working against the old rollups
+until the new ones are complete.
+"""
+import logging
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+
+from pymongo import ASCENDING, UpdateOne
+
+import archive
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "report_rollups"
+REBUILD_COLLECTION = "report_rollups_rebuild"
+PROJECTION = {"date_reported": 1, "report_type": 1, "severity": 1, "region.district": 1, "region_ids": 1, "duplicate_of": 1}
+GRANULARITIES = ("day", "week", "month")
+UNKNOWN_REGION = "unknown"
+
+
+def _as_datetime(value) -> datetime:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def bucket_start(value, granularity: str) -> date:
+    day = value if type(value) is date else _as_datetime(value).date()
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def shift_buckets(start: date, granularity: str, count: int) -> date:
+    """Return the bucket ``count`` periods before ``start``."""
+    if granularity == "day":
+        return start - timedelta(days=count)
+    if granularity == "week":
+        return start - timedelta(weeks=count)
+    month_index = start.year * 12 + start.month - 1 - count
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def region_of(report: dict) -> str:
+    """District id resolved at write time, e.g. "HR-SNP"."""
+    return (report.get("region") or {}).get("district") or UNKNOWN_REGION
+
+
+def scope_of(report: dict) -> tuple:
+    """``(district id, region ids from the state down)`` of a report."""
+    return region_of(report), tuple(report.get("region_ids") or ())
+
+
+def _key(report: dict, granularity: str):
+    district, region_ids = scope_of(report)
+    return (
+        granularity,
+        bucket_start(report["date_reported"], granularity).isoformat(),
+        str(getattr(report["report_type"], "value", report["report_type"])),
+        str(getattr(report["severity"], "value", report["severity"])),
+        region_ids[-1] if region_ids else district,
+    )
+
+
+def _update(key, scope: tuple, count: int) -> UpdateOne:
+    granularity, bucket, report_type, severity, _ = key
+    district, region_ids = scope
+    document = {
+        "granularity": granularity,
+        "bucket": bucket,
+        "report_type": report_type,
+        "severity": severity,
+        "region": district,
+        "region_ids": list(region_ids),
+    }
+    return UpdateOne({"_id": "|".join(key)}, {"$setOnInsert": document, "$inc": {"count": count}}, upsert=True)
+
+
+def counts(report: dict) -> bool:
+    return not report.get("duplicate_of")
+
+
+async def _create_indexes(collection):
+    await collection.create_index([("granularity", ASCENDING), ("bucket", ASCENDING)])
+    await collection.create_index([("region_ids", ASCENDING), ("granularity", ASCENDING), ("bucket", ASCENDING)])
+
+
+async def ensure_indexes(db):
+    await _create_indexes(db[COLLECTION])
+
+
+async def record(db, report: dict, amount: int = 1):
+    """Add ``report`` to every granularity's rollup (negative amounts subtract)."""
+    if not counts(report):
+        return
+    scope = scope_of(report)
+    await db[COLLECTION].bulk_write(
+        [_update(_key(report, granularity), scope, amount) for granularity in GRANULARITIES],
+        ordered=False,
+    )
+
+
+async def _tally(db, collection: str, query: dict, batch_size: int, tiered: bool = False) -> tuple:
+    """``(reports counted, key -> count, region id -> scope)`` for one report collection.
+
+    With ``tiered``, reports also still present in ``health_reports`` (an
+    interrupted archive run) are skipped so they are not counted twice.
+    """
+    totals, scopes, seen = Counter(), {}, 0
+
+    async def add(batch):
+        nonlocal seen
+        if tiered:
+            hot = await db.health_reports.find({"_id": {"$in": [report["_id"] for report in batch]}}, {"_id": 1}).to_list(None)
+            hot = {report["_id"] for report in hot}
+            batch = [report for report in batch if report["_id"] not in hot]
+        for report in batch:
+            if not counts(report):
+                continue
+            seen += 1
+            for granularity in GRANULARITIES:
+                key = _key(report, granularity)
+                totals[key] += 1
+                scopes.setdefault(key[-1], scope_of(report))
+
+    batch = []
+    async for report in db[collection].find(query, PROJECTION).batch_size(batch_size):
+        batch.append(report)
+        if len(batch) >= batch_size:
+            await add(batch)
+            batch = []
+    if batch:
+        await add(batch)
+    return seen, totals, scopes
+
+
+async def _write(collection, totals: Counter, scopes: dict, batch_size: int):
+    updates = [_update(key, scopes[key[-1]], count) for key, count in totals.items()]
+    for start in range(0, len(updates), batch_size):
+        await collection.bulk_write(updates[start:start + batch_size], ordered=False)
+
+
+async def backfill(db, batch_size: int = 10000) -> int:
+    """Rebuild ``report_rollups`` from ``health_reports`` and its archive; returns reports counted.
+
+    Reports filed before the rebuild started are counted into a separate
+    collection; reports filed while that scan ran are then added on top, and
+    the result is renamed over ``report_rollups``. Only reports filed during
+    the final catch-up and rename can be missed.
+    """
+    started = datetime.now(timezone.utc).isoformat()
+    rebuild = db[REBUILD_COLLECTION]
+    await rebuild.drop()
+    await _create_indexes(rebuild)
+
+    seen = 0
+    for collection, tiered in (("health_reports", False), (archive.COLLECTION, True)):
+        counted, totals, scopes = await _tally(db, collection, {"date_reported": {"$lt": started}}, batch_size, tiered)
+        seen += counted
+        await _write(rebuild, totals, scopes, batch_size)
+    # Archiving only moves old reports, so anything filed since the scan began is in the hot tier
+    counted, totals, scopes = await _tally(db, "health_reports", {"date_reported": {"$gte": started}}, batch_size)
+    seen += counted
+    await _write(rebuild, totals, scopes, batch_size)
+
+    await rebuild.rename(COLLECTION, dropTarget=True)
+    logger.info(f"Rebuilt {await db[COLLECTION].count_documents({})} rollup buckets from {seen} reports")
+    return seen
+
+
+async def trends(db, granularity: str, start: date, end: date, group_by: str, filters: dict):
+    """Return ``{group_value: {bucket: count}}`` for the requested window."""
+    query = {
+        "granularity": granularity,
+        "bucket": {"$gte": bucket_start(start, granularity).isoformat(), "$lte": end.isoformat()},
+    }
+    query.update({field: value for field, value in filters.items() if value is not None})
+    series = {}
+    async for row in db[COLLECTION].find(query, {"_id": 0, "bucket": 1, group_by: 1, "count": 1}):
+        points = series.setdefault(row[group_by], {})
+        points[row["bucket"]] = points.get(row["bucket"], 0) + row["count"]
+    return series
+
+
+def bucket_range(start: date, end: date, granularity: str):
+    """All bucket keys between ``start`` and ``end`` inclusive, so gaps show as zero."""
+    buckets = []
+    current = bucket_start(start, granularity)
+    while current <= end:
+        buckets.append(current.isoformat())
+        current = shift_buckets(current, granularity, -1)
+    return buckets
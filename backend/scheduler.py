@@ -0,0 +1,180 @@
+"""In-process periodic job scheduler.
+
+Jobs run on their own asyncio task with a jittered interval. A job never
+overlaps with itself inside a worker, and ``exclusive`` jobs additionally
+take a lease in the ``scheduler_locks`` collection so only one uvicorn
+worker or node runs them per interval. The lease is held for the whole
+interval (and renewed while a long run is in progress), so scaling out does
+not multiply how often a job runs.
+"""
+import asyncio
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+LOCK_COLLECTION = "scheduler_locks"
+ENABLED = os.environ.get("SCHEDULER_ENABLED", "true").lower() not in ("0", "false", "no")
+
+JOB_RUNS = metrics.REGISTRY.register(metrics.Counter(
+    "scheduler_job_runs_total",
+    "Scheduled job executions by outcome",
+    ("job", "outcome"),
+))
+JOB_DURATION = metrics.REGISTRY.register(metrics.Histogram(
+    "scheduler_job_duration_seconds",
+    "Scheduled job run time",
+    ("job",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900),
+))
+JOB_LAST_SUCCESS = metrics.REGISTRY.register(metrics.Gauge(
+    "scheduler_job_last_success_timestamp_seconds",
+    "Unix time of the last successful run",
+    ("job",),
+))
+
+
+class Job:
+    def __init__(self, name, func, interval, jitter=0.1, exclusive=True, run_on_start=False):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.exclusive = exclusive
+        self.run_on_start = run_on_start
+        self.lock = asyncio.Lock()
+        self.last_started = None
+        self.last_finished = None
+        self.last_duration = None
+        self.last_outcome = None
+        self.last_error = None
+
+    def next_delay(self) -> float:
+        return self.interval * (1 + random.uniform(0, self.jitter))
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "interval_seconds": self.interval,
+            "exclusive": self.exclusive,
+            "running": self.lock.locked(),
+            "last_started": self.last_started,
+            "last_finished": self.last_finished,
+            "last_duration_seconds": self.last_duration,
+            "last_outcome": self.last_outcome,
+            "last_error": self.last_error,
+        }
+
+
+class Scheduler:
+    def __init__(self, db=None, owner=None):
+        self.db = db
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.jobs = {}
+        self._tasks = []
+
+    def add_job(self, name, func, interval, jitter=0.1, exclusive=True, run_on_start=False) -> Job:
+        if name in self.jobs:
+            raise ValueError(f"Job {name} already registered")
+        job = self.jobs[name] = Job(name, func, interval, jitter, exclusive, run_on_start)
+        return job
+
+    def job(self, name, interval, **options):
+        """Decorator form of ``add_job``."""
+        def register(func):
+            self.add_job(name, func, interval, **options)
+            return func
+        return register
+
+    async def start(self, db=None):
+        if db is not None:
+            self.db = db
+        if not ENABLED:
+            logger.info("Scheduler disabled by SCHEDULER_ENABLED")
+            return
+        self._tasks = [asyncio.create_task(self._loop(job)) for job in self.jobs.values()]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def trigger(self, name) -> str:
+        """Run a job now, outside its schedule. Returns the run outcome."""
+        return await self._run(self.jobs[name])
+
+    async def _loop(self, job: Job):
+        if not job.run_on_start:
+            await asyncio.sleep(job.next_delay())
+        while True:
+            await self._run(job)
+            await asyncio.sleep(job.next_delay())
+
+    async def _acquire_lease(self, job: Job, now: datetime) -> bool:
+        try:
+            await self.db[LOCK_COLLECTION].find_one_and_update(
+                {"_id": job.name, "$or": [{"expires_at": {"$lte": now}}, {"owner": self.owner}]},
+                {"$set": {"owner": self.owner, "acquired_at": now, "expires_at": now + timedelta(seconds=job.interval)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    async def _renew_lease(self, job: Job):
+        while True:
+            await asyncio.sleep(max(job.interval / 3, 1))
+            expires_at = datetime.now(timezone.utc) + timedelta(seconds=job.interval)
+            await self.db[LOCK_COLLECTION].update_one(
+                {"_id": job.name, "owner": self.owner}, {"$set": {"expires_at": expires_at}}
+            )
+
+    async def _run(self, job: Job) -> str:
+        if job.lock.locked():
+            JOB_RUNS.inc(job=job.name, outcome="skipped_overlap")
+            return "skipped_overlap"
+        async with job.lock:
+            started_at = datetime.now(timezone.utc)
+            renewal = None
+            if job.exclusive:
+                try:
+                    if not await self._acquire_lease(job, started_at):
+                        JOB_RUNS.inc(job=job.name, outcome="skipped_lease")
+                        return "skipped_lease"
+                except Exception as e:
+                    logger.warning(f"Could not take lease for job {job.name}: {str(e)}")
+                    JOB_RUNS.inc(job=job.name, outcome="skipped_lease")
+                    return "skipped_lease"
+                renewal = asyncio.create_task(self._renew_lease(job))
+
+            job.last_started = started_at
+            start = time.perf_counter()
+            try:
+                await job.func()
+                outcome, job.last_error = "success", None
+                JOB_LAST_SUCCESS.set(time.time(), job=job.name)
+            except Exception as e:
+                outcome, job.last_error = "failure", str(e)
+                logger.exception(f"Scheduled job {job.name} failed")
+            finally:
+                if renewal:
+                    renewal.cancel()
+                    await asyncio.gather(renewal, return_exceptions=True)
+            job.last_duration = time.perf_counter() - start
+            job.last_finished = datetime.now(timezone.utc)
+            job.last_outcome = outcome
+            JOB_DURATION.observe(job.last_duration, job=job.name)
+            JOB_RUNS.inc(job=job.name, outcome=outcome)
+            return outcome
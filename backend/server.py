@@ -1,31 +1,99 @@
-from fastapi import FastAPI, APIRouter, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, APIRouter, BackgroundTasks, HTTPException, Header, Request
+from fastapi.responses import HTMLResponse, PlainTextResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
 import os
 import logging
+import time
 from pathlib import Path
-from pydantic import BaseModel, Field
+from pydantic import AliasChoices, BaseModel, Field, TypeAdapter, ValidationError, create_model, model_validator
 from typing import List, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
 from enum import Enum
+from contextlib import asynccontextmanager
+from collections import OrderedDict
+from functools import lru_cache
+
+from pymongo import UpdateOne
+
+import admission
+import archive
+import correlation
+import csv_stream
+import dedup
+import geocoder
+import ids
+import metrics
+import notifications
+import profiling
+import read_routing
+import regions
+import report_workflow
+import resilience
+import rollups
+import scheduler
+import slow_queries
+import water_rules
 
 ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# MongoDB connection, opened by connect_mongo() from the lifespan handler (or a CLI)
+slow_query_listener = slow_queries.SlowQueryListener()
+slow_query_log = slow_queries.SlowQueryLog(slow_query_listener)
+client = None
+db = None
+
+# Pooled connections opened before the app reports ready
+WARM_CONNECTIONS = int(os.environ.get("MONGO_WARM_CONNECTIONS", "10"))
+
+# Recent reports used for near-duplicate detection
+duplicate_index = dedup.DuplicateIndex()
+
+# Periodic background jobs (registered below, started by the lifespan handler)
+job_scheduler = scheduler.Scheduler()
+
+# Outbox workers delivering alerts to nearby responders (started by the lifespan handler)
+notification_dispatcher = notifications.Dispatcher()
+
+# Circuit breaker with stale reads and a local write spool for database outages
+db_guard = resilience.DatabaseGuard()
+
+def connect_mongo(mongo_client=None):
+    """Bind the module-level client and db, creating a Motor client unless one is given"""
+    global client, db
+    load_dotenv(ROOT_DIR / '.env')
+    client = mongo_client or AsyncIOMotorClient(
+        os.environ['MONGO_URL'],
+        minPoolSize=int(os.environ.get("MONGO_MIN_POOL_SIZE", "0")),
+        # Fail fast during a failover instead of the driver's 30s default, so the circuit breaker can step in
+        serverSelectionTimeoutMS=int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+        event_listeners=[metrics.MongoCommandMetrics(), slow_query_listener],
+    )
+    db = client[os.environ['DB_NAME']]
+    return db
 
-# Create the main app without a prefix
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    connect_mongo(app.state.mongo_client)
+    await warm_up()
+    app.state.ready = True
+    yield
+    app.state.ready = False
+    await job_scheduler.stop()
+    await notification_dispatcher.stop()
+    await slow_query_log.stop()
+    if app.state.mongo_client is None:
+        client.close()
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+# Routes outside the /api prefix
+root_router = APIRouter()
+
 # Enums
 class UserRole(str, Enum):
     CITIZEN = "citizen"
@@ -44,6 +112,11 @@ class SeverityLevel(str, Enum):
     HIGH = "high"
     CRITICAL = "critical"
 
+class ReportStatus(str, Enum):
+    ACTIVE = "active"
+    UNDER_INVESTIGATION = "under_investigation"
+    RESOLVED = "resolved"
+
 class StockStatus(str, Enum):
     ADEQUATE = "adequate"
     LOW = "low"
@@ -51,47 +124,69 @@ class StockStatus(str, Enum):
     OUT_OF_STOCK = "out_of_stock"
 
 # Pydantic Models
+class Location(BaseModel):
+    lat: Optional[float] = Field(default=None, ge=-90, le=90)
+    lng: Optional[float] = Field(default=None, ge=-180, le=180)
+    address: Optional[str] = None
+    geocoded: bool = False  # coordinates were filled in from the address
+    submitted_address: Optional[str] = None  # address as submitted, when normalization changed it
+
+    @model_validator(mode="after")
+    def check_coordinates(self):
+        if (self.lat is None) != (self.lng is None):
+            raise ValueError("lat and lng must be given together")
+        if self.lat is None and not (self.address or "").strip():
+            raise ValueError("location needs an address or coordinates")
+        return self
+
 class User(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: ids.DocumentId = Field(default_factory=ids.new_id)
     name: str
     email: str
     role: UserRole
-    location: dict  # {"lat": float, "lng": float, "address": str}
+    location: Location
     phone: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    region: Optional[dict] = None  # {"state", "district", "block", "village"} region ids
+    region_ids: List[str] = Field(default_factory=list)  # indexed path from state down
 
 class UserCreate(BaseModel):
     name: str
     email: str
     role: UserRole
-    location: dict
+    location: Location
     phone: Optional[str] = None
 
 class HealthReport(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: ids.DocumentId = Field(default_factory=ids.new_id)
     reporter_id: str
     reporter_name: str
     report_type: ReportType
     symptoms: str
     severity: SeverityLevel
-    location: dict  # {"lat": float, "lng": float, "address": str}
+    location: Location
     date_reported: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     status: str = Field(default="active")  # active, resolved, under_investigation
+    status_changed_at: Optional[datetime] = None
     is_anonymous: bool = Field(default=False)
     additional_info: Optional[str] = None
+    duplicate_of: Optional[str] = None  # id of the earlier report describing the same incident
+    duplicate_count: int = Field(default=0)
+    region: Optional[dict] = None
+    region_ids: List[str] = Field(default_factory=list)
 
 class HealthReportCreate(BaseModel):
     reporter_name: str
     report_type: ReportType
     symptoms: str
     severity: SeverityLevel
-    location: dict
+    location: Location
     is_anonymous: bool = Field(default=False)
     additional_info: Optional[str] = None
 
 class WaterQualityData(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    location: dict
+    id: ids.DocumentId = Field(default_factory=ids.new_id)
+    location: Location
     tds_value: float
     ph_level: float
     turbidity: float
@@ -99,9 +194,12 @@ class WaterQualityData(BaseModel):
     status: str  # safe, moderate, unsafe
     tested_by: str
     test_date: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    rules_version: Optional[str] = None  # water rule set that assigned the status
+    region: Optional[dict] = None
+    region_ids: List[str] = Field(default_factory=list)
 
 class WaterQualityDataCreate(BaseModel):
-    location: dict
+    location: Location
     tds_value: float
     ph_level: float
     turbidity: float
@@ -109,41 +207,198 @@ class WaterQualityDataCreate(BaseModel):
     tested_by: str
 
 class Doctor(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: ids.DocumentId = Field(default_factory=ids.new_id)
     name: str
     specialization: str
-    location: dict
+    location: Location
     phone: str
     email: str
     availability: str  # "24/7", "9AM-6PM", etc.
     clinic_name: Optional[str] = None
+    region: Optional[dict] = None
+    region_ids: List[str] = Field(default_factory=list)
 
 class DoctorCreate(BaseModel):
     name: str
     specialization: str
-    location: dict
+    location: Location
     phone: str
     email: str
     availability: str
     clinic_name: Optional[str] = None
 
 class MedicalStock(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: ids.DocumentId = Field(default_factory=ids.new_id)
     item_name: str
     quantity: int
     unit: str
     status: StockStatus
-    location: dict
+    location: Location
     expiry_date: Optional[datetime] = None
     last_updated: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    region: Optional[dict] = None
+    region_ids: List[str] = Field(default_factory=list)
 
 class MedicalStockCreate(BaseModel):
     item_name: str
     quantity: int
     unit: str
-    location: dict
+    location: Location
     expiry_date: Optional[datetime] = None
 
+class SlowQuery(BaseModel):
+    recorded_at: datetime
+    database: str
+    collection: str
+    command: str
+    filter: dict
+    sort: Optional[dict] = None
+    duration_ms: float
+    failed: bool = False
+    shape: str
+    explain: Optional[dict] = None
+    collection_scan: Optional[bool] = None
+
+class JobStatus(BaseModel):
+    name: str
+    interval_seconds: float
+    exclusive: bool
+    running: bool
+    last_started: Optional[datetime] = None
+    last_finished: Optional[datetime] = None
+    last_duration_seconds: Optional[float] = None
+    last_outcome: Optional[str] = None
+    last_error: Optional[str] = None
+
+class NotificationCount(BaseModel):
+    channel: str
+    status: str  # pending, sending, sent, failed
+    count: int
+
+class DatabaseStatus(BaseModel):
+    state: str  # closed, open
+    consecutive_failures: int
+    open_for_seconds: Optional[float] = None
+    cached_responses: int
+    spooled_writes: int
+
+class TrendGranularity(str, Enum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+class TrendGroup(str, Enum):
+    REPORT_TYPE = "report_type"
+    SEVERITY = "severity"
+    REGION = "region"
+
+class TrendPoint(BaseModel):
+    bucket: str
+    count: int
+
+class TrendSeries(BaseModel):
+    key: str
+    total: int
+    points: List[TrendPoint]
+
+class TrendResponse(BaseModel):
+    granularity: TrendGranularity
+    group_by: TrendGroup
+    start: str
+    end: str
+    buckets: List[str]
+    series: List[TrendSeries]
+
+class WaterDiseaseCorrelation(BaseModel):
+    reading_id: ids.DocumentId
+    location: Location
+    region_ids: List[str] = Field(default_factory=list)
+    test_date: datetime
+    tds_value: Optional[float] = None
+    ph_level: Optional[float] = None
+    turbidity: Optional[float] = None
+    chlorine_level: Optional[float] = None
+    report_count: int
+    severity_counts: dict
+    nearest_report_km: Optional[float] = None
+    report_ids: List[str]
+    radius_km: float
+    window_days: List[float]
+    computed_at: datetime
+
+class WaterRuleCondition(BaseModel):
+    parameter: str
+    operator: str
+    threshold: float
+
+class WaterRuleSet(BaseModel):
+    version: str
+    description: str
+    unsafe: List[WaterRuleCondition]
+    moderate: List[WaterRuleCondition]
+    available_versions: List[str]
+
+class Region(BaseModel):
+    id: str
+    name: str
+    level: str  # state, district, block, village
+    parent: Optional[str] = None
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+
+class WaterQualityImportRow(BaseModel):
+    address: str
+    lat: Optional[float] = Field(default=None, ge=-90, le=90)
+    lng: Optional[float] = Field(default=None, ge=-180, le=180)
+    tds_value: float = Field(validation_alias=AliasChoices("tds_value", "tds"))
+    ph_level: float = Field(validation_alias=AliasChoices("ph_level", "ph"))
+    turbidity: float
+    chlorine_level: float = Field(validation_alias=AliasChoices("chlorine_level", "chlorine"))
+    tested_by: str
+    test_date: Optional[datetime] = None
+
+    @model_validator(mode="after")
+    def check_coordinates(self):
+        if (self.lat is None) != (self.lng is None):
+            raise ValueError("lat and lng must be given together")
+        return self
+
+class WaterQualityImportError(BaseModel):
+    line: int  # CSV record number, the header being line 1
+    errors: List[str]
+
+class WaterQualityImportResult(BaseModel):
+    received: int = 0
+    inserted: int = 0
+    rejected: int = 0
+    errors: List[WaterQualityImportError] = Field(default_factory=list)
+    errors_truncated: bool = False
+
+class ReportStatusTransition(BaseModel):
+    report_ids: List[str] = Field(min_length=1, max_length=report_workflow.MAX_BATCH)
+    status: ReportStatus
+    actor: str
+    note: Optional[str] = None
+
+class ReportStatusRejection(BaseModel):
+    report_id: str
+    reason: str
+
+class ReportStatusMove(BaseModel):
+    report_id: str
+    from_status: str
+
+class ReportStatusBatch(BaseModel):
+    batch_id: str
+    changed_at: datetime
+    actor: str
+    note: Optional[str] = None
+    status: ReportStatus
+    requested: int
+    modified: int
+    moved: List[ReportStatusMove]
+    rejected: List[ReportStatusRejection]
+
 class DashboardStats(BaseModel):
     total_reports: int
     active_cases: int
@@ -158,16 +413,72 @@ def prepare_for_mongo(data):
         for key, value in data.items():
             if isinstance(value, datetime):
                 data[key] = value.isoformat()
+        ids.encode(data)
     return data
 
+async def insert_once(collection, document: dict) -> bool:
+    """Insert ``document`` unless its id is already stored, e.g. by the first attempt of a replayed write"""
+    result = await collection.update_one({"id": document["id"]}, {"$setOnInsert": document}, upsert=True)
+    return result.upserted_id is not None
+
+def locate(location: Location) -> dict:
+    """Geocoded location and region fields for a submitted location"""
+    filled = geocoder.fill_location(location.dict(exclude_none=True))
+    return {"location": filled, **regions.region_fields(filled)}
+
+# Whole-batch validators for list responses, built once instead of per request
+health_report_list = TypeAdapter(List[HealthReport])
+water_quality_list = TypeAdapter(List[WaterQualityData])
+doctor_list = TypeAdapter(List[Doctor])
+medical_stock_list = TypeAdapter(List[MedicalStock])
+user_list = TypeAdapter(List[User])
+correlation_list = TypeAdapter(List[WaterDiseaseCorrelation])
+
+def list_response(adapter: TypeAdapter, documents) -> Response:
+    """Validate stored documents in one pass and serialize them directly, skipping FastAPI's response_model re-validation"""
+    try:
+        items = adapter.validate_python(documents)
+    except ValidationError as e:
+        # Legacy documents that fail the current models are left out rather than failing the whole list
+        invalid = {error["loc"][0] for error in e.errors()}
+        for index in sorted(invalid):
+            logger.warning(f"Skipping invalid stored document {documents[index].get('id')}: "
+                           f"{[error['msg'] for error in e.errors() if error['loc'][0] == index]}")
+        items = adapter.validate_python([document for index, document in enumerate(documents) if index not in invalid])
+    return Response(content=adapter.dump_json(items), media_type="application/json")
+
+def sparse_fieldset(model, fields: Optional[str]):
+    """Mongo projection and list adapter for a ``?fields=a,b`` parameter, or (None, None) for whole documents"""
+    if not fields:
+        return None, None
+    names = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = names - set(model.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return _sparse_fieldset(model, frozenset(names | {"id"}))
+
+@lru_cache(maxsize=128)
+def _sparse_fieldset(model, names: frozenset):
+    # The trimmed model keeps each field's type, default and validators from the full model
+    partial = create_model(
+        f"{model.__name__}Fields",
+        **{name: (field.annotation, field) for name, field in model.model_fields.items() if name in names},
+    )
+    projection = {name: 1 for name in names}
+    projection["_id"] = 0
+    return projection, TypeAdapter(List[partial])
+
+def region_scope(region: Optional[str]) -> dict:
+    """Filter restricting a query to one region (any level) via the region_ids index"""
+    return {"region_ids": region} if region else {}
+
 def calculate_water_status(tds: float, ph: float, turbidity: float, chlorine: float) -> str:
-    """Calculate water quality status based on parameters"""
-    if tds > 1000 or ph < 6.5 or ph > 8.5 or turbidity > 5 or chlorine < 0.2:
-        return "unsafe"
-    elif tds > 500 or turbidity > 2:
-        return "moderate"
-    else:
-        return "safe"
+    """Calculate water quality status based on parameters using the active rule set"""
+    return water_rules.active().classify(tds, ph, turbidity, chlorine)
+
+def calculate_water_statuses(tds, ph, turbidity, chlorine) -> List[str]:
+    """calculate_water_status over equally sized sequences in one vectorized pass"""
+    return water_rules.active().evaluate(tds, ph, turbidity, chlorine).tolist()
 
 def calculate_stock_status(quantity: int, item_name: str) -> StockStatus:
     """Calculate stock status based on quantity and item type"""
@@ -185,27 +496,46 @@ def calculate_stock_status(quantity: int, item_name: str) -> StockStatus:
 async def root():
     return {"message": "Rural Water Health Monitoring System API"}
 
+# Liveness and readiness probes
+@api_router.get("/health/live")
+async def liveness():
+    return {"status": "ok"}
+
+@api_router.get("/health/ready")
+async def readiness(request: Request):
+    """Ready once the lifespan handler has connected Mongo and warmed caches"""
+    if not request.app.state.ready:
+        raise HTTPException(status_code=503, detail="Starting up")
+    return {"status": "ready"}
+
 # Dashboard Statistics
 @api_router.get("/dashboard/stats", response_model=DashboardStats)
-async def get_dashboard_stats():
+@db_guard.read("dashboard_stats")
+async def get_dashboard_stats(region: Optional[str] = None, include_archived: bool = False):
     try:
+        scope = region_scope(region)
+        reads = read_routing.database(db, "dashboard_stats")
         # Get counts from database
-        total_reports = await db.health_reports.count_documents({})
-        active_cases = await db.health_reports.count_documents({"status": "active"})
+        total_reports = await archive.count_across(reads, scope, include_archived)
+        active_cases = await report_workflow.active_cases(reads, region)
+        if active_cases is None:
+            active_cases = await reads.health_reports.count_documents({**scope, "status": "active", "duplicate_of": None})
         
-        # Count alerts (high severity reports in last 7 days)
+        # Count alerts (high severity reports in last 7 days), ignoring duplicate reports
         seven_days_ago = datetime.now(timezone.utc) - timedelta(days=7)
-        alerts = await db.health_reports.count_documents({
+        alerts = await reads.health_reports.count_documents({
+            **scope,
             "severity": {"$in": ["high", "critical"]},
-            "date_reported": {"$gte": seven_days_ago.isoformat()}
+            "date_reported": {"$gte": seven_days_ago.isoformat()},
+            "duplicate_of": None
         })
         
         # Get average water quality
-        water_data = await db.water_quality.find().to_list(1000)
+        water_data = await reads.water_quality.find(scope).to_list(1000)
         avg_tds = sum(w.get("tds_value", 0) for w in water_data) / len(water_data) if water_data else 0
         
-        doctors_available = await db.doctors.count_documents({})
-        critical_stocks = await db.medical_stock.count_documents({"status": "critical"})
+        doctors_available = await reads.doctors.count_documents(scope)
+        critical_stocks = await reads.medical_stock.count_documents({**scope, "status": "critical"})
         
         return DashboardStats(
             total_reports=total_reports,
@@ -215,130 +545,489 @@ async def get_dashboard_stats():
             doctors_available=doctors_available,
             critical_stocks=critical_stocks
         )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching stats: {str(e)}")
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error fetching stats")
+        raise HTTPException(status_code=500, detail="Error fetching stats")
 
 # Health Reports
 @api_router.post("/reports", response_model=HealthReport)
-async def create_health_report(report: HealthReportCreate):
+@db_guard.write("reports")
+async def create_health_report(report: HealthReportCreate, background_tasks: BackgroundTasks):
     try:
         report_dict = report.dict()
+        report_dict["id"] = resilience.write_id()
+        if resilience.spooled_at():
+            report_dict["date_reported"] = resilience.spooled_at()
         # Add reporter_id (generate UUID for anonymous or use reporter name as ID)
         report_dict["reporter_id"] = str(uuid.uuid4()) if report.is_anonymous else report.reporter_name
+        report_dict.update(locate(report.location))
         report_obj = HealthReport(**report_dict)
+        # Link near-duplicates of a recent report instead of counting them as new incidents
+        report_obj.duplicate_of, signature = duplicate_index.find_duplicate(report_obj)
+        # Register before awaiting so a concurrent identical report is linked to this one
+        duplicate_index.add(report_obj, signature, report_obj.duplicate_of)
         report_data = prepare_for_mongo(report_obj.dict())
-        await db.health_reports.insert_one(report_data)
+        try:
+            inserted = await insert_once(db.health_reports, report_data)
+        except Exception:
+            duplicate_index.discard(report_obj.id)
+            raise
+        if not inserted:
+            return report_obj
+        if report_obj.duplicate_of:
+            await db.health_reports.update_one(ids.id_query(report_obj.duplicate_of), {"$inc": {"duplicate_count": 1}})
+        await rollups.record(db, report_data)
+        await report_workflow.record_created(db, report_data)
+        if report_obj.severity == SeverityLevel.CRITICAL and not report_obj.duplicate_of:
+            background_tasks.add_task(notification_dispatcher.notify, notifications.report_event(report_data))
         return report_obj
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error creating report: {str(e)}")
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error creating report")
+        raise HTTPException(status_code=500, detail="Error creating report")
 
 @api_router.get("/reports", response_model=List[HealthReport])
-async def get_health_reports(limit: int = 50):
+@db_guard.read("reports_list")
+async def get_health_reports(limit: int = 50, region: Optional[str] = None, include_archived: bool = False,
+                             fields: Optional[str] = None):
+    projection, adapter = sparse_fieldset(HealthReport, fields)
     try:
-        reports = await db.health_reports.find().sort("date_reported", -1).limit(limit).to_list(limit)
-        return [HealthReport(**report) for report in reports]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching reports: {str(e)}")
+        reads = read_routing.database(db, "reports_list")
+        reports = await archive.find_across(reads, region_scope(region), "date_reported", limit, include_archived, projection)
+        return list_response(adapter or health_report_list, reports)
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error fetching reports")
+        raise HTTPException(status_code=500, detail="Error fetching reports")
 
 @api_router.get("/reports/{report_id}", response_model=HealthReport)
+@db_guard.read("report_detail")
 async def get_health_report(report_id: str):
     try:
-        report = await db.health_reports.find_one({"id": report_id})
+        report = await archive.find_one_across(db, ids.id_query(report_id))
         if not report:
             raise HTTPException(status_code=404, detail="Report not found")
         return HealthReport(**report)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching report: {str(e)}")
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error fetching report")
+        raise HTTPException(status_code=500, detail="Error fetching report")
+
+@api_router.post("/reports/status", response_model=ReportStatusBatch)
+@db_guard.write("report_status")
+async def transition_report_status(batch: ReportStatusTransition):
+    """Move many reports to one status; reports that cannot make the transition are listed as rejected"""
+    try:
+        # A replayed change must not undo changes made since it was received
+        entry = await report_workflow.transition(
+            db, batch.report_ids, batch.status.value, batch.actor, batch.note, unchanged_since=resilience.spooled_at()
+        )
+        return ReportStatusBatch(**entry)
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error changing report status")
+        raise HTTPException(status_code=500, detail="Error changing report status")
+
+@api_router.get("/reports/status/audit", response_model=List[ReportStatusBatch])
+async def get_report_status_audit(limit: int = 50):
+    try:
+        entries = await db[report_workflow.AUDIT].find().sort("changed_at", -1).limit(limit).to_list(limit)
+        return [ReportStatusBatch(**entry) for entry in entries]
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error fetching status audit")
+        raise HTTPException(status_code=500, detail="Error fetching status audit")
 
 # Water Quality
 @api_router.post("/water-quality", response_model=WaterQualityData)
-async def create_water_quality_data(data: WaterQualityDataCreate):
+@db_guard.write("water_quality")
+async def create_water_quality_data(data: WaterQualityDataCreate, background_tasks: BackgroundTasks):
     try:
         data_dict = data.dict()
         status = calculate_water_status(data.tds_value, data.ph_level, data.turbidity, data.chlorine_level)
         data_dict["status"] = status
+        data_dict["rules_version"] = water_rules.active().version
+        data_dict["id"] = resilience.write_id()
+        data_dict.update(locate(data.location))
         
         quality_obj = WaterQualityData(**data_dict)
         quality_data = prepare_for_mongo(quality_obj.dict())
-        await db.water_quality.insert_one(quality_data)
+        if await insert_once(db.water_quality, quality_data) and status == "unsafe":
+            background_tasks.add_task(correlation.refresh, db, ids.id_query(quality_obj.id))
+            background_tasks.add_task(notification_dispatcher.notify, notifications.water_event(quality_data))
         return quality_obj
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error creating water quality data: {str(e)}")
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error creating water quality data")
+        raise HTTPException(status_code=500, detail="Error creating water quality data")
 
 @api_router.get("/water-quality", response_model=List[WaterQualityData])
-async def get_water_quality_data(limit: int = 50):
+@db_guard.read("water_quality_list")
+async def get_water_quality_data(limit: int = 50, region: Optional[str] = None, fields: Optional[str] = None):
+    projection, adapter = sparse_fieldset(WaterQualityData, fields)
     try:
-        data = await db.water_quality.find().sort("test_date", -1).limit(limit).to_list(limit)
-        return [WaterQualityData(**item) for item in data]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching water quality data: {str(e)}")
+        reads = read_routing.database(db, "water_quality_list")
+        data = await reads.water_quality.find(region_scope(region), projection).sort("test_date", -1).limit(limit).to_list(limit)
+        return list_response(adapter or water_quality_list, data)
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error fetching water quality data")
+        raise HTTPException(status_code=500, detail="Error fetching water quality data")
+
+WATER_IMPORT_CHUNK_ROWS = int(os.environ.get("WATER_IMPORT_CHUNK_ROWS", "1000"))
+WATER_IMPORT_MAX_ERRORS = 1000
+WATER_IMPORT_MAX_PLACES = 4096  # geocoded sites kept per import, least recently used evicted first
+water_import_rows = TypeAdapter(List[WaterQualityImportRow])
+
+def validate_water_import_chunk(chunk):
+    """Validate a chunk of CSV rows in one pass; returns (valid rows, per-line errors)"""
+    try:
+        return list(zip([line for line, _ in chunk], water_import_rows.validate_python([row for _, row in chunk]))), []
+    except ValidationError as e:
+        failed = {}
+        for error in e.errors():
+            index, field = error["loc"][0], ".".join(str(part) for part in error["loc"][1:])
+            failed.setdefault(index, []).append(f"{field}: {error['msg']}" if field else error["msg"])
+        clean = [item for index, item in enumerate(chunk) if index not in failed]
+        rows = water_import_rows.validate_python([row for _, row in clean])
+        errors = [WaterQualityImportError(line=chunk[index][0], errors=messages) for index, messages in failed.items()]
+        return list(zip([line for line, _ in clean], rows)), errors
+
+@api_router.post("/water-quality/import", response_model=WaterQualityImportResult)
+async def import_water_quality_csv(request: Request, background_tasks: BackgroundTasks):
+    """Import lab results sent as a raw text/csv body or as the "file" field of a multipart upload"""
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Upload the CSV as the 'file' form field")
+        blocks = csv_stream.upload_bytes(upload)
+    else:
+        blocks = request.stream()
+    try:
+        result = WaterQualityImportResult()
+        rules_version = water_rules.active().version
+        first_unsafe = last_unsafe = None
+        unsafe_places = {}  # place -> first unsafe reading there, so responders get one alert per place
+        places = OrderedDict()  # (address, lat, lng) -> geocoded location and region fields, shared across chunks
+        async for chunk in csv_stream.csv_chunks(blocks, WATER_IMPORT_CHUNK_ROWS):
+            result.received += len(chunk)
+            valid, errors = validate_water_import_chunk(chunk)
+            result.rejected += len(errors)
+            room = WATER_IMPORT_MAX_ERRORS - len(result.errors)
+            result.errors.extend(errors[:room])
+            result.errors_truncated = result.errors_truncated or len(errors) > room
+            if not valid:
+                continue
+
+            statuses = calculate_water_statuses(
+                [row.tds_value for _, row in valid],
+                [row.ph_level for _, row in valid],
+                [row.turbidity for _, row in valid],
+                [row.chlorine_level for _, row in valid],
+            )
+            # Documents are built directly rather than through WaterQualityData: every field is already validated
+            documents = []
+            imported_at = datetime.now(timezone.utc)
+            for (_, row), status in zip(valid, statuses):
+                place = (row.address, row.lat, row.lng)
+                if place in places:
+                    places.move_to_end(place)
+                else:
+                    location = geocoder.fill_location({"lat": row.lat, "lng": row.lng, "address": row.address})
+                    places[place] = (location, regions.region_fields(location))
+                    if len(places) > WATER_IMPORT_MAX_PLACES:
+                        places.popitem(last=False)
+                location, region = places[place]
+                test_date = row.test_date or imported_at
+                documents.append(prepare_for_mongo({
+                    "id": ids.new_id(),
+                    "location": dict(location),
+                    "tds_value": row.tds_value,
+                    "ph_level": row.ph_level,
+                    "turbidity": row.turbidity,
+                    "chlorine_level": row.chlorine_level,
+                    "status": status,
+                    "tested_by": row.tested_by,
+                    # Stored as ISO strings, so every date must be in UTC to sort and range-query correctly
+                    "test_date": test_date.astimezone(timezone.utc) if test_date.tzinfo else test_date.replace(tzinfo=timezone.utc),
+                    "rules_version": rules_version,
+                    **region,
+                }))
+                if status == "unsafe":
+                    test_date = documents[-1]["test_date"]
+                    first_unsafe = min(first_unsafe or test_date, test_date)
+                    last_unsafe = max(last_unsafe or test_date, test_date)
+                    unsafe_places.setdefault(place, documents[-1])
+            await db.water_quality.insert_many(documents, ordered=False)
+            result.inserted += len(documents)
+
+        if first_unsafe:
+            background_tasks.add_task(correlation.refresh, db, {"test_date": {"$gte": first_unsafe, "$lte": last_unsafe}})
+        for reading in unsafe_places.values():
+            background_tasks.add_task(notification_dispatcher.notify, notifications.water_event(reading))
+        return result
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error importing water quality data")
+        raise HTTPException(status_code=500, detail="Error importing water quality data")
+
+@api_router.get("/water-quality/rules", response_model=WaterRuleSet)
+async def get_water_quality_rules():
+    return WaterRuleSet(**water_rules.active().describe(), available_versions=list(water_rules.RULESETS))
 
 # Doctors
 @api_router.post("/doctors", response_model=Doctor)
+@db_guard.write("doctors")
 async def create_doctor(doctor: DoctorCreate):
     try:
         doctor_dict = doctor.dict()
+        doctor_dict["id"] = resilience.write_id()
+        doctor_dict.update(locate(doctor.location))
         doctor_obj = Doctor(**doctor_dict)
-        await db.doctors.insert_one(doctor_obj.dict())
+        await insert_once(db.doctors, ids.encode(doctor_obj.dict()))
         return doctor_obj
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error creating doctor: {str(e)}")
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error creating doctor")
+        raise HTTPException(status_code=500, detail="Error creating doctor")
 
 @api_router.get("/doctors", response_model=List[Doctor])
-async def get_doctors():
+@db_guard.read("doctors_list")
+async def get_doctors(region: Optional[str] = None, fields: Optional[str] = None):
+    projection, adapter = sparse_fieldset(Doctor, fields)
     try:
-        doctors = await db.doctors.find().to_list(1000)
-        return [Doctor(**doctor) for doctor in doctors]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching doctors: {str(e)}")
+        reads = read_routing.database(db, "doctors_list")
+        doctors = await reads.doctors.find(region_scope(region), projection).to_list(1000)
+        return list_response(adapter or doctor_list, doctors)
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error fetching doctors")
+        raise HTTPException(status_code=500, detail="Error fetching doctors")
 
 # Medical Stock
 @api_router.post("/medical-stock", response_model=MedicalStock)
+@db_guard.write("medical_stock")
 async def create_medical_stock(stock: MedicalStockCreate):
     try:
         stock_dict = stock.dict()
         status = calculate_stock_status(stock.quantity, stock.item_name)
         stock_dict["status"] = status
+        stock_dict["id"] = resilience.write_id()
+        stock_dict.update(locate(stock.location))
         
         stock_obj = MedicalStock(**stock_dict)
         stock_data = prepare_for_mongo(stock_obj.dict())
-        await db.medical_stock.insert_one(stock_data)
+        await insert_once(db.medical_stock, stock_data)
         return stock_obj
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error creating medical stock: {str(e)}")
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error creating medical stock")
+        raise HTTPException(status_code=500, detail="Error creating medical stock")
 
 @api_router.get("/medical-stock", response_model=List[MedicalStock])
-async def get_medical_stock():
+@db_guard.read("medical_stock_list")
+async def get_medical_stock(region: Optional[str] = None, fields: Optional[str] = None):
+    projection, adapter = sparse_fieldset(MedicalStock, fields)
     try:
-        stock = await db.medical_stock.find().sort("last_updated", -1).to_list(1000)
-        return [MedicalStock(**item) for item in stock]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching medical stock: {str(e)}")
+        reads = read_routing.database(db, "medical_stock_list")
+        stock = await reads.medical_stock.find(region_scope(region), projection).sort("last_updated", -1).to_list(1000)
+        return list_response(adapter or medical_stock_list, stock)
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error fetching medical stock")
+        raise HTTPException(status_code=500, detail="Error fetching medical stock")
 
 # Users
 @api_router.post("/users", response_model=User)
+@db_guard.write("users")
 async def create_user(user: UserCreate):
     try:
         user_dict = user.dict()
+        user_dict["id"] = resilience.write_id()
+        user_dict.update(regions.region_fields(user_dict["location"]))
         user_obj = User(**user_dict)
-        await db.users.insert_one(user_obj.dict())
+        await insert_once(db.users, ids.encode(user_obj.dict()))
         return user_obj
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error creating user: {str(e)}")
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error creating user")
+        raise HTTPException(status_code=500, detail="Error creating user")
 
 @api_router.get("/users", response_model=List[User])
-async def get_users():
+@db_guard.read("users_list")
+async def get_users(region: Optional[str] = None, fields: Optional[str] = None):
+    projection, adapter = sparse_fieldset(User, fields)
     try:
-        users = await db.users.find().to_list(1000)
-        return [User(**user) for user in users]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching users: {str(e)}")
+        reads = read_routing.database(db, "users_list")
+        users = await reads.users.find(region_scope(region), projection).to_list(1000)
+        return list_response(adapter or user_list, users)
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error fetching users")
+        raise HTTPException(status_code=500, detail="Error fetching users")
+
+# Regions
+@api_router.get("/regions", response_model=List[Region])
+async def get_regions(parent: Optional[str] = None, level: Optional[str] = None):
+    """Browse the gazetteer; without ``parent`` the top level (states) is returned"""
+    gazetteer = regions.gazetteer()
+    if parent and parent not in gazetteer.regions:
+        raise HTTPException(status_code=404, detail="Region not found")
+    if level:
+        found = [region for region in gazetteer.regions.values() if region["level"] == level]
+        if parent:
+            found = [region for region in found if parent in gazetteer.ancestors(region["id"])]
+    else:
+        found = [gazetteer.regions[region_id] for region_id in gazetteer.children.get(parent, [])]
+    return [Region(**region) for region in found]
 
-# Include the router in the main app
-app.include_router(api_router)
+# Analytics
+TREND_DEFAULT_PERIODS = {"day": 90, "week": 26, "month": 12}
+
+@api_router.get("/analytics/trends", response_model=TrendResponse)
+@db_guard.read("report_trends")
+async def get_report_trends(
+    granularity: TrendGranularity = TrendGranularity.MONTH,
+    group_by: TrendGroup = TrendGroup.REPORT_TYPE,
+    periods: Optional[int] = None,
+    report_type: Optional[ReportType] = None,
+    severity: Optional[SeverityLevel] = None,
+    region: Optional[str] = None,
+):
+    try:
+        end = datetime.now(timezone.utc).date()
+        periods = periods or TREND_DEFAULT_PERIODS[granularity.value]
+        start = rollups.shift_buckets(rollups.bucket_start(end, granularity.value), granularity.value, periods - 1)
+        filters = {
+            "report_type": report_type.value if report_type else None,
+            "severity": severity.value if severity else None,
+            "region_ids": region,
+        }
+        series = await rollups.trends(read_routing.database(db, "report_trends"), granularity.value, start, end, group_by.value, filters)
+        buckets = rollups.bucket_range(start, end, granularity.value)
+        return TrendResponse(
+            granularity=granularity,
+            group_by=group_by,
+            start=buckets[0],
+            end=end.isoformat(),
+            buckets=buckets,
+            series=[
+                TrendSeries(
+                    key=key,
+                    total=sum(points.values()),
+                    points=[TrendPoint(bucket=bucket, count=points.get(bucket, 0)) for bucket in buckets],
+                )
+                for key, points in sorted(series.items())
+            ],
+        )
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error fetching trends")
+        raise HTTPException(status_code=500, detail="Error fetching trends")
+
+@api_router.get("/analytics/water-disease-correlation", response_model=List[WaterDiseaseCorrelation])
+@db_guard.read("water_disease_correlation")
+async def get_water_disease_correlation(min_reports: int = 1, limit: int = 100, region: Optional[str] = None):
+    try:
+        reads = read_routing.database(db, "water_disease_correlation")
+        results = await reads[correlation.COLLECTION].find(
+            {**region_scope(region), "report_count": {"$gte": min_reports}}
+        ).sort([("report_count", -1), ("test_date", -1)]).limit(limit).to_list(limit)
+        return list_response(correlation_list, results)
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error fetching water-disease correlation")
+        raise HTTPException(status_code=500, detail="Error fetching water-disease correlation")
+
+# Exports
+@api_router.get("/export/{collection}.parquet")
+async def export_parquet(collection: str, region: Optional[str] = None, include_archived: bool = False):
+    """Stream a collection as a Parquet file with typed columns"""
+    import export  # pyarrow is only loaded by workers that serve exports
+
+    if collection not in export.COLUMNS:
+        raise HTTPException(status_code=404, detail=f"Unknown export {collection}; choose one of {', '.join(export.COLUMNS)}")
+    reads = read_routing.database(db, "export")
+    return StreamingResponse(
+        export.stream_parquet(reads, collection, region_scope(region), include_archived=include_archived),
+        media_type="application/vnd.apache.parquet",
+        headers={"Content-Disposition": f'attachment; filename="{collection}.parquet"'},
+    )
+
+# Admin diagnostics
+@api_router.get("/admin/slow-queries", response_model=List[SlowQuery])
+async def get_slow_queries(limit: int = 100, collection: Optional[str] = None):
+    try:
+        query = {"collection": collection} if collection else {}
+        entries = await db[slow_queries.COLLECTION].find(query).sort("$natural", -1).limit(limit).to_list(limit)
+        return [SlowQuery(**entry) for entry in entries]
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error fetching slow queries")
+        raise HTTPException(status_code=500, detail="Error fetching slow queries")
+
+@api_router.get("/admin/jobs", response_model=List[JobStatus])
+async def get_scheduled_jobs():
+    return [JobStatus(**job.status()) for job in job_scheduler.jobs.values()]
+
+@api_router.post("/admin/jobs/{job_name}/run", response_model=JobStatus)
+async def run_scheduled_job(job_name: str):
+    if job_name not in job_scheduler.jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    await job_scheduler.trigger(job_name)
+    return JobStatus(**job_scheduler.jobs[job_name].status())
+
+@api_router.get("/admin/notifications", response_model=List[NotificationCount])
+async def get_notification_outbox():
+    """Outbox messages by channel and delivery status"""
+    try:
+        pipeline = [{"$group": {"_id": {"channel": "$channel", "status": "$status"}, "count": {"$sum": 1}}}]
+        rows = await db[notifications.OUTBOX].aggregate(pipeline).to_list(None)
+        return sorted((NotificationCount(**row["_id"], count=row["count"]) for row in rows), key=lambda row: (row.channel, row.status))
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error fetching notification outbox")
+        raise HTTPException(status_code=500, detail="Error fetching notification outbox")
+
+@api_router.get("/admin/database", response_model=DatabaseStatus)
+async def get_database_status():
+    return DatabaseStatus(**db_guard.status())
+
+@api_router.get("/admin/profiles/{profile_id}")
+async def get_request_profile(profile_id: str, format: str = "html", x_profile_token: str = Header(default="")):
+    if not profiling.token_matches(x_profile_token):
+        raise HTTPException(status_code=403, detail="Profiling is not enabled for this token")
+    path = profiling.profile_path(profile_id, ".txt" if format == "text" else ".html")
+    if path is None or not path.exists():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    content = path.read_text(encoding="utf-8")
+    if format == "text":
+        return PlainTextResponse(content)
+    return HTMLResponse(content)
 
 # Admin Dashboard Route
-@app.get("/admin", response_class=HTMLResponse)
+@root_router.get("/admin", response_class=HTMLResponse)
 async def admin_dashboard():
     """Serve the admin dashboard HTML page for government officials"""
     try:
@@ -348,17 +1037,52 @@ async def admin_dashboard():
         return HTMLResponse(content=html_content, status_code=200)
     except FileNotFoundError:
         return HTMLResponse(content="<h1>Admin Dashboard Not Found</h1><p>Please ensure admin.html exists in the backend directory.</p>", status_code=404)
-    except Exception as e:
-        return HTMLResponse(content=f"<h1>Error Loading Admin Dashboard</h1><p>{str(e)}</p>", status_code=500)
-
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    except Exception:
+        logger.exception("Error loading admin dashboard")
+        return HTMLResponse(content="<h1>Error Loading Admin Dashboard</h1>", status_code=500)
+
+# Prometheus metrics
+@root_router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+def create_app(mongo_client=None) -> FastAPI:
+    """Build the application; Mongo is connected and warmed by the lifespan handler.
+
+    Pass ``mongo_client`` to reuse an existing client, which the app will then not close.
+    """
+    load_dotenv(ROOT_DIR / '.env')
+
+    # Create the main app without a prefix
+    app = FastAPI(lifespan=lifespan)
+    app.state.mongo_client = mongo_client
+    app.state.ready = False
+
+    # Include the routers in the main app
+    app.include_router(api_router)
+    app.include_router(root_router)
+
+    # Shed low-priority reads under saturation; urgent reports are always admitted
+    app.add_middleware(admission.AdmissionControlMiddleware)
+
+    # Add CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["Age", "Warning", resilience.STALE_HEADER],
+    )
+
+    # Record per-route latency, in-flight and response size metrics
+    app.add_middleware(metrics.MetricsMiddleware, router=app.router)
+
+    # Per-request profiling is only installed when PROFILER_TOKEN is configured
+    if profiling.is_enabled():
+        app.add_middleware(profiling.ProfilingMiddleware)
+
+    return app
 
 # Configure logging
 logging.basicConfig(
@@ -367,6 +1091,102 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+async def warm_up():
+    """Connect, warm caches and start background work before the app reports ready"""
+    started = time.perf_counter()
+    regions.gazetteer()
+    water_rules.active()
+    await asyncio.gather(warm_connection_pool(), warm_duplicate_index(), ensure_indexes())
+    await start_slow_query_log()
+    await job_scheduler.start(db)
+    await notification_dispatcher.start(db)
+    logger.info(f"Ready in {time.perf_counter() - started:.2f}s")
+
+async def warm_connection_pool():
+    """Open pooled connections up front so early requests skip the connection handshake"""
+    try:
+        await asyncio.gather(*(db.command("ping") for _ in range(WARM_CONNECTIONS)))
+    except Exception as e:
+        logger.warning(f"Could not warm connection pool: {str(e)}")
+
+async def warm_duplicate_index():
+    try:
+        since = datetime.now(timezone.utc) - duplicate_index.window
+        recent = db.health_reports.find({"date_reported": {"$gte": since.isoformat()}}).sort("date_reported", 1)
+        async for report in recent:
+            report_obj = HealthReport(**report)
+            duplicate_index.add(report_obj, canonical_id=report_obj.duplicate_of)
+        logger.info(f"Duplicate index warmed with {len(duplicate_index)} recent reports")
+    except Exception as e:
+        logger.warning(f"Duplicate index starts empty: {str(e)}")
+
+async def ensure_indexes():
+    # Independent per module, so one failing index build does not skip the others
+    for module in (ids, archive, report_workflow, regions, rollups, correlation, notifications):
+        try:
+            await module.ensure_indexes(db)
+        except Exception as e:
+            logger.warning(f"Could not ensure {module.__name__} indexes: {str(e)}")
+
+async def start_slow_query_log():
+    try:
+        await slow_query_log.start(db)
+    except Exception as e:
+        logger.warning(f"Slow query log disabled: {str(e)}")
+
+# Scheduled jobs
+@job_scheduler.job("write_spool_replay", interval=15, exclusive=False)
+async def replay_write_spool():
+    """Apply writes spooled on this host while the database was unavailable"""
+    await db_guard.replay()
+
+@job_scheduler.job("dedup_prune", interval=300, exclusive=False)
+async def prune_duplicate_index():
+    duplicate_index.prune()
+
+@job_scheduler.job("profile_expiry", interval=3600, exclusive=False)
+async def expire_request_profiles():
+    """Delete stored request profiles older than PROFILE_RETENTION_DAYS"""
+    if not profiling.PROFILE_DIR.exists():
+        return
+    cutoff = datetime.now(timezone.utc).timestamp() - float(os.environ.get("PROFILE_RETENTION_DAYS", "7")) * 86400
+    for path in profiling.PROFILE_DIR.iterdir():
+        if path.is_file() and path.stat().st_mtime < cutoff:
+            path.unlink()
+
+@job_scheduler.job("water_disease_correlation", interval=600)
+async def refresh_water_disease_correlation():
+    """Pick up disease reports filed since unsafe readings were last correlated"""
+    updated = await correlation.refresh_open_windows(db)
+    logger.info(f"Refreshed water-disease correlation for {updated} unsafe readings")
+
+@job_scheduler.job("water_reclassify", interval=3600, run_on_start=True)
+async def reclassify_water_quality():
+    """Bring stored water statuses in line with the active rule set"""
+    result = await water_rules.reclassify(db)
+    await correlation.apply_reclassification(db, result)
+
+@job_scheduler.job("report_counter_reconcile", interval=3600, run_on_start=True)
+async def reconcile_report_counters():
+    """Recompute the dashboard's active-case counters from health_reports"""
+    await report_workflow.reconcile(db)
+
+@job_scheduler.job("report_archival", interval=3600)
+async def archive_resolved_reports():
+    """Move old resolved reports out of the hot health_reports collection"""
+    await archive.archive_resolved(db)
+
+@job_scheduler.job("stock_status_reconcile", interval=900)
+async def reconcile_stock_status():
+    """Recompute medical stock status from quantity for rows that have drifted"""
+    updates = []
+    async for item in db.medical_stock.find({}, {"id": 1, "quantity": 1, "item_name": 1, "status": 1}):
+        status = calculate_stock_status(item.get("quantity", 0), item.get("item_name", ""))
+        if item.get("status") != status.value:
+            updates.append(UpdateOne({"_id": item["_id"]}, {"$set": {"status": status.value}}))
+    if updates:
+        await db.medical_stock.bulk_write(updates, ordered=False)
+        logger.info(f"Reconciled status of {len(updates)} medical stock items")
+
+# ASGI entry point: uvicorn server:app
+app = create_app()
@@ -0,0 +1,213 @@
+"""Slow-query log for MongoDB operations issued through the Motor client.
+
+A pymongo command listener times every read/write command. Commands slower
+than ``SLOW_QUERY_MS`` are handed to a background task that stores them in a
+capped collection. The first time a query shape is seen, the task also runs
+``explain`` for it so collection scans are flagged without anyone having to
+reproduce the query by hand.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+
+from bson import json_util
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "slow_queries"
+THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_MS", "100"))
+CAPPED_SIZE_BYTES = int(os.environ.get("SLOW_QUERY_LOG_BYTES", str(16 * 1024 * 1024)))
+QUEUE_SIZE = 1000
+
+MONITORED_COMMANDS = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+
+
+def _to_json(value):
+    """Convert BSON values (dates, ObjectIds, ...) into plain JSON-safe data."""
+    return json.loads(json_util.dumps(value))
+
+
+def extract_query(command_name: str, command: dict):
+    """Return ``(filter, sort, pipeline)`` for a monitored command document."""
+    if command_name == "find":
+        return command.get("filter") or {}, command.get("sort"), None
+    if command_name in ("count", "distinct"):
+        return command.get("query") or {}, None, None
+    if command_name == "findAndModify":
+        return command.get("query") or {}, command.get("sort"), None
+    if command_name == "aggregate":
+        pipeline = command.get("pipeline") or []
+        match = next((stage["$match"] for stage in pipeline if "$match" in stage), {})
+        sort = next((stage["$sort"] for stage in pipeline if "$sort" in stage), None)
+        return match, sort, pipeline
+    if command_name == "update":
+        updates = command.get("updates") or [{}]
+        return updates[0].get("q") or {}, None, None
+    if command_name == "delete":
+        deletes = command.get("deletes") or [{}]
+        return deletes[0].get("q") or {}, None, None
+    return {}, None, None
+
+
+def _shape(value):
+    if isinstance(value, dict):
+        return {key: _shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_shape(item) for item in value[:1]]
+    return 1
+
+
+def query_shape(collection: str, command_name: str, filter_, sort) -> str:
+    """Hash of the query with all literal values erased."""
+    shape = {
+        "collection": collection,
+        "command": command_name,
+        "filter": _shape(filter_),
+        "sort": list((sort or {}).keys()),
+    }
+    return hashlib.sha1(json.dumps(shape, sort_keys=True).encode()).hexdigest()
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """Times monitored commands and forwards the slow ones to ``SlowQueryLog``."""
+
+    def __init__(self, threshold_ms: float = THRESHOLD_MS):
+        self.threshold_ms = threshold_ms
+        self.log = None
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def started(self, event):
+        if event.command_name not in MONITORED_COMMANDS:
+            return
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str) or collection == COLLECTION or collection.startswith("system."):
+            return
+        filter_, sort, pipeline = extract_query(event.command_name, event.command)
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = {
+                "database": event.database_name,
+                "collection": collection,
+                "command": event.command_name,
+                "filter": filter_,
+                "sort": sort,
+                "pipeline": pipeline,
+            }
+
+    def _finish(self, event, failed: bool):
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        duration_ms = event.duration_micros / 1000
+        if duration_ms < self.threshold_ms or self.log is None:
+            return
+        pending["duration_ms"] = round(duration_ms, 3)
+        pending["failed"] = failed
+        self.log.submit(pending)
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+
+class SlowQueryLog:
+    """Background writer for the ``slow_queries`` capped collection."""
+
+    def __init__(self, listener: SlowQueryListener):
+        self.listener = listener
+        self.db = None
+        self._loop = None
+        self._queue = None
+        self._task = None
+        self._explained = set()
+
+    async def start(self, db):
+        self.db = db
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        existing = await db.list_collection_names(filter={"name": COLLECTION})
+        if not existing:
+            await db.create_collection(COLLECTION, capped=True, size=CAPPED_SIZE_BYTES)
+        self._task = asyncio.create_task(self._run())
+        self.listener.log = self
+
+    async def stop(self):
+        self.listener.log = None
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def submit(self, entry: dict):
+        """Called from driver threads; hands the entry to the event loop."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._enqueue, entry)
+
+    def _enqueue(self, entry: dict):
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            logger.warning("Slow query queue full, dropping entry for %s", entry["collection"])
+
+    async def _run(self):
+        while True:
+            entry = await self._queue.get()
+            try:
+                await self._record(entry)
+            except Exception:
+                logger.exception("Failed to record slow query")
+
+    async def _record(self, entry: dict):
+        shape = query_shape(entry["collection"], entry["command"], entry["filter"], entry["sort"])
+        document = {
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            "database": entry["database"],
+            "collection": entry["collection"],
+            "command": entry["command"],
+            "filter": _to_json(entry["filter"]),
+            "sort": _to_json(entry["sort"]) if entry["sort"] else None,
+            "duration_ms": entry["duration_ms"],
+            "failed": entry["failed"],
+            "shape": shape,
+            "explain": None,
+            "collection_scan": None,
+        }
+        if shape not in self._explained:
+            self._explained.add(shape)
+            seen = await self.db[COLLECTION].find_one({"shape": shape, "explain": {"$ne": None}}, {"_id": 1})
+            if not seen:
+                plan = await self._explain(entry)
+                if plan is not None:
+                    document["explain"] = _to_json(plan)
+                    document["collection_scan"] = "COLLSCAN" in json.dumps(document["explain"])
+        await self.db[COLLECTION].insert_one(document)
+
+    async def _explain(self, entry: dict):
+        if entry["command"] == "aggregate":
+            target = {"aggregate": entry["collection"], "pipeline": entry["pipeline"], "cursor": {}}
+        else:
+            target = {"find": entry["collection"], "filter": entry["filter"]}
+            if entry["sort"]:
+                target["sort"] = entry["sort"]
+        try:
+            result = await self.db.command({"explain": target, "verbosity": "queryPlanner"})
+        except Exception as e:
+            logger.warning("Explain failed for %s: %s", entry["collection"], e)
+            return None
+        planner = result.get("queryPlanner")
+        if planner is None and result.get("stages"):
+            planner = result["stages"][0].get("$cursor", {}).get("queryPlanner")
+        return (planner or {}).get("winningPlan", planner)
@@ -0,0 +1,194 @@
+"""Versioned water-quality rule sets.
+
+A rule set lists the conditions that make a sample ``unsafe`` or
+``moderate``; anything else is ``safe``. A sample missing any measurement
+(absent, null or NaN) cannot be shown to be safe and is classified
+``unsafe``. Each set is compiled once into a
+closure for single readings and a numpy evaluator for whole batches, so
+the API and bulk reclassification share one definition.
+
+The active set is chosen with ``WATER_RULESET`` (default ``legacy@1``, the
+thresholds the API has always used). Every stored reading records the
+``rules_version`` that classified it, which lets ``reclassify`` find and
+rewrite readings classified under an older set.
+"""
+import logging
+import math
+import operator
+import os
+
+import numpy as np
+from pymongo import UpdateMany
+
+logger = logging.getLogger(__name__)
+
+PARAMETERS = ("tds", "ph", "turbidity", "chlorine")
+FIELDS = {"tds": "tds_value", "ph": "ph_level", "turbidity": "turbidity", "chlorine": "chlorine_level"}
+OPERATORS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+# Conditions are (parameter, operator, threshold); any match assigns the status.
+RULESETS = {
+    "legacy@1": {
+        "description": "Original hard-coded thresholds",
+        "unsafe": [("tds", ">", 1000), ("ph", "<", 6.5), ("ph", ">", 8.5), ("turbidity", ">", 5), ("chlorine", "<", 0.2)],
+        "moderate": [("tds", ">", 500), ("turbidity", ">", 2)],
+    },
+    "bis@2012": {
+        "description": "BIS IS 10500:2012 acceptable and permissible limits",
+        "unsafe": [("tds", ">", 2000), ("ph", "<", 6.5), ("ph", ">", 8.5), ("turbidity", ">", 5), ("chlorine", "<", 0.2)],
+        "moderate": [("tds", ">", 500), ("turbidity", ">", 1), ("chlorine", ">", 1)],
+    },
+    "who@2022": {
+        "description": "WHO Guidelines for drinking-water quality, 4th edition incl. 2022 addenda",
+        "unsafe": [("tds", ">", 1000), ("turbidity", ">", 5), ("chlorine", "<", 0.2), ("chlorine", ">", 5)],
+        "moderate": [("tds", ">", 600), ("turbidity", ">", 1), ("ph", "<", 6.5), ("ph", ">", 8.5)],
+    },
+}
+STATUSES = ("unsafe", "moderate")
+
+
+def _validate(conditions):
+    for parameter, op, threshold in conditions:
+        if parameter not in PARAMETERS or op not in OPERATORS:
+            raise ValueError(f"Invalid rule condition: {parameter} {op} {threshold}")
+        float(threshold)
+
+
+class RuleSet:
+    def __init__(self, version: str, definition: dict):
+        self.version = version
+        self.description = definition.get("description", "")
+        self.conditions = {}
+        for status in STATUSES:
+            conditions = [(p, op, float(t)) for p, op, t in definition.get(status, [])]
+            _validate(conditions)
+            self.conditions[status] = conditions
+        self.classify = self._compile()
+
+    def _compile(self):
+        """Build ``classify(tds, ph, turbidity, chlorine)`` as a closure over the conditions."""
+        def bounds(status):
+            # A status applies when any parameter falls below its low or above its high bound. Inclusive
+            # conditions move the bound one float outwards so every check is a plain strict comparison.
+            low, high = dict.fromkeys(PARAMETERS, -math.inf), dict.fromkeys(PARAMETERS, math.inf)
+            for parameter, op, threshold in self.conditions[status]:
+                if op in ("<", "<="):
+                    low[parameter] = max(low[parameter], math.nextafter(threshold, math.inf) if op == "<=" else threshold)
+                else:
+                    high[parameter] = min(high[parameter], math.nextafter(threshold, -math.inf) if op == ">=" else threshold)
+            return [bound for parameter in PARAMETERS for bound in (low[parameter], high[parameter])]
+
+        u_tds_lo, u_tds_hi, u_ph_lo, u_ph_hi, u_turb_lo, u_turb_hi, u_cl_lo, u_cl_hi = bounds("unsafe")
+        m_tds_lo, m_tds_hi, m_ph_lo, m_ph_hi, m_turb_lo, m_turb_hi, m_cl_lo, m_cl_hi = bounds("moderate")
+
+        def classify(tds, ph, turbidity, chlorine):
+            # NaN compares unequal to itself; checked first so no threshold comparison can pass it as safe
+            if (tds is None or tds != tds or ph is None or ph != ph or turbidity is None or turbidity != turbidity
+                    or chlorine is None or chlorine != chlorine):
+                return "unsafe"
+            if (tds < u_tds_lo or tds > u_tds_hi or ph < u_ph_lo or ph > u_ph_hi
+                    or turbidity < u_turb_lo or turbidity > u_turb_hi or chlorine < u_cl_lo or chlorine > u_cl_hi):
+                return "unsafe"
+            if (tds < m_tds_lo or tds > m_tds_hi or ph < m_ph_lo or ph > m_ph_hi
+                    or turbidity < m_turb_lo or turbidity > m_turb_hi or chlorine < m_cl_lo or chlorine > m_cl_hi):
+                return "moderate"
+            return "safe"
+
+        return classify
+
+    def evaluate(self, tds, ph, turbidity, chlorine) -> np.ndarray:
+        """Vectorized ``classify`` over equally sized arrays."""
+        values = {
+            "tds": np.asarray(tds, dtype=float),
+            "ph": np.asarray(ph, dtype=float),
+            "turbidity": np.asarray(turbidity, dtype=float),
+            "chlorine": np.asarray(chlorine, dtype=float),
+        }
+        masks = {}
+        missing = np.zeros(values["tds"].shape, dtype=bool)
+        for column in values.values():
+            missing |= np.isnan(column)
+        for status in STATUSES:
+            mask = missing.copy() if status == "unsafe" else np.zeros(values["tds"].shape, dtype=bool)
+            for parameter, op, threshold in self.conditions[status]:
+                mask |= OPERATORS[op](values[parameter], threshold)
+            masks[status] = mask
+        return np.where(masks["unsafe"], "unsafe", np.where(masks["moderate"], "moderate", "safe"))
+
+    def describe(self) -> dict:
+        return {
+            "version": self.version,
+            "description": self.description,
+            "unsafe": [{"parameter": p, "operator": op, "threshold": t} for p, op, t in self.conditions["unsafe"]],
+            "moderate": [{"parameter": p, "operator": op, "threshold": t} for p, op, t in self.conditions["moderate"]],
+        }
+
+
+_compiled = {}
+
+
+def get(version: str) -> RuleSet:
+    if version not in RULESETS:
+        raise KeyError(f"Unknown water rule set {version!r}; choose one of {', '.join(RULESETS)}")
+    if version not in _compiled:
+        _compiled[version] = RuleSet(version, RULESETS[version])
+    return _compiled[version]
+
+
+_active = None
+
+
+def active() -> RuleSet:
+    """The rule set selected by ``WATER_RULESET``, resolved once per process."""
+    global _active
+    if _active is None:
+        _active = get(os.environ.get("WATER_RULESET", "legacy@1"))
+    return _active
+
+
+async def reclassify(db, ruleset: RuleSet = None, chunk_size: int = 5000) -> dict:
+    """Rewrite ``status`` of readings not yet classified by ``ruleset``.
+
+    Readings are streamed in chunks; each chunk is evaluated in one vectorized
+    call and written back with one ``UpdateMany`` per resulting status.
+    Returns ``{"scanned": n, "changed": n, "now_unsafe": [...], "no_longer_unsafe": [...]}``
+    where the lists hold the ``id`` of readings that moved into or out of
+    ``unsafe``, so callers can update what is derived from unsafe readings.
+    """
+    ruleset = ruleset or active()
+    projection = {"_id": 1, "id": 1, "status": 1, **{field: 1 for field in FIELDS.values()}}
+    cursor = db.water_quality.find({"rules_version": {"$ne": ruleset.version}}, projection).batch_size(chunk_size)
+    scanned = changed = 0
+    now_unsafe, no_longer_unsafe = [], []
+    chunk = []
+
+    async def flush(docs):
+        columns = {p: [doc.get(FIELDS[p], np.nan) for doc in docs] for p in PARAMETERS}
+        statuses = ruleset.evaluate(columns["tds"], columns["ph"], columns["turbidity"], columns["chlorine"])
+        groups = {}
+        for doc, status in zip(docs, statuses.tolist()):
+            groups.setdefault(status, []).append(doc["_id"])
+        await db.water_quality.bulk_write(
+            [
+                UpdateMany({"_id": {"$in": ids}}, {"$set": {"status": status, "rules_version": ruleset.version}})
+                for status, ids in groups.items()
+            ],
+            ordered=False,
+        )
+        moved = [(doc, status) for doc, status in zip(docs, statuses.tolist()) if doc.get("status") != status]
+        now_unsafe.extend(doc["id"] for doc, status in moved if status == "unsafe")
+        no_longer_unsafe.extend(doc["id"] for doc, status in moved if doc.get("status") == "unsafe")
+        return len(moved)
+
+    async for doc in cursor:
+        chunk.append(doc)
+        if len(chunk) >= chunk_size:
+            changed += await flush(chunk)
+            scanned += len(chunk)
+            chunk = []
+    if chunk:
+        changed += await flush(chunk)
+        scanned += len(chunk)
+    if scanned:
+        logger.info(f"Reclassified {scanned} water readings under {ruleset.version}, {changed} changed status")
+    return {"scanned": scanned, "changed": changed, "now_unsafe": now_unsafe, "no_longer_unsafe": no_longer_unsafe}
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Document id benchmark for Rural Water Health Monitoring System
+Compares insert throughput and `id` index size for each id scheme against a local mongod
+
+Usage:
+    python id_benchmark.py --docs 10000000 --output id_results.json
+
+Schemes:
+  * uuid4-string - random UUIDv4 as a 36-char string (the original scheme)
+  * uuid7-string - time-ordered UUIDv7 as a string
+  * uuid7-binary - time-ordered UUIDv7 as 16-byte BSON Binary (the current scheme)
+
+Every scheme inserts the same report-shaped documents into its own collection
+with a unique index on `id`. Throughput is reported overall and for the last
+tenth of the run, where random ids suffer most once the index outgrows the
+WiredTiger cache.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+
+from bson.binary import Binary
+from pymongo import MongoClient
+
+ROOT_DIR = Path(__file__).parent
+sys.path.insert(0, str(ROOT_DIR / "backend"))
+
+import ids  # noqa: E402
+
+SCHEMES = {
+    "uuid4-string": lambda: str(uuid.uuid4()),
+    "uuid7-string": lambda: str(ids.uuid7()),
+    "uuid7-binary": lambda: Binary.from_uuid(ids.uuid7()),
+}
+
+
+def report_document(make_id):
+    return {
+        "id": make_id(),
+        "reporter_name": "ASHA Worker",
+        "report_type": random.choice(["disease", "water_quality", "emergency"]),
+        "severity": random.choice(["low", "medium", "high", "critical"]),
+        "symptoms": "Diarrhea, vomiting and dehydration in children",
+        "location": {"lat": 28.7041, "lng": 77.1025, "address": "Village Rampur, Block Kharkhoda, Sonipat District"},
+        "status": "active",
+    }
+
+
+def run_scheme(db, name, make_id, docs, batch_size):
+    collection = db[f"ids_{name.replace('-', '_')}"]
+    collection.drop()
+    collection.create_index("id", unique=True)
+
+    tail_start = docs - docs // 10
+    tail_started = None
+    inserted = 0
+    started = time.perf_counter()
+    while inserted < docs:
+        if tail_started is None and inserted >= tail_start:
+            tail_started, tail_start = time.perf_counter(), inserted
+        size = min(batch_size, docs - inserted)
+        collection.insert_many([report_document(make_id) for _ in range(size)], ordered=False)
+        inserted += size
+        if inserted % (batch_size * 100) == 0:
+            print(f"  {name}: {inserted:,}/{docs:,}", file=sys.stderr)
+    finished = time.perf_counter()
+
+    stats = db.command("collStats", collection.name)
+    sample = collection.find_one({}, {"_id": 0, "id": 1})
+    return {
+        "docs": docs,
+        "seconds": round(finished - started, 2),
+        "inserts_per_second": round(docs / (finished - started), 1),
+        "tail_inserts_per_second": round((docs - tail_start) / max(finished - tail_started, 1e-9), 1),
+        "id_index_bytes": stats["indexSizes"].get("id_1"),
+        "total_index_bytes": stats["totalIndexSize"],
+        "storage_bytes": stats["storageSize"],
+        "sample_id": ids.to_str(sample["id"]) if sample else None,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare insert throughput and index size per document id scheme")
+    parser.add_argument("--docs", type=int, default=10_000_000, help="documents inserted per scheme")
+    parser.add_argument("--batch-size", type=int, default=10_000, help="documents per insert_many")
+    parser.add_argument("--schemes", default=",".join(SCHEMES), help="comma separated schemes to run")
+    parser.add_argument("--mongo-url", default=os.environ.get("BENCHMARK_MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db-name", default=f"healthguard_idbench_{int(time.time())}")
+    parser.add_argument("--keep-db", action="store_true", help="do not drop the benchmark database")
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    client = MongoClient(args.mongo_url)
+    db = client[args.db_name]
+    results = {"mongo_url": args.mongo_url, "schemes": {}}
+    try:
+        for name in args.schemes.split(","):
+            print(f"🔑 Inserting {args.docs:,} documents with {name} ids", file=sys.stderr)
+            results["schemes"][name] = run_scheme(db, name, SCHEMES[name], args.docs, args.batch_size)
+    finally:
+        if not args.keep_db:
+            client.drop_database(args.db_name)
+        client.close()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+        print(f"📊 Results written to {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
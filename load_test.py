@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Async Load Test for Rural Water Health Monitoring System
+Replays the dashboard traffic mix against a local mongod and an in-process uvicorn
+
+Usage:
+    python load_test.py --clients 50 --duration 60 --output load_results.json
+
+Each virtual client repeatedly picks a scenario by weight:
+  * dashboard - the five parallel GETs issued by fetchDashboardData in App.js
+  * report    - a citizen submitting a health report
+  * admin     - the admin page plus its dashboard stats call
+Latency percentiles and throughput per endpoint are written as JSON.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+ROOT_DIR = Path(__file__).parent
+
+VILLAGES = [
+    ("Village Rampur, Block Kharkhoda, Sonipat District", 28.7041, 77.1025),
+    ("Anganwadi Center, Village Sisana, Gurugram District", 28.6139, 77.2090),
+    ("Village Palwal, Faridabad District", 28.5355, 77.3910),
+    ("Primary Health Center, Village Nuh, Mewat District", 28.4595, 77.0266),
+    ("Village Bahadurgarh, Jhajjar District", 28.8386, 77.1192),
+]
+
+SYMPTOMS = [
+    "High fever, severe headache and body ache",
+    "Diarrhea, vomiting and dehydration in children",
+    "Skin rashes and itching after using hand pump water",
+    "Strange taste and yellow colour in village water supply",
+]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def random_location():
+    address, lat, lng = random.choice(VILLAGES)
+    return {"lat": lat + random.uniform(-0.01, 0.01), "lng": lng + random.uniform(-0.01, 0.01), "address": address}
+
+
+def random_report():
+    return {
+        "reporter_name": f"Load Test Reporter {random.randint(1, 10000)}",
+        "report_type": random.choice(["disease", "water_quality", "complaint"]),
+        "symptoms": random.choice(SYMPTOMS),
+        "severity": random.choices(["low", "medium", "high", "critical"], weights=[4, 3, 2, 1])[0],
+        "location": random_location(),
+        "is_anonymous": random.random() < 0.2,
+    }
+
+
+class LoadTester:
+    def __init__(self, base_url, clients, duration, weights, think_time):
+        self.base_url = base_url.rstrip("/")
+        self.clients = clients
+        self.duration = duration
+        self.weights = weights
+        self.think_time = think_time
+        self.samples = {}
+        self.errors = {}
+        self.scenarios = {name: 0 for name in weights}
+
+    async def timed(self, client, endpoint, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, f"{self.base_url}{path}", **kwargs)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        elapsed = time.perf_counter() - start
+        self.samples.setdefault(endpoint, []).append(elapsed)
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    async def dashboard(self, client, headers):
+        await asyncio.gather(
+            self.timed(client, "GET /api/dashboard/stats", "GET", "/api/dashboard/stats", headers=headers),
+            self.timed(client, "GET /api/reports", "GET", "/api/reports", params={"limit": 15}, headers=headers),
+            self.timed(client, "GET /api/water-quality", "GET", "/api/water-quality", params={"limit": 15}, headers=headers),
+            self.timed(client, "GET /api/doctors", "GET", "/api/doctors", headers=headers),
+            self.timed(client, "GET /api/medical-stock", "GET", "/api/medical-stock", headers=headers),
+        )
+
+    async def report(self, client, headers):
+        await self.timed(client, "POST /api/reports", "POST", "/api/reports", json=random_report(), headers=headers)
+
+    async def admin(self, client, headers):
+        await self.timed(client, "GET /admin", "GET", "/admin", headers=headers)
+        await self.timed(client, "GET /api/dashboard/stats", "GET", "/api/dashboard/stats", headers=headers)
+
+    async def virtual_client(self, client, deadline, index):
+        names = list(self.weights)
+        weights = [self.weights[name] for name in names]
+        # Distinct client addresses so per-client admission buckets behave as in production; the backend only
+        # honours them from a trusted proxy (run_in_process trusts loopback, other targets need ADMISSION_TRUSTED_PROXIES)
+        headers = {"X-Forwarded-For": f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}"}
+        while time.perf_counter() < deadline:
+            scenario = random.choices(names, weights=weights)[0]
+            self.scenarios[scenario] += 1
+            await getattr(self, scenario)(client, headers)
+            if self.think_time:
+                await asyncio.sleep(random.uniform(0, self.think_time))
+
+    async def seed_post(self, client, path, payload):
+        """POST seed data, backing off when admission control pushes back."""
+        for _ in range(20):
+            response = await client.post(f"{self.base_url}{path}", json=payload)
+            if response.status_code not in (429, 503):
+                return response
+            await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+        return response
+
+    async def seed(self, client, reports=50):
+        """Make sure list endpoints return realistic payload sizes."""
+        for _ in range(reports):
+            await self.seed_post(client, "/api/reports", random_report())
+        for i in range(20):
+            await self.seed_post(client, "/api/water-quality", {
+                "location": random_location(),
+                "tds_value": random.uniform(150, 1500),
+                "ph_level": random.uniform(6.0, 9.0),
+                "turbidity": random.uniform(0.2, 8.0),
+                "chlorine_level": random.uniform(0.0, 1.5),
+                "tested_by": f"Load Test Team {i}",
+            })
+        for i in range(10):
+            await self.seed_post(client, "/api/doctors", {
+                "name": f"Dr. Load Test {i}",
+                "specialization": "General Medicine",
+                "location": random_location(),
+                "phone": "+91-9876500000",
+                "email": f"dr.load{i}@example.gov.in",
+                "availability": "Mon-Fri: 9AM-5PM",
+            })
+            await self.seed_post(client, "/api/medical-stock", {
+                "item_name": f"ORS Packets batch {i}",
+                "quantity": random.randint(0, 200),
+                "unit": "packets",
+                "location": random_location(),
+            })
+
+    async def run(self, seed=True):
+        limits = httpx.Limits(max_connections=self.clients * 5, max_keepalive_connections=self.clients * 5)
+        async with httpx.AsyncClient(limits=limits, timeout=30.0) as client:
+            if seed:
+                await self.seed(client)
+            started = time.perf_counter()
+            deadline = started + self.duration
+            await asyncio.gather(*(self.virtual_client(client, deadline, i) for i in range(self.clients)))
+            elapsed = time.perf_counter() - started
+        return self.summary(elapsed)
+
+    def summary(self, elapsed):
+        endpoints = {}
+        for endpoint, values in sorted(self.samples.items()):
+            values = sorted(values)
+            endpoints[endpoint] = {
+                "count": len(values),
+                "errors": self.errors.get(endpoint, 0),
+                "throughput_rps": round(len(values) / elapsed, 2),
+                "mean_ms": round(sum(values) / len(values) * 1000, 2),
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p95_ms": round(percentile(values, 95) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+                "max_ms": round(values[-1] * 1000, 2),
+            }
+        return {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "config": {
+                "clients": self.clients,
+                "duration_s": self.duration,
+                "weights": self.weights,
+                "think_time_s": self.think_time,
+            },
+            "elapsed_s": round(elapsed, 2),
+            "total_requests": sum(len(v) for v in self.samples.values()),
+            "scenarios": self.scenarios,
+            "endpoints": endpoints,
+        }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_in_process(args, weights):
+    """Start the backend under uvicorn in this process, then drive it."""
+    import uvicorn
+
+    os.environ["MONGO_URL"] = args.mongo_url
+    os.environ["DB_NAME"] = args.db_name
+    # Trust this process's X-Forwarded-For addresses; admission reads the setting on import
+    os.environ.setdefault("ADMISSION_TRUSTED_PROXIES", "127.0.0.1/32")
+    sys.path.insert(0, str(ROOT_DIR / "backend"))
+    import server
+
+    port = free_port()
+    config = uvicorn.Config(server.create_app(), host="127.0.0.1", port=port, log_level="warning", lifespan="on")
+    uvicorn_server = uvicorn.Server(config)
+    serve_task = asyncio.create_task(uvicorn_server.serve())
+    while not uvicorn_server.started:
+        if serve_task.done():
+            serve_task.result()
+        await asyncio.sleep(0.05)
+
+    try:
+        tester = LoadTester(f"http://127.0.0.1:{port}", args.clients, args.duration, weights, args.think_time)
+        return await tester.run(seed=not args.no_seed)
+    finally:
+        uvicorn_server.should_exit = True
+        await serve_task
+        if not args.keep_db:
+            from motor.motor_asyncio import AsyncIOMotorClient
+
+            cleanup = AsyncIOMotorClient(args.mongo_url)
+            await cleanup.drop_database(args.db_name)
+            cleanup.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay dashboard traffic and report latency percentiles")
+    parser.add_argument("--clients", type=int, default=20, help="concurrent virtual clients")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load after seeding")
+    parser.add_argument("--dashboard-weight", type=float, default=6.0)
+    parser.add_argument("--report-weight", type=float, default=3.0)
+    parser.add_argument("--admin-weight", type=float, default=1.0)
+    parser.add_argument("--think-time", type=float, default=0.0, help="max random pause between scenarios")
+    parser.add_argument("--mongo-url", default=os.environ.get("LOADTEST_MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db-name", default=f"healthguard_loadtest_{int(time.time())}")
+    parser.add_argument("--base-url", help="target an already running backend instead of starting one")
+    parser.add_argument("--no-seed", action="store_true", help="skip seeding baseline data")
+    parser.add_argument("--keep-db", action="store_true", help="do not drop the load test database")
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    weights = {
+        "dashboard": args.dashboard_weight,
+        "report": args.report_weight,
+        "admin": args.admin_weight,
+    }
+    weights = {name: weight for name, weight in weights.items() if weight > 0}
+
+    if args.base_url:
+        tester = LoadTester(args.base_url, args.clients, args.duration, weights, args.think_time)
+        results = asyncio.run(tester.run(seed=not args.no_seed))
+    else:
+        results = asyncio.run(run_in_process(args, weights))
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+        print(f"📊 Results written to {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,22 +2,68 @@
 """
 Reference Data Population Script for Rural Health Monitor
 Adds realistic sample data to all categories
+
+Reference records are posted concurrently through the API. For benchmark
+datasets, the synthetic generator writes straight to MongoDB with
+insert_many, clustering records around the reference villages:
+
+    python populate_data.py --reports 2000000 --water 200000 --stock 50000
+
+Synthetic records get the same geocoding and region ids as records created
+through the API, and the trend rollups, active-case counters and
+water-disease correlation are rebuilt once seeding finishes. Data seeded by
+older versions of this script can be repaired from backend/ with:
+
+    python manage.py assign-regions
+    python manage.py backfill-rollups
+    python manage.py refresh-correlation
 """
 
-import requests
-import json
-from datetime import datetime, timedelta
+import argparse
+import asyncio
+import math
+import os
 import random
-import uuid
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import httpx
 
 # Backend API URL
 API_BASE = "http://localhost:8001/api"
+BACKEND_DIR = Path(__file__).parent / "backend"
 
 class DataPopulator:
-    def __init__(self):
-        self.session = requests.Session()
-        
-    def populate_health_reports(self):
+    def __init__(self, api_base=API_BASE, concurrency=16):
+        self.api_base = api_base
+        self.concurrency = concurrency
+        self.client = None
+        self.semaphore = None
+
+    async def post_all(self, path, records, describe):
+        """POST records concurrently, bounded by the semaphore"""
+        async def post(record):
+            async with self.semaphore:
+                try:
+                    response = await self.client.post(f"{self.api_base}{path}", json=record)
+                    # Back off while the API's admission control sheds load
+                    for _ in range(10):
+                        if response.status_code not in (429, 503):
+                            break
+                        await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+                        response = await self.client.post(f"{self.api_base}{path}", json=record)
+                    if response.status_code == 200:
+                        print(f"  ✅ Added {describe(record)}")
+                    else:
+                        print(f"  ❌ Failed to add {path.strip('/')}: {response.status_code}")
+                except Exception as e:
+                    print(f"  ❌ Error adding {path.strip('/')}: {e}")
+
+        await asyncio.gather(*(post(record) for record in records))
+
+    async def populate_health_reports(self):
         """Add sample health reports"""
         print("📋 Adding sample health reports...")
         
@@ -128,17 +174,9 @@ class DataPopulator:
             }
         ]
         
-        for report in health_reports:
-            try:
-                response = self.session.post(f"{API_BASE}/reports", json=report)
-                if response.status_code == 200:
-                    print(f"  ✅ Added report from {report['reporter_name']} - {report['report_type']}")
-                else:
-                    print(f"  ❌ Failed to add report: {response.status_code}")
-            except Exception as e:
-                print(f"  ❌ Error adding report: {e}")
-    
-    def populate_water_quality_data(self):
+        await self.post_all("/reports", health_reports, lambda report: f"report from {report['reporter_name']} - {report['report_type']}")
+
+    async def populate_water_quality_data(self):
         """Add sample water quality data"""
         print("💧 Adding sample water quality data...")
         
@@ -275,17 +313,9 @@ class DataPopulator:
             }
         ]
         
-        for water_data in water_quality_data:
-            try:
-                response = self.session.post(f"{API_BASE}/water-quality", json=water_data)
-                if response.status_code == 200:
-                    print(f"  ✅ Added water quality data for {water_data['location']['address']} - {water_data['status']}")
-                else:
-                    print(f"  ❌ Failed to add water data: {response.status_code}")
-            except Exception as e:
-                print(f"  ❌ Error adding water data: {e}")
-    
-    def populate_doctor_directory(self):
+        await self.post_all("/water-quality", water_quality_data, lambda water_data: f"water quality data for {water_data['location']['address']} - {water_data['status']}")
+
+    async def populate_doctor_directory(self):
         """Add sample doctor directory"""
         print("👨‍⚕️ Adding sample doctor directory...")
         
@@ -420,17 +450,9 @@ class DataPopulator:
             }
         ]
         
-        for doctor in doctors:
-            try:
-                response = self.session.post(f"{API_BASE}/doctors", json=doctor)
-                if response.status_code == 200:
-                    print(f"  ✅ Added Dr. {doctor['name']} - {doctor['specialization']}")
-                else:
-                    print(f"  ❌ Failed to add doctor: {response.status_code}")
-            except Exception as e:
-                print(f"  ❌ Error adding doctor: {e}")
-    
-    def populate_medical_stock(self):
+        await self.post_all("/doctors", doctors, lambda doctor: f"Dr. {doctor['name']} - {doctor['specialization']}")
+
+    async def populate_medical_stock(self):
         """Add sample medical stock data"""
         print("💊 Adding sample medical stock data...")
         
@@ -597,17 +619,9 @@ class DataPopulator:
             }
         ]
         
-        for stock in medical_stocks:
-            try:
-                response = self.session.post(f"{API_BASE}/medical-stock", json=stock)
-                if response.status_code == 200:
-                    print(f"  ✅ Added {stock['item_name']} - {stock['status']} ({stock['quantity']} {stock['unit']})")
-                else:
-                    print(f"  ❌ Failed to add stock item: {response.status_code}")
-            except Exception as e:
-                print(f"  ❌ Error adding stock item: {e}")
-    
-    def populate_users(self):
+        await self.post_all("/medical-stock", medical_stocks, lambda stock: f"{stock['item_name']} - {stock['status']} ({stock['quantity']} {stock['unit']})")
+
+    async def populate_users(self):
         """Add sample users"""
         print("👥 Adding sample users...")
         
@@ -658,37 +672,273 @@ class DataPopulator:
             }
         ]
         
-        for user in users:
-            try:
-                response = self.session.post(f"{API_BASE}/users", json=user)
-                if response.status_code == 200:
-                    print(f"  ✅ Added user {user['name']} - {user['role']}")
-                else:
-                    print(f"  ❌ Failed to add user: {response.status_code}")
-            except Exception as e:
-                print(f"  ❌ Error adding user: {e}")
-    
-    def run_all(self):
+        await self.post_all("/users", users, lambda user: f"user {user['name']} - {user['role']}")
+
+    async def run_all(self):
         """Run all data population functions"""
         print("🚀 Starting reference data population...")
         print("=" * 60)
-        
-        self.populate_users()
-        print()
-        self.populate_health_reports()
-        print()
-        self.populate_water_quality_data()
-        print()
-        self.populate_doctor_directory()
-        print()
-        self.populate_medical_stock()
-        print()
+
+        limits = httpx.Limits(max_connections=self.concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=30.0) as client:
+            self.client = client
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+            await asyncio.gather(
+                self.populate_users(),
+                self.populate_health_reports(),
+                self.populate_water_quality_data(),
+                self.populate_doctor_directory(),
+                self.populate_medical_stock(),
+            )
         
         print("=" * 60)
         print("✅ Reference data population completed!")
         print("📊 The Rural Health Monitor system now has comprehensive sample data")
         print("🎯 You can now see meaningful charts, maps, and statistics in the enhanced dashboard")
 
+
+# Cluster centres for synthetic data, at the gazetteer's village coordinates: (address, lat, lng, weight)
+SEED_VILLAGES = [
+    ("Village Rampur, Block Kharkhoda, Sonipat District", 28.8456, 76.9613, 5),
+    ("Village Sisana, Block Kharkhoda, Sonipat District", 28.9067, 76.9336, 4),
+    ("Village Palwal, Palwal District", 28.1487, 77.3320, 3),
+    ("Village Nuh, Mewat District", 28.1024, 77.0020, 4),
+    ("Village Bahadurgarh, Jhajjar District", 28.6920, 76.9350, 3),
+    ("Village Panipat Rural, Panipat District", 29.3575, 76.9450, 2),
+    ("Village Ballabgarh, Faridabad District", 28.3410, 77.3206, 2),
+    ("Village Rohtak Rural, Rohtak District", 28.8600, 76.6500, 2),
+    ("Village Sohna, Gurugram District", 28.2473, 77.0654, 1),
+    ("Village Karnal Outskirts, Karnal District", 29.7100, 76.9500, 1),
+]
+
+SYMPTOM_TEMPLATES = {
+    "disease": [
+        "Diarrhea, vomiting and dehydration in {n} children under 5 years",
+        "High fever, severe headache and body ache. {n} family members affected",
+        "Suspected malaria, fever with chills and sweating in {n} villagers",
+        "Jaundice, yellow eyes and loss of appetite in {n} people",
+        "Skin rashes and itching after bathing in pond water, {n} cases",
+    ],
+    "water_quality": [
+        "Strange taste and smell in village water supply, {n} households complaining",
+        "Yellow coloration in hand pump water used by {n} families",
+        "Bore well water turned muddy after rain, {n} families affected",
+    ],
+    "complaint": [
+        "No doctor available at PHC for {n} days",
+        "Shortage of ORS and paracetamol for {n} days",
+        "Ambulance did not arrive, patient waited {n} hours",
+    ],
+}
+
+STOCK_ITEMS = [
+    ("Paracetamol Tablets (500mg)", "tablets"),
+    ("ORS Packets", "packets"),
+    ("Amoxicillin Capsules (250mg)", "capsules"),
+    ("Zinc Tablets (20mg)", "tablets"),
+    ("Chlorine Tablets", "tablets"),
+    ("Insulin Vials (100IU/ml)", "vials"),
+    ("Bandages (Sterile)", "pieces"),
+    ("Antiseptic Solution (500ml)", "bottles"),
+]
+
+
+class SyntheticDataGenerator:
+    """Generate production-scale data clustered in space and time.
+
+    Reports are concentrated around the seed villages (weighted, ~1km spread)
+    and around per-village outbreak episodes; outside of outbreaks a lower
+    background rate is spread over the whole period. Villages in outbreak
+    also produce worse water readings.
+    """
+
+    def __init__(self, days=365, seed=None, outbreaks_per_village=4):
+        self.rng = random.Random(seed)
+        self.end = datetime.now(timezone.utc)
+        self.start = self.end - timedelta(days=days)
+        self.days = days
+        self.villages = SEED_VILLAGES
+        self.weights = [village[3] for village in SEED_VILLAGES]
+        self.outbreaks = {
+            village[0]: [
+                (self.start + timedelta(days=self.rng.uniform(0, days)), self.rng.uniform(2, 10))
+                for _ in range(outbreaks_per_village)
+            ]
+            for village in SEED_VILLAGES
+        }
+
+    def _location(self, village, spread_km=1.0):
+        address, lat, lng, _ = village
+        spread = spread_km / 111.0
+        return {
+            "lat": round(self.rng.gauss(lat, spread), 6),
+            "lng": round(self.rng.gauss(lng, spread / math.cos(math.radians(lat))), 6),
+            "address": address,
+        }
+
+    def _timestamp(self, village):
+        """Return (timestamp, in_outbreak) for an event in the given village"""
+        if self.rng.random() < 0.6:
+            centre, duration_days = self.rng.choice(self.outbreaks[village[0]])
+            offset = self.rng.gauss(0, duration_days / 2)
+            moment = centre + timedelta(days=offset)
+            if self.start <= moment <= self.end:
+                return moment, abs(offset) < duration_days
+        return self.start + timedelta(seconds=self.rng.uniform(0, self.days * 86400)), False
+
+    def report(self, server):
+        village = self.rng.choices(self.villages, weights=self.weights)[0]
+        moment, outbreak = self._timestamp(village)
+        report_type = self.rng.choices(["disease", "water_quality", "complaint"], weights=[6, 3, 1])[0]
+        severity_weights = [1, 2, 4, 3] if outbreak else [5, 3, 1, 0.3]
+        severity = self.rng.choices(["low", "medium", "high", "critical"], weights=severity_weights)[0]
+        anonymous = self.rng.random() < 0.15
+        name = "Anonymous Citizen" if anonymous else f"Reporter {self.rng.randint(1, 5000)}"
+        symptoms = self.rng.choice(SYMPTOM_TEMPLATES[report_type]).format(n=self.rng.randint(2, 15))
+        return server.HealthReport(
+            reporter_id=name,
+            reporter_name=name,
+            report_type=report_type,
+            symptoms=symptoms,
+            severity=severity,
+            location=self._location(village),
+            date_reported=moment,
+            status=self.rng.choices(["active", "under_investigation", "resolved"], weights=[5, 2, 3])[0],
+            is_anonymous=anonymous,
+        )
+
+    def water_reading(self, server):
+        village = self.rng.choices(self.villages, weights=self.weights)[0]
+        moment, outbreak = self._timestamp(village)
+        contamination = self.rng.uniform(0.4, 1.0) if outbreak else self.rng.uniform(0.0, 0.35)
+        tds = round(self.rng.gauss(300 + 1000 * contamination, 80), 1)
+        ph = round(self.rng.gauss(7.2 + (1.5 if contamination > 0.8 else 0), 0.3), 2)
+        turbidity = round(max(0.0, self.rng.gauss(1 + 6 * contamination, 0.8)), 2)
+        chlorine = round(max(0.0, self.rng.gauss(1.0 - contamination, 0.15)), 2)
+        return server.WaterQualityData(
+            location=self._location(village, spread_km=2.0),
+            tds_value=tds,
+            ph_level=ph,
+            turbidity=turbidity,
+            chlorine_level=chlorine,
+            status=server.calculate_water_status(tds, ph, turbidity, chlorine),
+            tested_by=f"Testing Unit {self.rng.randint(1, 40)}",
+            test_date=moment,
+        )
+
+    def stock_row(self, server):
+        village = self.rng.choices(self.villages, weights=self.weights)[0]
+        item_name, unit = self.rng.choice(STOCK_ITEMS)
+        quantity = max(0, int(self.rng.lognormvariate(4, 1)) - 10)
+        return server.MedicalStock(
+            item_name=item_name,
+            quantity=quantity,
+            unit=unit,
+            status=server.calculate_stock_status(quantity, item_name),
+            location=self._location(village, spread_km=0.3),
+            expiry_date=self.end + timedelta(days=self.rng.randint(-30, 1095)),
+            last_updated=self._timestamp(village)[0],
+        )
+
+
+class MongoSeeder:
+    """Write synthetic documents straight to MongoDB in concurrent insert_many batches
+
+    Each document is geocoded and assigned region ids the way the create routes do it.
+    """
+
+    def __init__(self, db, server, batch_size=5000, concurrency=4):
+        self.db = db
+        self.server = server
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+
+    async def seed(self, collection, count, make):
+        if count <= 0:
+            return
+        print(f"🌱 Seeding {count:,} documents into {collection}...")
+        started = time.perf_counter()
+        pending = set()
+        written = 0
+        while written < count:
+            size = min(self.batch_size, count - written)
+            batch = [self.document(make(self.server)) for _ in range(size)]
+            written += size
+            if len(pending) >= self.concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+            pending.add(asyncio.create_task(self.db[collection].insert_many(batch, ordered=False)))
+            # Yield so in-flight inserts make progress while the next batch is generated
+            await asyncio.sleep(0)
+        if pending:
+            await asyncio.gather(*pending)
+        elapsed = time.perf_counter() - started
+        print(f"  ✅ {collection}: {count:,} documents in {elapsed:.1f}s ({count / elapsed:,.0f} docs/s)")
+
+    def document(self, record):
+        document = record.dict()
+        document.update(self.server.locate(record.location))
+        return self.server.prepare_for_mongo(document)
+
+    async def rebuild_derived(self, reports, water):
+        """Recompute what the API maintains incrementally but bulk inserts bypass"""
+        server = self.server
+        if reports:
+            await server.rollups.ensure_indexes(self.db)
+            counted = await server.rollups.backfill(self.db)
+            await server.report_workflow.reconcile(self.db)
+            print(f"  📈 Rebuilt trend rollups and active-case counters from {counted:,} reports")
+        if reports or water:
+            await server.correlation.ensure_indexes(self.db)
+            correlated = await server.correlation.refresh(self.db)
+            print(f"  🔗 Correlated {correlated:,} unsafe water readings")
+
+
+async def seed_synthetic(args):
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(BACKEND_DIR / ".env")
+    mongo_url = args.mongo_url or os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+    db_name = args.db_name or os.environ.get("DB_NAME", "test_database")
+    sys.path.insert(0, str(BACKEND_DIR))
+    import server
+
+    client = AsyncIOMotorClient(mongo_url)
+    try:
+        seeder = MongoSeeder(client[db_name], server, args.batch_size, args.concurrency)
+        generator = SyntheticDataGenerator(days=args.days, seed=args.seed)
+        await seeder.seed("health_reports", args.reports, generator.report)
+        await seeder.seed("water_quality", args.water, generator.water_reading)
+        await seeder.seed("medical_stock", args.stock, generator.stock_row)
+        await seeder.rebuild_derived(args.reports, args.water)
+    finally:
+        client.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Populate the Rural Health Monitor with reference or synthetic data")
+    parser.add_argument("--api-base", default=API_BASE, help="backend API used for reference data")
+    parser.add_argument("--concurrency", type=int, default=16, help="max in-flight requests or insert batches")
+    parser.add_argument("--skip-reference", action="store_true", help="do not post the hand-written reference data")
+    parser.add_argument("--reports", type=int, default=0, help="synthetic health reports to insert")
+    parser.add_argument("--water", type=int, default=0, help="synthetic water quality readings to insert")
+    parser.add_argument("--stock", type=int, default=0, help="synthetic medical stock rows to insert")
+    parser.add_argument("--days", type=int, default=365, help="time span covered by synthetic data")
+    parser.add_argument("--batch-size", type=int, default=5000, help="documents per insert_many call")
+    parser.add_argument("--seed", type=int, help="random seed for reproducible datasets")
+    parser.add_argument("--mongo-url", help="defaults to MONGO_URL from backend/.env")
+    parser.add_argument("--db-name", help="defaults to DB_NAME from backend/.env")
+    return parser.parse_args()
+
+
+async def main(args):
+    if not args.skip_reference:
+        await DataPopulator(args.api_base, args.concurrency).run_all()
+    if args.reports or args.water or args.stock:
+        await seed_synthetic(args)
+
+
 if __name__ == "__main__":
-    populator = DataPopulator()
-    populator.run_all()
\ No newline at end of file
+    asyncio.run(main(parse_args()))
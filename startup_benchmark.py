@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for Rural Water Health Monitoring System
+Measures how quickly a fresh backend worker becomes useful, as when workers autoscale
+
+Usage:
+    python startup_benchmark.py --runs 10 --output startup_results.json
+
+Each run starts `uvicorn server:app` in a new process against a local mongod and records:
+  * import_seconds      - `import server` alone, in a separate interpreter
+  * ready_seconds       - process start until /api/health/ready returns 200
+  * first_request_ms    - latency of the first /api/dashboard/stats call after ready
+  * second_request_ms   - the same call again, for comparison with a warm worker
+Medians and maxima across runs are written as JSON.
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT_DIR = Path(__file__).parent
+BACKEND_DIR = ROOT_DIR / "backend"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import(env):
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import server"], cwd=BACKEND_DIR, env=env, check=True)
+    return time.perf_counter() - started
+
+
+def measure_startup(env, timeout):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    try:
+        with httpx.Client(base_url=base_url, timeout=5.0) as client:
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError(f"backend exited with status {process.returncode}")
+                if time.perf_counter() - started > timeout:
+                    raise TimeoutError(f"backend not ready after {timeout}s")
+                try:
+                    if client.get("/api/health/ready").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.01)
+            ready = time.perf_counter() - started
+
+            timings = []
+            for _ in range(2):
+                request_started = time.perf_counter()
+                client.get("/api/dashboard/stats").raise_for_status()
+                timings.append((time.perf_counter() - request_started) * 1000)
+        return {"ready_seconds": ready, "first_request_ms": timings[0], "second_request_ms": timings[1]}
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def summarize(runs, key):
+    values = [run[key] for run in runs]
+    return {"median": round(statistics.median(values), 4), "max": round(max(values), 4)}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure backend cold start and first-request latency")
+    parser.add_argument("--runs", type=int, default=5, help="fresh worker starts to measure")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for readiness")
+    parser.add_argument("--mongo-url", default=os.environ.get("BENCHMARK_MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db-name", default="healthguard_startup_benchmark")
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    env = {
+        **os.environ,
+        "MONGO_URL": args.mongo_url,
+        "DB_NAME": args.db_name,
+        "SCHEDULER_ENABLED": "false",
+    }
+    runs = []
+    for number in range(1, args.runs + 1):
+        run = {"import_seconds": measure_import(env), **measure_startup(env, args.timeout)}
+        runs.append(run)
+        print(f"🚀 Run {number}: ready in {run['ready_seconds']:.2f}s, first request {run['first_request_ms']:.1f}ms",
+              file=sys.stderr)
+
+    results = {
+        "runs": len(runs),
+        **{key: summarize(runs, key) for key in ("import_seconds", "ready_seconds", "first_request_ms", "second_request_ms")},
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+        print(f"📊 Results written to {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
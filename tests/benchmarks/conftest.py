@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[2] / "backend"
+
+# server.py only connects to Mongo from the app lifespan, so importing it needs no database
+sys.path.insert(0, str(BACKEND_DIR))
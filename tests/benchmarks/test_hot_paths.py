@@ -0,0 +1,156 @@
+"""
+Micro-benchmarks for the CPU hot paths in backend/server.py
+
+Run against the committed baseline and fail on regressions with:
+
+    python -m pytest tests/benchmarks --benchmark-disable-gc --benchmark-min-rounds=50 \
+        --benchmark-compare=tests/benchmarks/baseline.json \
+        --benchmark-compare-fail=min:100%
+
+The gate compares the fastest round, which interruptions cannot inflate, and
+only fails when a path doubles in cost: on shared or virtualised machines a
+whole run drifts by up to ~75%, so a tighter threshold fails at random. The
+regressions these benchmarks exist for (per-row validation, per-call
+TypeAdapter builds) cost several times more. Compare two runs from the same
+session with a tighter threshold when measuring a small change.
+
+Refresh the baseline after an intentional change, on an otherwise idle
+machine (compare a few runs first and keep the fastest; a slow run bakes
+slack into every later comparison), with:
+
+    python -m pytest tests/benchmarks --benchmark-disable-gc --benchmark-min-rounds=50 \
+        --benchmark-json=tests/benchmarks/baseline.json
+
+Benchmarks missing from the baseline are measured but not compared.
+"""
+
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import pytest
+from pydantic import TypeAdapter
+
+import server
+
+BATCH = 1000
+
+
+def make_report_docs(n=BATCH):
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "id": f"report-{i}",
+            "reporter_id": f"reporter-{i % 50}",
+            "reporter_name": f"Reporter {i % 50}",
+            "report_type": rng.choice(["disease", "water_quality", "complaint"]),
+            "symptoms": "High fever, severe headache, body ache and fatigue. Multiple family members affected.",
+            "severity": rng.choice(["low", "medium", "high", "critical"]),
+            "location": {"lat": 28.7 + rng.random() / 10, "lng": 77.1 + rng.random() / 10, "address": "Village Rampur"},
+            "date_reported": (now - timedelta(minutes=i)).isoformat(),
+            "status": "active",
+            "is_anonymous": False,
+            "additional_info": "5 cases reported in the same village within 2 days.",
+        }
+        for i in range(n)
+    ]
+
+
+def make_stock_docs(n=BATCH):
+    rng = random.Random(7)
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "id": f"stock-{i}",
+            "item_name": "ORS Packets",
+            "quantity": rng.randint(0, 500),
+            "unit": "packets",
+            "status": rng.choice(["adequate", "low", "critical", "out_of_stock"]),
+            "location": {"lat": 28.6, "lng": 77.2, "address": "Child Health Center Sisana"},
+            "expiry_date": (now + timedelta(days=365)).isoformat(),
+            "last_updated": now.isoformat(),
+        }
+        for i in range(n)
+    ]
+
+
+@pytest.fixture(scope="module")
+def report_docs():
+    return make_report_docs()
+
+
+@pytest.fixture(scope="module")
+def stock_docs():
+    return make_stock_docs()
+
+
+def test_construct_health_reports(benchmark, report_docs):
+    result = benchmark(lambda: [server.HealthReport(**doc) for doc in report_docs])
+    assert len(result) == BATCH
+
+
+def test_construct_medical_stock(benchmark, stock_docs):
+    result = benchmark(lambda: [server.MedicalStock(**doc) for doc in stock_docs])
+    assert len(result) == BATCH
+
+
+def test_validate_health_report_batch(benchmark, report_docs):
+    result = benchmark(server.health_report_list.validate_python, report_docs)
+    assert len(result) == BATCH
+
+
+def test_validate_medical_stock_batch(benchmark, stock_docs):
+    result = benchmark(server.medical_stock_list.validate_python, stock_docs)
+    assert len(result) == BATCH
+
+
+def test_health_report_list_response(benchmark, report_docs):
+    response = benchmark(server.list_response, server.health_report_list, report_docs)
+    assert response.body.startswith(b"[")
+
+
+def test_prepare_for_mongo(benchmark, report_docs):
+    reports = [server.HealthReport(**doc) for doc in report_docs]
+
+    def setup():
+        return ([report.dict() for report in reports],), {}
+
+    result = benchmark.pedantic(
+        lambda docs: [server.prepare_for_mongo(doc) for doc in docs],
+        setup=setup,
+        rounds=50,
+    )
+    assert isinstance(result[0]["date_reported"], str)
+
+
+def test_calculate_water_status(benchmark):
+    rng = random.Random(3)
+    readings = [
+        (rng.uniform(100, 1600), rng.uniform(5.5, 9.5), rng.uniform(0, 9), rng.uniform(0, 1.5))
+        for _ in range(BATCH)
+    ]
+    result = benchmark(lambda: [server.calculate_water_status(*reading) for reading in readings])
+    assert set(result) <= {"safe", "moderate", "unsafe"}
+
+
+def test_calculate_stock_status(benchmark):
+    rng = random.Random(5)
+    quantities = [rng.randint(0, 500) for _ in range(BATCH)]
+    result = benchmark(lambda: [server.calculate_stock_status(q, "ORS Packets") for q in quantities])
+    assert len(result) == BATCH
+
+
+def test_encode_report_list_response(benchmark, report_docs):
+    reports = [server.HealthReport(**doc) for doc in report_docs]
+    adapter = TypeAdapter(List[server.HealthReport])
+    body = benchmark(lambda: json.dumps(adapter.dump_python(reports, mode="json")))
+    assert body.startswith("[")
+
+
+def test_encode_stock_list_response(benchmark, stock_docs):
+    stock = [server.MedicalStock(**doc) for doc in stock_docs]
+    adapter = TypeAdapter(List[server.MedicalStock])
+    body = benchmark(lambda: json.dumps(adapter.dump_python(stock, mode="json")))
+    assert body.startswith("[")
@@ -0,0 +1,56 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[1] / "backend"
+
+# Backend modules import each other by bare name, as they do when run from backend/
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def db():
+    """A fresh in-memory Motor-compatible database per test."""
+    from mongomock_motor import AsyncMongoMockClient
+
+    return AsyncMongoMockClient()["healthguard_tests"]
+
+
+@pytest.fixture
+def server_db(monkeypatch, tmp_path):
+    """Bind server's module-level database to a fresh in-memory one, for calling handlers directly."""
+    from collections import OrderedDict
+
+    from mongomock_motor import AsyncMongoMockClient
+
+    import dedup
+    import read_routing
+    import resilience
+    import server
+
+    monkeypatch.setenv("DB_NAME", "healthguard_tests")
+    # mongomock's with_options returns a synchronous database
+    monkeypatch.setattr(read_routing, "database", lambda db, route: db)
+    monkeypatch.setattr(server, "duplicate_index", dedup.DuplicateIndex())
+    # The guard's decorators are bound at import, so reset its state rather than replacing it
+    monkeypatch.setattr(server.db_guard, "breaker", resilience.CircuitBreaker())
+    monkeypatch.setattr(server.db_guard, "spool", resilience.WriteSpool(tmp_path / "spool" / "writes.jsonl"))
+    monkeypatch.setattr(server.db_guard, "cache", OrderedDict())
+    monkeypatch.setattr(server.db_guard, "cached_bytes", 0)
+    return server.connect_mongo(AsyncMongoMockClient())
+
+
+@pytest.fixture
+def api(server_db):
+    """HTTP client for the app bound to ``server_db``; the lifespan (warm-up, scheduler) is not run."""
+    from fastapi.testclient import TestClient
+
+    import server
+
+    return TestClient(server.create_app())
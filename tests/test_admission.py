@@ -0,0 +1,41 @@
+import ipaddress
+
+import admission
+
+
+def middleware(trusted=(), max_clients=10000, burst=2):
+    return admission.AdmissionControlMiddleware(
+        None,
+        client_rate=0,
+        client_burst=burst,
+        trusted_proxies=[ipaddress.ip_network(proxy) for proxy in trusted],
+        max_clients=max_clients,
+    )
+
+
+def scope(peer, forwarded=None):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return {"type": "http", "client": (peer, 5000), "headers": headers}
+
+
+def test_forwarded_for_is_ignored_from_untrusted_peers():
+    assert middleware()._client_key(scope("203.0.113.7", "198.51.100.1")) == "203.0.113.7"
+
+
+def test_forwarded_for_from_trusted_proxy_uses_first_untrusted_hop():
+    guard = middleware(trusted=["10.0.0.0/8"])
+    # A client-supplied spoofed entry sits left of the real client address
+    key = guard._client_key(scope("10.0.0.2", "1.2.3.4, 198.51.100.1, 10.0.0.9"))
+    assert key == "198.51.100.1"
+    assert guard._client_key(scope("10.0.0.2")) == "10.0.0.2"
+
+
+def test_rotating_clients_evict_least_recent_buckets_only():
+    guard = middleware(max_clients=3, burst=2)
+    assert guard._take_token("steady")
+    for number in range(10):
+        guard._take_token(f"rotating-{number}")
+        guard._take_token("steady")
+    # The steady client kept its nearly empty bucket instead of getting a fresh burst
+    assert not guard._take_token("steady")
+    assert len(guard._buckets) == 3
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from mongomock_motor import AsyncMongoMockCollection
+
+import archive
+import correlation
+import report_workflow
+import rollups
+
+OLD = datetime.now(timezone.utc) - timedelta(days=400)
+
+
+def report(report_id, status="resolved", reported=OLD, report_type="disease"):
+    return {
+        "_id": report_id,
+        "id": report_id,
+        "report_type": report_type,
+        "severity": "high",
+        "status": status,
+        "date_reported": reported.isoformat(),
+        "location": {"lat": 28.8456, "lng": 76.9613},
+        "region": {"district": "HR-SNP"},
+        "region_ids": ["HR", "HR-SNP"],
+        "duplicate_of": None,
+    }
+
+
+@pytest.mark.anyio
+async def test_archive_moves_old_resolved_reports(db):
+    await db.health_reports.insert_many([
+        report("old-resolved"),
+        report("old-active", status="active"),
+        report("new-resolved", reported=datetime.now(timezone.utc)),
+    ])
+    assert await archive.archive_resolved(db) == 1
+    assert await db[archive.COLLECTION].distinct("id") == ["old-resolved"]
+    assert await archive.count_across(db, {}) == 3
+    assert [r["id"] for r in await archive.find_across(db, {}, include_archived=False)] == ["new-resolved", "old-active"]
+
+
+@pytest.mark.anyio
+async def test_report_reopened_during_the_move_stays_hot(db, monkeypatch):
+    await db.health_reports.insert_many([report("reopened"), report("moved")])
+    bulk_write = AsyncMongoMockCollection.bulk_write
+
+    async def reopen_after_copy(self, *args, **kwargs):
+        result = await bulk_write(self, *args, **kwargs)
+        if self.name == archive.COLLECTION:
+            await db.health_reports.update_one({"id": "reopened"}, {"$set": {"status": "active"}})
+        return result
+
+    monkeypatch.setattr(AsyncMongoMockCollection, "bulk_write", reopen_after_copy)
+    assert await archive.archive_resolved(db) == 1
+    assert await db.health_reports.distinct("id") == ["reopened"]
+    assert await db[archive.COLLECTION].distinct("id") == ["moved"]
+
+
+@pytest.mark.anyio
+async def test_archived_reports_cannot_change_status(db):
+    await db[archive.COLLECTION].insert_one(report("archived"))
+    entry = await report_workflow.transition(db, ["archived", "missing"], "active", actor="officer")
+    assert entry["modified"] == 0
+    assert entry["rejected"] == [
+        {"report_id": "archived", "reason": "archived reports cannot change status"},
+        {"report_id": "missing", "reason": "not found"},
+    ]
+
+
+@pytest.mark.anyio
+async def test_backfill_counts_archived_reports_once(db):
+    await db.health_reports.insert_many([report("hot", status="active"), report("moving")])
+    await db[archive.COLLECTION].insert_many([report("archived"), report("moving")])
+    # Stale buckets from before the rebuild are replaced, not added to
+    await db[rollups.COLLECTION].insert_one({"_id": "stale", "granularity": "day", "count": 99})
+
+    assert await rollups.backfill(db) == 3
+    monthly = await db[rollups.COLLECTION].find({"granularity": "month"}).to_list(None)
+    assert [row["count"] for row in monthly] == [3]
+    assert await db[rollups.COLLECTION].find_one({"_id": "stale"}) is None
+    assert rollups.REBUILD_COLLECTION not in await db.list_collection_names()
+
+
+@pytest.mark.anyio
+async def test_correlation_includes_archived_reports(db):
+    await db[archive.COLLECTION].insert_one(report("archived-case", reported=OLD + timedelta(days=1)))
+    await db.water_quality.insert_many([
+        {
+            "id": f"reading-{days}",
+            "status": "unsafe",
+            "location": {"lat": 28.8456, "lng": 76.9613},
+            "test_date": (OLD + timedelta(days=days)).isoformat(),
+        }
+        # Far apart test dates end up in separate batches
+        for days in (0, 200)
+    ])
+    assert await correlation.refresh(db) == 2
+    cached = {doc["_id"]: doc for doc in await db[correlation.COLLECTION].find().to_list(None)}
+    assert cached["reading-0"]["report_ids"] == ["archived-case"]
+    assert cached["reading-200"]["report_count"] == 0
@@ -0,0 +1,72 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import BackgroundTasks
+
+import dedup
+import server
+
+SYMPTOMS = "Diarrhea, vomiting and dehydration in 6 children under 5 years"
+
+
+def report(report_id, symptoms=SYMPTOMS, lat=28.99, lng=77.02, hours_ago=0, report_type="disease"):
+    return server.HealthReport(
+        id=report_id,
+        reporter_id="r",
+        reporter_name="r",
+        report_type=report_type,
+        symptoms=symptoms,
+        severity="high",
+        location={"lat": lat, "lng": lng, "address": "Village Rampur"},
+        date_reported=datetime.now(timezone.utc) - timedelta(hours=hours_ago),
+    )
+
+
+def test_near_identical_report_nearby_is_a_duplicate():
+    index = dedup.DuplicateIndex()
+    index.add(report("a"))
+    duplicate_of, _ = index.find_duplicate(report("b", symptoms=SYMPTOMS.replace("6", "7"), lat=28.995))
+    assert duplicate_of == "a"
+
+
+@pytest.mark.parametrize("other", [
+    report("b", symptoms="No doctor available at PHC for 3 days"),
+    report("b", lat=29.5),
+    report("b", hours_ago=100),
+    report("b", report_type="water_quality"),
+])
+def test_different_incidents_are_not_duplicates(other):
+    index = dedup.DuplicateIndex()
+    index.add(report("a"))
+    assert index.find_duplicate(other)[0] is None
+
+
+def test_discard_forgets_a_report():
+    index = dedup.DuplicateIndex()
+    index.add(report("a"))
+    index.discard("a")
+    assert len(index) == 0
+    assert index.find_duplicate(report("b"))[0] is None
+
+
+@pytest.mark.anyio
+async def test_concurrent_identical_reports_link_to_one_original(server_db, monkeypatch):
+    insert_once = server.insert_once
+
+    async def slow_insert_once(collection, document):
+        await asyncio.sleep(0.01)  # let the other request run while this insert is in flight
+        return await insert_once(collection, document)
+
+    monkeypatch.setattr(server, "insert_once", slow_insert_once)
+    payload = {
+        "reporter_name": "A", "report_type": "disease", "symptoms": SYMPTOMS, "severity": "critical",
+        "location": {"lat": 28.99, "lng": 77.02, "address": "Village Rampur"},
+    }
+    created = await asyncio.gather(*(
+        server.create_health_report(report=server.HealthReportCreate(**payload), background_tasks=BackgroundTasks())
+        for _ in range(2)
+    ))
+    originals = [item for item in created if item.duplicate_of is None]
+    assert len(originals) == 1
+    assert [item.duplicate_of for item in created if item.duplicate_of] == [originals[0].id]
@@ -0,0 +1,40 @@
+import io
+from datetime import datetime, timedelta, timezone
+
+import pyarrow.parquet as pq
+import pytest
+
+import export
+
+START = datetime(2026, 10, 1, tzinfo=timezone.utc)
+
+
+def reading(number):
+    return {
+        "id": f"reading-{number}",
+        "test_date": (START + timedelta(hours=number)).isoformat(),
+        "tds_value": 300 + number,
+        "ph_level": 7.2,
+        "turbidity": 1,
+        "chlorine_level": None,
+        "status": "unsafe" if number % 3 == 0 else "safe",
+        "rules_version": "legacy@1",
+        "location": {"lat": 28.99, "lng": 77.02, "address": "Village Rampur"},
+        "region": {"state": "HR", "district": "HR-SNP"},
+    }
+
+
+@pytest.mark.anyio
+async def test_streamed_export_reads_back_in_row_groups(db):
+    await db.water_quality.insert_many([reading(number) for number in range(25)])
+    pieces = [piece async for piece in export.stream_parquet(db, "water_quality", batch_size=10)]
+    assert len(pieces) > 3  # one piece per row group, then the footer
+
+    parquet = pq.ParquetFile(io.BytesIO(b"".join(pieces)))
+    assert parquet.metadata.num_row_groups == 3
+    table = parquet.read()
+    assert table.schema.equals(export.schema("water_quality"))
+    assert table.column("id").to_pylist() == [f"reading-{number}" for number in range(25)]
+    assert table.column("test_date")[1].as_py() == START + timedelta(hours=1)
+    assert table.column("chlorine_level").null_count == 25
+    assert table.column("district").to_pylist() == ["HR-SNP"] * 25
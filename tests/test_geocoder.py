@@ -0,0 +1,37 @@
+import pytest
+
+import geocoder
+
+SISANA = "Village Sisana, Block Kharkhoda, Sonipat District, Haryana"
+
+
+def test_landmark_in_the_same_part_as_the_village_is_kept():
+    location = geocoder.fill_location({"address": "Child Health Center Sisana"})
+    assert location["address"] == f"Child Health Center, {SISANA}"
+    assert location["geocoded"] and location["submitted_address"] == "Child Health Center Sisana"
+
+
+def test_separate_landmark_parts_are_kept():
+    location = geocoder.fill_location({"address": "Anganwadi Center, Village Sisana, Sonipat District"})
+    assert location["address"] == f"Anganwadi Center, {SISANA}"
+
+
+def test_conflicting_district_is_not_overridden():
+    location = geocoder.fill_location({"address": "Village Sisana, Gurugram District"})
+    assert location == {"address": "Village Sisana, Gurugram District"}
+
+
+def test_submitted_coordinates_are_kept():
+    location = geocoder.fill_location({"address": "Village Sisana", "lat": 28.9, "lng": 76.93})
+    assert (location["lat"], location["lng"]) == (28.9, 76.93)
+    assert "geocoded" not in location
+
+
+@pytest.mark.parametrize("address", ["Ramp", "Hospital Ramp", "Khar"])
+def test_short_prefixes_are_not_completed(address):
+    assert geocoder.fill_location({"address": address}) == {"address": address}
+
+
+def test_mostly_typed_name_is_completed():
+    location = geocoder.fill_location({"address": "Near School, Sisan"})
+    assert location["address"] == f"Near School, {SISANA}"
@@ -0,0 +1,21 @@
+import logging
+
+import pytest
+
+import archive
+import notifications
+import server
+
+
+@pytest.mark.anyio
+async def test_failing_module_does_not_skip_other_indexes(server_db, monkeypatch, caplog):
+    async def broken(db):
+        raise RuntimeError("index build failed")
+
+    monkeypatch.setattr(archive, "ensure_indexes", broken)
+    with caplog.at_level(logging.WARNING, logger=server.logger.name):
+        await server.ensure_indexes()
+
+    assert "Could not ensure archive indexes: index build failed" in caplog.text
+    # Modules after the failing one still get their indexes
+    assert len(await server_db[notifications.OUTBOX].index_information()) > 1
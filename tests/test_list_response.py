@@ -0,0 +1,29 @@
+import logging
+
+import pytest
+
+
+def doctor(doctor_id, location):
+    return {
+        "id": doctor_id,
+        "name": f"Dr. {doctor_id}",
+        "specialization": "General",
+        "location": location,
+        "phone": "+910000000000",
+        "email": f"{doctor_id}@example.org",
+        "availability": "24/7",
+    }
+
+
+@pytest.mark.anyio
+async def test_invalid_stored_document_is_skipped_and_logged(api, server_db, caplog):
+    await server_db.doctors.insert_many([
+        doctor("valid", {"lat": 28.99, "lng": 77.02, "address": "Village Rampur"}),
+        # Written before locations were validated: latitude without longitude
+        doctor("legacy", {"lat": 28.99}),
+    ])
+    with caplog.at_level(logging.WARNING, logger="server"):
+        response = api.get("/api/doctors")
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()] == ["valid"]
+    assert "legacy" in caplog.text
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import notifications
+
+CENTRE = {"address": "Village Rampur, Sonipat District", "lat": 28.99, "lng": 77.02}
+
+
+class FailingNotifier(notifications.Notifier):
+    async def send(self, messages: list):
+        raise ConnectionError("gateway down")
+
+
+def event(event_id="r1", location=CENTRE):
+    return notifications.report_event({
+        "id": event_id, "report_type": "disease", "symptoms": "Cholera-like symptoms", "location": location,
+    })
+
+
+async def seed_responders(db):
+    await db.doctors.insert_many([
+        {"name": "Dr. Near", "phone": "+911", "email": "near@example.org", "location": {"lat": 29.0, "lng": 77.03}},
+        # Inside the bounding box but beyond the radius
+        {"name": "Dr. Corner", "phone": "+912", "location": {"lat": 29.07, "lng": 77.11}},
+        {"name": "Dr. Far", "phone": "+913", "location": {"lat": 30.5, "lng": 77.0}},
+    ])
+    await db.users.insert_many([
+        {"name": "Clinic", "role": "clinic_staff", "phone": "+911", "location": {"lat": 28.98, "lng": 77.01}},
+        {"name": "Villager", "role": "community_member", "phone": "+914", "location": {"lat": 28.99, "lng": 77.02}},
+    ])
+
+
+def dispatcher(db, **notifiers):
+    dispatcher = notifications.Dispatcher(notifiers=notifiers, rates={})
+    dispatcher.db = db
+    return dispatcher
+
+
+@pytest.mark.anyio
+async def test_responders_within_radius_once_per_address(db):
+    await seed_responders(db)
+    recipients = await notifications.responders_near(db, CENTRE["lat"], CENTRE["lng"])
+    assert sorted((r["channel"], r["address"]) for r in recipients) == [("email", "near@example.org"), ("sms", "+911")]
+
+
+@pytest.mark.anyio
+async def test_enqueueing_an_event_twice_queues_it_once(db):
+    await seed_responders(db)
+    assert await notifications.enqueue(db, event()) == 2
+    assert await notifications.enqueue(db, event()) == 0
+    assert await db[notifications.OUTBOX].count_documents({}) == 2
+    assert await notifications.enqueue(db, event(location={"address": "Somewhere"})) == 0
+
+
+@pytest.mark.anyio
+async def test_batch_is_sent_and_marked(db):
+    await seed_responders(db)
+    await notifications.enqueue(db, event(), channels=("sms",))
+    stub = notifications.StubNotifier("sms")
+    assert await dispatcher(db, sms=stub).dispatch_batch("sms") == 1
+    assert [message["address"] for message in stub.sent] == ["+911"]
+    stored = await db[notifications.OUTBOX].find_one()
+    assert stored["status"] == "sent" and stored["attempts"] == 1
+    assert await dispatcher(db, sms=stub).dispatch_batch("sms") == 0
+
+
+@pytest.mark.anyio
+async def test_failed_delivery_backs_off_then_gives_up(db, monkeypatch):
+    monkeypatch.setattr(notifications, "MAX_ATTEMPTS", 2)
+    await seed_responders(db)
+    await notifications.enqueue(db, event(), channels=("sms",))
+    failing = dispatcher(db, sms=FailingNotifier())
+
+    assert await failing.dispatch_batch("sms") == 1
+    stored = await db[notifications.OUTBOX].find_one()
+    assert stored["status"] == "pending" and stored["attempts"] == 1 and stored["last_error"] == "gateway down"
+    # Not retried before its backoff has elapsed
+    assert await failing.dispatch_batch("sms") == 0
+
+    await db[notifications.OUTBOX].update_one({}, {"$set": {"next_attempt_at": datetime.now(timezone.utc) - timedelta(seconds=1)}})
+    assert await failing.dispatch_batch("sms") == 1
+    assert (await db[notifications.OUTBOX].find_one())["status"] == "failed"
+
+
+@pytest.mark.anyio
+async def test_abandoned_claim_is_retaken(db):
+    await seed_responders(db)
+    await notifications.enqueue(db, event(), channels=("sms",))
+    abandoned = datetime.now(timezone.utc) - timedelta(seconds=notifications.CLAIM_TIMEOUT_SECONDS + 1)
+    await db[notifications.OUTBOX].update_one({}, {"$set": {"status": "sending", "claim": "crashed", "claimed_at": abandoned}})
+
+    stub = notifications.StubNotifier("sms")
+    assert await dispatcher(db, sms=stub).dispatch_batch("sms") == 1
+    assert (await db[notifications.OUTBOX].find_one())["status"] == "sent"
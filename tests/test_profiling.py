@@ -0,0 +1,30 @@
+import pytest
+
+import profiling
+
+
+@pytest.fixture(autouse=True)
+def token(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILER_TOKEN", "secret")
+
+
+def scope(query=b"", headers=()):
+    return {"type": "http", "query_string": query, "headers": [(b"x-profile-token", b"secret"), *headers]}
+
+
+@pytest.mark.parametrize("query,expected", [
+    (b"profile=1", True),
+    (b"limit=5&profile=1", True),
+    (b"noprofile=10", False),
+    (b"profile=10", False),
+    (b"", False),
+])
+def test_query_parameter_must_match_exactly(query, expected):
+    assert profiling.ProfilingMiddleware(None)._wants_profile(scope(query)) is expected
+
+
+def test_header_request_needs_the_token():
+    middleware = profiling.ProfilingMiddleware(None)
+    assert middleware._wants_profile(scope(headers=[(b"x-profile", b"1")]))
+    bad = {"type": "http", "query_string": b"profile=1", "headers": [(b"x-profile-token", b"wrong")]}
+    assert not middleware._wants_profile(bad)
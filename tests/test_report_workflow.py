@@ -0,0 +1,80 @@
+from collections import Counter
+
+import pytest
+from mongomock_motor import AsyncMongoMockCollection
+
+import report_workflow
+
+
+def report(report_id, status="active"):
+    return {"_id": report_id, "id": report_id, "status": status, "duplicate_of": None, "region_ids": ["HR", "HR-SNP"]}
+
+
+async def active(db, key=report_workflow.ALL_REGIONS):
+    counter = await db[report_workflow.COUNTERS].find_one({"_id": key})
+    return counter["active"] if counter else 0
+
+
+@pytest.mark.anyio
+async def test_transition_moves_reports_and_adjusts_counters(db):
+    await db.health_reports.insert_many([report("a"), report("b"), report("c", status="resolved")])
+    await report_workflow.reconcile(db)
+
+    entry = await report_workflow.transition(db, ["a", "b", "c", "missing"], "under_investigation", "officer")
+
+    assert [move["report_id"] for move in entry["moved"]] == ["a", "b"]
+    assert {item["report_id"]: item["reason"] for item in entry["rejected"]} == {
+        "c": "cannot move from resolved to under_investigation",
+        "missing": "not found",
+    }
+    assert entry["modified"] == 2
+    assert await active(db) == 0 and await active(db, "HR-SNP") == 0
+    assert await db[report_workflow.AUDIT].count_documents({}) == 1
+
+
+@pytest.mark.anyio
+async def test_concurrent_change_is_not_overwritten_or_counted(db, monkeypatch):
+    await db.health_reports.insert_many([report("a"), report("b")])
+    await report_workflow.reconcile(db)
+    bulk_write = AsyncMongoMockCollection.bulk_write
+
+    async def resolve_b_first(self, *args, **kwargs):
+        # Another officer resolves "b" after this batch read it as active
+        if self.name == "health_reports":
+            await db.health_reports.update_one({"_id": "b"}, {"$set": {"status": "resolved"}})
+            await report_workflow.adjust_active(db, Counter({"all": -1, "HR": -1, "HR-SNP": -1}))
+        return await bulk_write(self, *args, **kwargs)
+
+    monkeypatch.setattr(AsyncMongoMockCollection, "bulk_write", resolve_b_first)
+    entry = await report_workflow.transition(db, ["a", "b"], "under_investigation", "officer")
+
+    assert (await db.health_reports.find_one({"_id": "b"}))["status"] == "resolved"
+    assert [move["report_id"] for move in entry["moved"]] == ["a"]
+    assert entry["rejected"] == [{"report_id": "b", "reason": "status changed concurrently"}]
+    assert entry["modified"] == 1
+    # Only "a" left the active count here; "b" was already subtracted by the other change
+    assert await active(db) == 0
+    assert await active(db, "HR-SNP") == 0
+
+
+@pytest.mark.anyio
+async def test_reconcile_corrects_drift_without_losing_concurrent_changes(db, monkeypatch):
+    await db.health_reports.insert_many([report("a"), report("b"), report("c")])
+    await report_workflow.reconcile(db)
+    # Drift in the overall counter only
+    await report_workflow.adjust_active(db, Counter({"all": 5}))
+    count_active = report_workflow.count_active
+
+    async def transition_after_count(db):
+        counts = await count_active(db)
+        # Lands after the reports were counted but before the corrections are written
+        await report_workflow.transition(db, ["a"], "resolved", "officer")
+        return counts
+
+    monkeypatch.setattr(report_workflow, "count_active", transition_after_count)
+    assert (await report_workflow.reconcile(db))["all"] == 3
+    # The moved counters keep the transition; their drift is corrected by the next run
+    assert await active(db) == 7 and await active(db, "HR-SNP") == 2
+    monkeypatch.setattr(report_workflow, "count_active", count_active)
+    await report_workflow.reconcile(db)
+    assert await active(db) == 2 and await active(db, "HR-SNP") == 2
@@ -0,0 +1,172 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import BackgroundTasks
+from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
+
+import resilience
+import rollups
+import server
+
+REPORT = {
+    "reporter_name": "Asha Worker",
+    "report_type": "disease",
+    "symptoms": "Diarrhea and vomiting in 4 children",
+    "severity": "high",
+    "location": {"address": "Village Rampur, Sonipat District"},
+}
+
+
+def entry(spool_id, write="reports", payload=None, spooled_at=None):
+    return {
+        "spool_id": spool_id,
+        "write": write,
+        "write_id": f"write-{spool_id}",
+        "spooled_at": spooled_at or datetime.now(timezone.utc).isoformat(),
+        "payload": payload or REPORT,
+    }
+
+
+def test_spool_remove_keeps_entries_appended_meanwhile(tmp_path):
+    spool = resilience.WriteSpool(tmp_path / "writes.jsonl")
+    spool.append(entry("a"))
+    spool.append(entry("b"))
+    read = spool.read()
+    spool.append(entry("c"))  # e.g. by another worker while "a" and "b" were replayed
+    spool.remove(item["spool_id"] for item in read)
+    assert [item["spool_id"] for item in spool.read()] == ["c"]
+
+
+def test_spool_length_is_recounted_only_after_changes(tmp_path, monkeypatch):
+    spool = resilience.WriteSpool(tmp_path / "writes.jsonl")
+    assert len(spool) == 0
+    spool.append(entry("a"))
+    spool.append(entry("b"))
+    assert len(spool) == 2
+    monkeypatch.setattr(resilience, "open", lambda *args, **kwargs: pytest.fail("spool re-read"), raising=False)
+    assert len(spool) == 2
+
+
+def test_only_one_worker_replays(tmp_path):
+    first, second = resilience.WriteSpool(tmp_path / "writes.jsonl"), resilience.WriteSpool(tmp_path / "writes.jsonl")
+    with first.replaying() as owner:
+        assert owner
+        with second.replaying() as other:
+            assert not other
+    with second.replaying() as other:
+        assert other
+
+
+@pytest.mark.anyio
+async def test_cancelled_probe_does_not_wedge_the_breaker():
+    guard = resilience.DatabaseGuard(resilience.CircuitBreaker(failure_threshold=1, reset_seconds=0))
+    started = asyncio.Event()
+
+    @guard.read("slow")
+    async def slow():
+        started.set()
+        await asyncio.sleep(10)
+
+    guard.breaker.record_failure()
+    task = asyncio.create_task(slow())
+    await started.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert guard.breaker.allow()
+
+
+@pytest.mark.anyio
+async def test_stale_cache_is_capped_in_bytes():
+    guard = resilience.DatabaseGuard(cache_bytes=1000)
+
+    @guard.read("rows")
+    async def rows(size: int):
+        return {"rows": "x" * size}
+
+    await rows(size=400)
+    await rows(size=400)  # same key, replaced rather than counted twice
+    await rows(size=300)
+    assert guard.cached_bytes <= 1000 and len(guard.cache) == 2
+    await rows(size=500)
+    assert guard.cached_bytes <= 1000
+    assert ("rows", (("size", "400"),)) not in guard.cache
+    await rows(size=5000)  # larger than the whole cache: not kept
+    assert ("rows", (("size", "5000"),)) not in guard.cache
+
+
+@pytest.mark.anyio
+async def test_replay_of_partly_applied_report_does_not_duplicate_it(server_db, monkeypatch):
+    record = rollups.record
+
+    async def unavailable(db, report, amount=1):
+        raise ServerSelectionTimeoutError("no primary")
+
+    # The report is inserted, then the database goes away before the rollups are updated
+    monkeypatch.setattr(rollups, "record", unavailable)
+    response = await server.create_health_report(report=server.HealthReportCreate(**REPORT), background_tasks=BackgroundTasks())
+    assert response.status_code == 202
+    queued = json.loads(response.body)
+    assert await server_db.health_reports.count_documents({}) == 1
+
+    monkeypatch.setattr(rollups, "record", record)
+    assert await server.db_guard.replay() == 1
+    stored = await server_db.health_reports.find().to_list(None)
+    assert [server.ids.to_str(report["id"]) for report in stored] == [queued["id"]]
+    assert stored[0].get("duplicate_of") is None
+    assert len(server.db_guard.spool) == 0
+
+
+@pytest.mark.anyio
+async def test_replayed_report_is_stored_under_its_spooled_id_and_time(server_db):
+    spooled_at = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()
+    server.db_guard.spool.append(entry("a", spooled_at=spooled_at))
+    assert await server.db_guard.replay() == 1
+    stored = await server_db.health_reports.find_one()
+    assert server.ids.to_str(stored["id"]) == "write-a"
+    assert stored["date_reported"] == spooled_at
+
+
+@pytest.mark.anyio
+async def test_replayed_status_change_does_not_undo_later_changes(server_db):
+    now = datetime.now(timezone.utc)
+    await server_db.health_reports.insert_many([
+        {"id": "changed", "status": "active", "status_changed_at": now.isoformat(), "region_ids": []},
+        {"id": "untouched", "status": "active", "region_ids": []},
+    ])
+    payload = {"report_ids": ["changed", "untouched"], "status": "resolved", "actor": "officer"}
+    server.db_guard.spool.append(entry("s", write="report_status", payload=payload,
+                                       spooled_at=(now - timedelta(minutes=5)).isoformat()))
+
+    assert await server.db_guard.replay() == 1
+    statuses = {report["id"]: report["status"] for report in await server_db.health_reports.find().to_list(None)}
+    assert statuses == {"changed": "active", "untouched": "resolved"}
+
+
+def test_missing_report_is_404_and_errors_are_generic(api, monkeypatch):
+    response = api.get("/api/reports/doesnotexist")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Report not found"
+
+    async def broken(*args, **kwargs):
+        raise RuntimeError("secret connection string")
+
+    monkeypatch.setattr(server.archive, "find_one_across", broken)
+    response = api.get("/api/reports/anything")
+    assert response.status_code == 500
+    assert response.json()["detail"] == "Error fetching report"
+
+
+@pytest.mark.anyio
+async def test_replay_stops_when_the_database_fails_again(server_db, monkeypatch):
+    server.db_guard.spool.append(entry("a"))
+    server.db_guard.spool.append(entry("b"))
+
+    async def unavailable(*args, **kwargs):
+        raise ConnectionFailure("down")
+
+    monkeypatch.setattr(server, "insert_once", unavailable)
+    assert await server.db_guard.replay() == 0
+    assert len(server.db_guard.spool) == 2
@@ -0,0 +1,56 @@
+from datetime import date, datetime, timezone
+
+import pytest
+
+import regions
+import rollups
+
+REPORTED = datetime(2026, 10, 5, tzinfo=timezone.utc).isoformat()
+
+
+def report(address, severity="high"):
+    return {
+        "date_reported": REPORTED,
+        "report_type": "disease",
+        "severity": severity,
+        **regions.region_fields({"address": address}),
+    }
+
+
+REPORTS = [
+    report("Village Rampur, Block Kharkhoda, Sonipat District"),
+    report("Village Sisana, Block Kharkhoda, Sonipat District"),
+    report("Sonipat District", severity="low"),
+    report("Village Sohna, Gurugram District"),
+]
+
+
+async def monthly(db, region=None, group_by="region"):
+    return await rollups.trends(db, "month", date(2026, 10, 1), date(2026, 10, 31), group_by, {"region_ids": region})
+
+
+@pytest.mark.parametrize("region, expected", [
+    (None, {"HR-SNP": {"2026-10-01": 3}, "HR-GGN": {"2026-10-01": 1}}),
+    ("HR", {"HR-SNP": {"2026-10-01": 3}, "HR-GGN": {"2026-10-01": 1}}),
+    ("HR-SNP", {"HR-SNP": {"2026-10-01": 3}}),
+    ("HR-SNP-KHK", {"HR-SNP": {"2026-10-01": 2}}),
+    ("HR-SNP-KHK-SSN", {"HR-SNP": {"2026-10-01": 1}}),
+])
+@pytest.mark.anyio
+async def test_trends_filter_by_any_region_level(db, region, expected):
+    for item in REPORTS:
+        await rollups.record(db, item)
+    assert await monthly(db, region) == expected
+
+
+@pytest.mark.anyio
+async def test_backfill_matches_incremental_rollups(db):
+    for item in REPORTS:
+        await rollups.record(db, item)
+    incremental = await db[rollups.COLLECTION].find({}, {"count": 1, "region_ids": 1}).sort("_id").to_list(None)
+    await db.health_reports.insert_many([dict(item) for item in REPORTS])
+
+    assert await rollups.backfill(db) == len(REPORTS)
+    rebuilt = await db[rollups.COLLECTION].find({}, {"count": 1, "region_ids": 1}).sort("_id").to_list(None)
+    assert rebuilt == incremental
+    assert await monthly(db, "HR-SNP-KHK", group_by="severity") == {"high": {"2026-10-01": 2}}
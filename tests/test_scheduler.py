@@ -0,0 +1,49 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import scheduler
+
+
+@pytest.mark.anyio
+async def test_exclusive_job_runs_once_across_workers(db):
+    runs = []
+
+    async def job():
+        runs.append(1)
+
+    first, second = scheduler.Scheduler(db, owner="worker-1"), scheduler.Scheduler(db, owner="worker-2")
+    for worker in (first, second):
+        worker.add_job("rollup", job, interval=60)
+
+    assert await first.trigger("rollup") == "success"
+    assert await second.trigger("rollup") == "skipped_lease"
+    # The owner may run again within its own lease
+    assert await first.trigger("rollup") == "success"
+    assert len(runs) == 2
+
+
+@pytest.mark.anyio
+async def test_expired_lease_is_taken_over(db):
+    async def job():
+        pass
+
+    first, second = scheduler.Scheduler(db, owner="worker-1"), scheduler.Scheduler(db, owner="worker-2")
+    for worker in (first, second):
+        worker.add_job("rollup", job, interval=60)
+
+    await first.trigger("rollup")
+    await db[scheduler.LOCK_COLLECTION].update_one({"_id": "rollup"}, {"$set": {"expires_at": datetime(2000, 1, 1, tzinfo=timezone.utc)}})
+    assert await second.trigger("rollup") == "success"
+    assert (await db[scheduler.LOCK_COLLECTION].find_one({"_id": "rollup"}))["owner"] == "worker-2"
+
+
+@pytest.mark.anyio
+async def test_failing_job_records_failure(db):
+    async def job():
+        raise RuntimeError("boom")
+
+    worker = scheduler.Scheduler(db)
+    worker.add_job("broken", job, interval=60, exclusive=False)
+    assert await worker.trigger("broken") == "failure"
+    assert worker.jobs["broken"].status()["last_error"] == "boom"
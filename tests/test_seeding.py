@@ -0,0 +1,38 @@
+import pytest
+
+import populate_data
+import regions
+import report_workflow
+import rollups
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_seeded_documents_are_enriched_like_api_writes(db):
+    seeder = populate_data.MongoSeeder(db, server, batch_size=20, concurrency=2)
+    generator = populate_data.SyntheticDataGenerator(days=30, seed=1)
+    await seeder.seed("health_reports", 40, generator.report)
+    await seeder.seed("medical_stock", 10, generator.stock_row)
+
+    reports = await db.health_reports.find().to_list(None)
+    assert len(reports) == 40
+    assert all(report["region_ids"] and report["region"]["district"] for report in reports)
+    assert all(stock["region_ids"] for stock in await db.medical_stock.find().to_list(None))
+
+    await seeder.rebuild_derived(reports=40, water=0)
+    totals = await db[rollups.COLLECTION].find({"granularity": "month"}).to_list(None)
+    assert sum(row["count"] for row in totals) == 40
+    active = sum(1 for report in reports if report["status"] == "active")
+    assert await report_workflow.active_cases(db) == active
+
+
+async def test_assign_missing_repairs_empty_region_ids(db):
+    location = {"lat": 28.99, "lng": 77.02, "address": "Village Rampur, Sonipat District"}
+    await db.users.insert_many([
+        {"id": "a", "location": location, "region_ids": []},
+        {"id": "b", "location": location},
+    ])
+    updated = await regions.assign_missing(db)
+    assert updated["users"] == 2
+    assert all(user["region_ids"] for user in await db.users.find().to_list(None))
@@ -0,0 +1,51 @@
+CSV = """address,lat,lng,tds,ph,turbidity,chlorine,tested_by,test_date
+"Village Rampur, Sonipat",28.8456,76.9613,300,7.2,1,0.5,Lab A,2026-10-01T10:00:00+05:30
+"Village Rampur, Sonipat",28.8456,76.9613,1500,7.2,1,0.5,Lab A,2026-10-01T04:00:00
+Village Sisana,,,300,not-a-number,1,0.5,Lab B,
+"""
+
+
+def test_import_stores_utc_dates_and_reports_bad_rows(api, server_db):
+    response = api.post("/api/water-quality/import", content=CSV, headers={"content-type": "text/csv"})
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["received"], result["inserted"], result["rejected"]) == (3, 2, 1)
+    assert result["errors"][0]["line"] == 4
+
+    readings = api.get("/api/water-quality").json()
+    # The +05:30 reading is stored as 04:30 UTC and sorts after the 04:00 one
+    assert [reading["test_date"][:19] for reading in readings] == ["2026-10-01T04:30:00", "2026-10-01T04:00:00"]
+    assert [reading["status"] for reading in readings] == ["safe", "unsafe"]
+
+
+def test_import_keeps_few_places_and_refreshes_the_unsafe_range(api, server_db, monkeypatch):
+    import server
+
+    fill_location, geocoded, refreshed = server.geocoder.fill_location, [], []
+
+    def counting_fill_location(location):
+        geocoded.append(location["address"])
+        return fill_location(location)
+
+    async def refresh(db, query):
+        refreshed.append(query)
+
+    monkeypatch.setattr(server, "WATER_IMPORT_MAX_PLACES", 2)
+    monkeypatch.setattr(server.geocoder, "fill_location", counting_fill_location)
+    monkeypatch.setattr(server.correlation, "refresh", refresh)
+    rows = [
+        ("A", 1500, "2026-10-03T00:00:00"),
+        ("B", 300, "2026-10-01T00:00:00"),
+        ("A", 1500, "2026-10-02T00:00:00"),
+        ("C", 300, "2026-10-04T00:00:00"),  # evicts B, the least recently used
+        ("A", 1500, "2026-10-05T00:00:00"),
+        ("B", 300, "2026-10-06T00:00:00"),
+    ]
+    body = "address,lat,lng,tds,ph,turbidity,chlorine,tested_by,test_date\n" + "".join(
+        f"{address},28.8,76.9,{tds},7.2,1,0.5,Lab,{date}\n" for address, tds, date in rows
+    )
+    response = api.post("/api/water-quality/import", content=body, headers={"content-type": "text/csv"})
+    assert response.json()["inserted"] == 6
+    assert geocoded == ["A", "B", "C", "B"]
+    assert [query["test_date"]["$gte"][:10] for query in refreshed] == ["2026-10-02"]
+    assert [query["test_date"]["$lte"][:10] for query in refreshed] == ["2026-10-05"]
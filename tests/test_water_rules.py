@@ -0,0 +1,65 @@
+import math
+from datetime import datetime, timezone
+
+import pytest
+
+import correlation
+import water_rules
+
+
+def test_missing_measurements_are_never_safe():
+    rules = water_rules.get("legacy@1")
+    assert rules.classify(300, 7.2, 1, 0.5) == "safe"
+    assert rules.classify(300, math.nan, 1, 0.5) == "unsafe"
+    assert rules.classify(300, 7.2, None, 0.5) == "unsafe"
+    statuses = rules.evaluate([300, 300, 300], [7.2, math.nan, 7.2], [1, 1, 1], [0.5, 0.5, None])
+    assert statuses.tolist() == ["safe", "unsafe", "unsafe"]
+
+
+@pytest.mark.parametrize("op", ["<", "<=", ">", ">="])
+def test_classify_matches_evaluate_at_thresholds(op):
+    rules = water_rules.RuleSet("test", {"unsafe": [("tds", op, 500)], "moderate": [("ph", op, 7), ("ph", op, 7.5)]})
+    samples = [(tds, ph) for tds in (499, 499.99, 500, 500.01, 501) for ph in (6.9, 7, 7.2, 7.5, 7.6)]
+    expected = rules.evaluate([t for t, _ in samples], [p for _, p in samples], [1] * len(samples), [0.5] * len(samples))
+    assert [rules.classify(tds, ph, 1, 0.5) for tds, ph in samples] == expected.tolist()
+    # Thresholds are data: a crafted one is rejected instead of reaching the classifier
+    with pytest.raises(ValueError):
+        water_rules.RuleSet("bad", {"unsafe": [("tds", op, "__import__('os')")]})
+
+
+def reading(reading_id, status, tds, rules_version="legacy@1", **overrides):
+    return {
+        "id": reading_id,
+        "status": status,
+        "rules_version": rules_version,
+        "tds_value": tds,
+        "ph_level": 7.2,
+        "turbidity": 1.0,
+        "chlorine_level": 0.5,
+        "location": {"lat": 28.45, "lng": 77.02},
+        "test_date": datetime(2026, 10, 1, tzinfo=timezone.utc).isoformat(),
+        **overrides,
+    }
+
+
+@pytest.mark.anyio
+async def test_reclassify_updates_only_correlations_of_moved_readings(db):
+    # Under bis@2012 a TDS of 1500 is moderate and 2500 unsafe; under legacy@1 both are unsafe
+    await db.water_quality.insert_many([
+        reading("stays-unsafe", "unsafe", 2500),
+        reading("becomes-moderate", "unsafe", 1500),
+        reading("becomes-unsafe", "safe", 300, ph_level=None),
+        reading("stays-safe", "safe", 300),
+    ])
+    await correlation.refresh(db)
+    stale = await db[correlation.COLLECTION].find_one({"_id": "stays-unsafe"})
+
+    result = await water_rules.reclassify(db, water_rules.get("bis@2012"))
+    await correlation.apply_reclassification(db, result)
+
+    assert result["now_unsafe"] == ["becomes-unsafe"]
+    assert result["no_longer_unsafe"] == ["becomes-moderate"]
+    cached = {doc["_id"]: doc for doc in await db[correlation.COLLECTION].find().to_list(None)}
+    assert set(cached) == {"stays-unsafe", "becomes-unsafe"}
+    # Readings whose status did not change are not recomputed
+    assert cached["stays-unsafe"]["computed_at"] == stale["computed_at"]